@@ -1,104 +1,114 @@
-import csv
 import time
-import pandas as pd  # 記得 pip install pandas
-from datetime import datetime
 from modules.strategy import Strategy
-from modules.mock import MockTick, MockBot, MockShioaji
+from modules.mock import MockBot, MockShioaji
 from modules.trader import Trader
 from core.engine import BotEngine
+from modules.history_store import load_bars
+from modules.replay import TickReplayer
+from modules.sim_broker import SimBroker
+from modules.bar_iter import calculate_indicators, iter_bars   # 回測指標週期在 modules/bar_iter.py 設定
 from config.settings import Settings
 
 # ---------------------------------------------------------
 # 🎯 設定你要回測的目標檔案
 # ---------------------------------------------------------
 # 選項 A: 你剛剛跑出來的熱騰騰資料 (記得改日期)
-#CSV_FILE_PATH = f"data/{datetime.now().strftime('%Y-%m-%d')}/{Settings.TARGET_CONTRACT}_1min.csv"
+#DATA_SOURCE = f"data/2026-01-05/{Settings.TARGET_CONTRACT}_1min.csv"
 
-# 選項 B: 歷史下載資料 (想測這個就把上面註解掉，打開下面)
-CSV_FILE_PATH = f"data/history/{Settings.TARGET_CONTRACT}_1min_history.csv"
+# 選項 B: 歷史資料庫 (tools/download_data.py 下載的，依交易日分檔；換月可給清單，例如 ["TMF202601", "TMF202602"])
+DATA_SOURCE = Settings.TARGET_CONTRACT
+
+# 選項 C: 二進位封存 (BarRecorder 同步寫的欄式檔，memmap 直接讀，不用解析 CSV)
+#DATA_SOURCE = f"{Settings.ARCHIVE_DIR}/{Settings.TARGET_CONTRACT}_1min"
+
+# 回測期間 (交易日 'YYYY-MM-DD'，含頭含尾；None = 全部)
+START_DATE = None
+END_DATE = None
+
+# 🎞️ Tick 回放模式：設定後改把錄下來的 Tick 餵進 BotEngine (跟實盤同一條 K 線合成流程)
+# None = 用上面的 K 線回測；多天就依時間順序列出來
+TICK_SOURCES = None
+#TICK_SOURCES = [f"{Settings.ARCHIVE_DIR}/{Settings.TARGET_CONTRACT}_tick"]
+#TICK_SOURCES = [f"data/2026-01-05/{Settings.TARGET_CONTRACT}_tick.csv", f"data/2026-01-06/{Settings.TARGET_CONTRACT}_tick.csv"]
+
+# 🔇 模擬券商：True = 靜音 + SimBroker (成交/損益/帳本都在記憶體，最後一次寫檔，含滑價與手續費)
+#             False = 舊流程 (每個訊號都印出來、寫 CSV、走 Trader + MockShioaji)
+SIM_BROKER = True
 # ---------------------------------------------------------
 
-def calculate_indicators(df):
-    """
-    [回測引擎核心] 動態計算技術指標
-    這讓我們可以隨意調整參數 (例如 MA5 改 MA10)，而不需重新錄製資料
-    """
-    # 確保資料按時間排序
-    df.sort_index(inplace=True)
-    
-    # 計算 MA (使用 Pandas 的 rolling 函式，速度極快)
-    df['MA5'] = df['Close'].rolling(window=15).mean()#5
-    df['MA20'] = df['Close'].rolling(window=150).mean()#20
+def build_strategy():
+    """建立回測用的策略；SIM_BROKER 開啟時改接靜音的 SimBroker"""
+    mock_bot = MockBot()
+    if SIM_BROKER:
+        broker = SimBroker()
+        return Strategy(bot=mock_bot, trader=broker, quiet=True), broker
+
+    fake_api = MockShioaji()
     
-    # 這裡也可以加 RSI, MACD, Bollinger Bands...
-    # df['RSI'] = ...
+    # 使用 MockAPI 的 Trader
+    real_trader = Trader(api=fake_api)
     
-    return df
+    # 初始化策略
+    return Strategy(bot=mock_bot, trader=real_trader), None
+
+def report(strategy, broker=None):
+    """印出績效；靜音模式在這裡才把帳本寫檔 (整場回測只寫一次)"""
+    print("════════════════════════════════════")
+    print(f"💰 最終策略損益: {strategy.total_profit:.0f} 點")
+    print(f"🎲 交易次數: {strategy.trade_count}")
+    if broker:
+        s = broker.summary()
+        print(f"🧾 模擬成交: 毛損益 {s['gross']:.0f} 點 - 手續費 {s['fees']:.0f} 點 = 淨損益 {s['net']:.0f} 點 "
+              f"(滑價 {broker.slippage} 點/邊)")
+    print("════════════════════════════════════")
+
+    strategy.flush_ledger()
+    print(f"📝 詳細交易紀錄已存至: {strategy.file_path}")
+    if broker:
+        path = broker.write_ledger(f"{strategy.file_dir}/sim_ledger.csv")
+        print(f"📝 模擬成交帳本已存至: {path}")
 
 def run_backtest():
-    print(f"⏳ [回測] 正在讀取: {CSV_FILE_PATH}")
+    print(f"⏳ [回測] 正在讀取: {DATA_SOURCE}")
 
-    # 1. 讀取 CSV 並清洗資料
+    # 1. 讀取資料 (CSV / 歷史資料庫 / 二進位封存 都走同一個入口)
     try:
-        # 使用 Pandas 讀取
-        df = pd.read_csv(CSV_FILE_PATH)
-        
-        # 統一欄位名稱 (首字大寫)，處理不同來源的格式差異
-        # 錄製的可能是 'close', 下載的可能是 'Close'
-        df.columns = [c.capitalize() for c in df.columns]
-        
-        # 處理時間欄位
-        df['Time'] = pd.to_datetime(df['Time'])
-        df.set_index('Time', inplace=True) # 設為索引方便計算
-        
+        df = load_bars(DATA_SOURCE, START_DATE, END_DATE)
     except FileNotFoundError:
-        print(f"❌ 找不到檔案: {CSV_FILE_PATH}")
+        print(f"❌ 找不到檔案: {DATA_SOURCE}")
         print("💡 提示: 如果是剛跑 main.py，可能資料還沒寫入 (要等 1 分鐘)")
         return
     except Exception as e:
         print(f"❌ 讀取錯誤: {e}")
         return
 
+    if df.empty:
+        print(f"❌ 沒有資料: {DATA_SOURCE} ({START_DATE or '最早'} ~ {END_DATE or '最新'})")
+        print("💡 提示: 先跑 tools/download_data.py 下載歷史 K 線")
+        return
+
     print(f"📊 原始資料: {len(df)} 筆")
 
     # 2. 動態計算指標
     df = calculate_indicators(df)
     
-    # 去除因為計算指標產生的 NaN (例如前 20 筆算不出 MA20)
+    # 去除因為計算指標產生的 NaN (例如前 150 筆算不出 MA20)
     df.dropna(inplace=True)
     print(f"✅ 指標計算完成，有效資料: {len(df)} 筆")
 
     # 3. 初始化模擬環境
-    mock_bot = MockBot()
-    fake_api = MockShioaji()
-    
-    # 使用 MockAPI 的 Trader
-    real_trader = Trader(api=fake_api)
-    
-    # 初始化策略
-    strategy = Strategy(bot=mock_bot, trader=real_trader)
+    strategy, broker = build_strategy()
     
     # 4. 開始回放 (逐 K 線模擬)
     print("▶️ 開始回測...")
-    start_time = time.time()
-    
-    for current_time, row in df.iterrows():
-        # 建構 Bar 資料 (符合 Strategy.on_bar 的格式)
-        bar = {
-            'dt': current_time.to_pydatetime(),
-            'open': float(row['Open']),
-            'high': float(row['High']),
-            'low': float(row['Low']),
-            'close': float(row['Close']),
-            'volume': int(row['Volume']),
-            'ma5': float(row['MA5']),   # 這裡是用算的！
-            'ma20': float(row['MA20'])  # 這裡是用算的！
-        }
-        
+    start_time = time.perf_counter()
+
+    on_bar = strategy.on_bar
+    for bar in iter_bars(df):
         # 呼叫策略
-        strategy.on_bar(bar)
+        on_bar(bar)
 
-    end_time = time.time()
+    end_time = time.perf_counter()
 
     # 5. 顯示績效
     # 呼叫同一支檔案裡的績效計算函式 (如果你有把 calculate_performance 貼進來的話)
@@ -106,14 +116,32 @@ def run_backtest():
     
     # 這裡簡單印出最終結果
     print(f"\n⚡ 回測耗時: {end_time - start_time:.2f} 秒")
-    print("════════════════════════════════════")
-    print(f"💰 最終策略損益: {strategy.total_profit:.0f} 點")
-    print(f"🎲 交易次數: {strategy.trade_count}")
-    print("════════════════════════════════════")
-    print(f"📝 詳細交易紀錄已存至: {strategy.file_path}")
+    report(strategy, broker)
+
+def run_tick_replay():
+    """Tick -> BotEngine.process_tick -> BarGenerator -> BarResampler -> Strategy (指標用 Settings.INDICATORS)"""
+    print(f"⏳ [Tick 回放] 正在讀取: {', '.join(TICK_SOURCES)}")
+
+    strategy, broker = build_strategy()
+    engine = BotEngine(strategy, timeframes=Settings.TIMEFRAMES)
+    replayer = TickReplayer(engine, code=Settings.TARGET_CONTRACT)
+
+    print("▶️ 開始回放...")
+    try:
+        stats = replayer.run(TICK_SOURCES, START_DATE, END_DATE)
+    except FileNotFoundError as e:
+        print(f"❌ 找不到檔案: {e.filename}")
+        return
+
+    print(f"\n⚡ 回放耗時: {stats['seconds']:.2f} 秒 ({stats['ticks']} 筆 Tick，{stats['ticks_per_sec']:,.0f} ticks/秒)")
+    print(f"🕯️ 合成 1 分 K: {stats['bars']} 根")
+    report(strategy, broker)
 
 if __name__ == "__main__":
     # 強制開啟下單邏輯測試
     Settings.DRY_RUN = False 
-    run_backtest()
+    if TICK_SOURCES:
+        run_tick_replay()
+    else:
+        run_backtest()
     Settings.DRY_RUN = True
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import re
+import time
+import multiprocessing as mp
+import pandas as pd
+from datetime import datetime
+from config.settings import Settings
+from core.engine import BotEngine
+from modules.strategy import Strategy
+from modules.sim_broker import SimBroker
+from modules.mock import MockBot
+from modules.replay import TickReplayer
+from modules.history_store import load_bars, get_store
+from modules.parallel_sweep import ProgressReporter
+from modules.bar_iter import calculate_indicators, iter_bars
+
+# ==========================================
+# 批次回測：每天 (或每個合約) 一個獨立回測，丟進行程池一起跑
+# ==========================================
+# 來源可以是：
+#   "bars"  : 錄製資料夾 data/YYYY-MM-DD/<合約>_1min.csv (BarRecorder 寫的)
+#   "ticks" : 錄製資料夾 data/YYYY-MM-DD/<合約>_tick.csv (走 BotEngine Tick 回放)
+#   "store" : 歷史資料庫 data/history/<合約>/<交易日>.npz
+# 每個回測都用靜音的 Strategy + SimBroker，最後合併成一份報表。
+
+# ================= 設定區 =================
+MODE = "bars"                            # "bars" / "ticks" / "store"
+CONTRACTS = [Settings.TARGET_CONTRACT]   # 要跑哪些合約 (錄製的檔名 / 歷史資料庫的合約代碼)
+START_DATE = None                        # 'YYYY-MM-DD' (含頭含尾)，None = 全部
+END_DATE = None
+DATA_ROOT = "data"                       # 錄製資料夾的上層
+N_WORKERS = None                         # 行程數 (None = 全部核心)
+OUTPUT_DIR = "data/batch"                # 報表與合併帳本的輸出位置
+
+_DAY_DIR = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def find_jobs(mode=MODE, contracts=CONTRACTS, start=START_DATE, end=END_DATE, root=DATA_ROOT):
+    """
+    找出所有要跑的 (模式, 合約, 日期, 來源)
+    錄製資料夾沒有該合約的檔案就略過
+    """
+    jobs = []
+    if mode == "store":
+        store = get_store()
+        for code in contracts:
+            jobs += [(mode, code, day, code) for day in store.days(code, start, end)]
+        return sorted(jobs, key=lambda j: (j[2], j[1]))
+
+    suffix = "_1min.csv" if mode == "bars" else "_tick.csv"
+    days = sorted(d for d in os.listdir(root) if _DAY_DIR.match(d)) if os.path.isdir(root) else []
+    for day in days:
+        if (start and day < start) or (end and day > end):
+            continue
+        for code in contracts:
+            path = os.path.join(root, day, f"{code}{suffix}")
+            if os.path.exists(path):
+                jobs.append((mode, code, day, path))
+    return jobs
+
+
+def _run_job(job):
+    """[worker] 跑一天 / 一個合約的回測，回傳結果摘要與帳本 (不在 worker 裡寫檔)"""
+    mode, code, day, source = job
+    t0 = time.perf_counter()
+    out = {"day": day, "contract": code, "bars": 0, "profit": 0.0, "trades": 0,
+           "net": 0.0, "fees": 0.0, "seconds": 0.0, "error": ""}
+    try:
+        broker = SimBroker()
+        strategy = Strategy(bot=MockBot(), trader=broker, quiet=True)
+
+        if mode == "ticks":
+            engine = BotEngine(strategy, timeframes=Settings.TIMEFRAMES)
+            stats = TickReplayer(engine, code=code).run(source)
+            out["bars"] = stats["bars"]
+        else:
+            df = load_bars(source, day, day) if mode == "store" else load_bars(source)
+            df = calculate_indicators(df)
+            df.dropna(inplace=True)
+            on_bar = strategy.on_bar
+            for bar in iter_bars(df):
+                on_bar(bar)
+            out["bars"] = len(df)
+
+        s = broker.summary()
+        out.update(profit=strategy.total_profit, trades=strategy.trade_count, net=s["net"], fees=s["fees"])
+        ledger = broker.ledger()
+        ledger.insert(0, "Contract", code)
+        ledger.insert(0, "Day", day)
+        out["ledger"] = ledger
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+        out["ledger"] = None
+    out["seconds"] = time.perf_counter() - t0
+    return out
+
+
+def run_batch(jobs, workers=N_WORKERS):
+    """
+    平行跑所有回測
+    :return: (報表 DataFrame，依日期/合約排序；合併後的成交帳本)
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    progress = ProgressReporter(len(jobs), label="批次回測")
+
+    results = []
+    if workers == 1:
+        for job in jobs:
+            results.append(_run_job(job))
+            progress.update()
+    else:
+        with mp.Pool(processes=workers) as pool:
+            for r in pool.imap_unordered(_run_job, jobs):
+                results.append(r)
+                progress.update()
+
+    results.sort(key=lambda r: (r["day"], r["contract"]))
+    ledgers = [r.pop("ledger") for r in results]
+    ledgers = [l for l in ledgers if l is not None and len(l)]
+    report = pd.DataFrame(results, columns=["day", "contract", "bars", "profit", "trades",
+                                            "net", "fees", "seconds", "error"])
+    ledger = pd.concat(ledgers, ignore_index=True) if ledgers else pd.DataFrame(
+        columns=["Day", "Contract"] + SimBroker.LEDGER_COLUMNS)
+    return report, ledger
+
+
+# ================= 主程式 =================
+if __name__ == "__main__":
+    jobs = find_jobs()
+    print(f"🚀 [批次回測] 模式: {MODE} | 合約: {', '.join(CONTRACTS)} | "
+          f"期間: {START_DATE or '最早'} ~ {END_DATE or '最新'}")
+    if not jobs:
+        print("❌ 找不到任何資料 (確認 data/YYYY-MM-DD/ 或歷史資料庫裡有檔案)")
+        raise SystemExit(1)
+    print(f"📦 共 {len(jobs)} 個回測，{N_WORKERS or os.cpu_count()} 個行程\n")
+
+    t0 = time.perf_counter()
+    report, ledger = run_batch(jobs)
+    wall = time.perf_counter() - t0
+
+    print("\n" + "=" * 60)
+    print("📊 批次回測報表 (profit = 訊號損益，net = 扣滑價手續費後)")
+    print("=" * 60)
+    print(report.round(2).to_string(index=False))
+    print("-" * 60)
+    failed = report[report["error"] != ""]
+    print(f"💰 總訊號損益: {report['profit'].sum():.0f} 點 | 淨損益: {report['net'].sum():.0f} 點 | "
+          f"交易次數: {report['trades'].sum()}")
+    print(f"⚡ 牆鐘時間 {wall:.2f} 秒 (各回測加總 {report['seconds'].sum():.2f} 秒)"
+          + (f" | ❌ 失敗 {len(failed)} 個" if len(failed) else ""))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report.to_csv(f"{OUTPUT_DIR}/report_{stamp}.csv", index=False)
+    ledger.to_csv(f"{OUTPUT_DIR}/ledger_{stamp}.csv", index=False, float_format="%.1f")
+    print(f"📝 報表: {OUTPUT_DIR}/report_{stamp}.csv | 帳本: {OUTPUT_DIR}/ledger_{stamp}.csv")
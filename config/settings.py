@@ -24,10 +24,64 @@ class Settings:
     # --- Telegram ---
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
     TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")  # 測試時可指向本機假伺服器
+    TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1.0"))  # 同一聊天室每秒最多 1 則
+    TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "200"))
     
     # --- 交易目標 ---
     TARGET_CONTRACT = os.getenv("TARGET_CONTRACT", "TMF202602")
 
+    # --- 即時指標 (BarGenerator 會依此自動註冊) ---
+    # 格式: 欄位名 -> (類型, 參數...)，類型可用 sma / ema / rsi / atr / boll
+    # 策略讀的是 ma5 / ma20 兩個欄位；想跟 backtest.py 一致就改成 ("sma", 15) / ("sma", 150)
+    INDICATORS = {
+        "ma5": ("sma", 5),
+        "ma20": ("sma", 20),
+    }
+
+    # --- K 線週期 (BotEngine 依此建立合成樹) ---
+    # 可用 1, 3, 5, 15, 60 ... 分鐘，以及 "session" (整個交易時段)
+    TIMEFRAMES = [1, 5]
+
+    # --- 報價處理模式 ---
+    # "async" = 報價 callback 只丟進緩衝區，由引擎執行緒處理 (下游慢也不會卡報價)
+    # "sync"  = 在券商的 callback 執行緒上直接跑完整條流程 (舊行為)
+    INGEST_MODE = os.getenv("INGEST_MODE", "async")
+    INGEST_CAPACITY = int(os.getenv("INGEST_CAPACITY", "8192"))
+    # 緩衝區滿了怎麼辦：預設 "block" (不掉 Tick，K 棒的量價才會正確)
+    # "drop_oldest" / "conflate" 會丟掉或合併 Tick (OHLC / 成交量 / 訊號都可能失真)，要自己明確打開
+    INGEST_OVERFLOW = os.getenv("INGEST_OVERFLOW", "block")  # block / drop_oldest / conflate
+
+    # --- 錄製器 (Recorder / BarRecorder) 批次寫檔 ---
+    RECORDER_BATCH_SIZE = int(os.getenv("RECORDER_BATCH_SIZE", "512"))     # 每批最多幾筆
+    RECORDER_BATCH_MS = float(os.getenv("RECORDER_BATCH_MS", "50"))        # 每批最多等幾毫秒
+    RECORDER_QUEUE_SIZE = int(os.getenv("RECORDER_QUEUE_SIZE", "100000"))  # 佇列上限，超過先進溢出區
+    RECORDER_SPILL_SIZE = int(os.getenv("RECORDER_SPILL_SIZE", "400000"))  # 溢出區上限，再滿就丟掉並計數
+    RECORDER_FLUSH_INTERVAL = float(os.getenv("RECORDER_FLUSH_INTERVAL", "1.0"))  # 幾秒 flush 一次 (0 = 每批)
+    RECORDER_FSYNC = os.getenv("RECORDER_FSYNC", "0") == "1"              # flush 時是否順便 fsync
+    RECORDER_BINARY = os.getenv("RECORDER_BINARY", "1") == "1"            # 同時寫欄式二進位封存
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")                # 二進位封存根目錄
+
+    # --- 歷史資料庫 (modules/history_store.py，依合約 / 交易日分檔) ---
+    HISTORY_DIR = os.getenv("HISTORY_DIR", "data/history")
+    HISTORY_CACHE_DAYS = int(os.getenv("HISTORY_CACHE_DAYS", "512"))    # 行程內快取幾個已解析的分檔
+
+    # --- 回測模擬券商 (modules/sim_broker.py，單位: 點 / 口 / 邊) ---
+    SIM_SLIPPAGE = float(os.getenv("SIM_SLIPPAGE", "1.0"))   # 市價單滑價 (買進往上、賣出往下)
+    SIM_FEE = float(os.getenv("SIM_FEE", "1.5"))             # 手續費 + 期交稅；來回合計 5 點，同 optimize.py 的摩擦成本
+
+    # --- 延遲追蹤 (core/latency.py)：Tick -> 引擎 -> 策略 -> 下單 各站的延遲直方圖 ---
+    # 打開後可用 Telegram /latency 查詢，下班時會印出並存到 data/YYYY-MM-DD/latency_*.json
+    LATENCY_TRACE = os.getenv("LATENCY_TRACE", "0") == "1"
+
+    # --- 監控端點 (core/metrics.py)：Prometheus 文字格式，只聽本機 ---
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))   # 0 = 不開
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # --- 熱路徑取樣分析器 (core/profiler.py)：Telegram /profile start|stop ---
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))   # 取樣間隔
+    PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))   # 忘了關也最多跑這麼久
+
     # --- 🔴 核彈發射鑰匙 (最重要的開關) ---
     # True  = 演習模式 (只會印 Log，絕對不會送出單)
     # False = 實戰模式 (真金白銀，請小心！)
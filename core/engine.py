@@ -1,58 +1,137 @@
 from modules.bar_generator import BarGenerator, BarResampler
+from core import metrics
 
 class BotEngine:
-    def __init__(self, strategy, recorders=None):
+    def __init__(self, strategy, recorders=None, timeframes=(1, 5), tracer=None):
         """
         :param strategy: 已經初始化的策略物件 (Strategy)
-        :param recorders: (選填) 字典，包含 'tick', '1min', '5min' 的記錄器
+        :param recorders: (選填) 字典，包含 'tick', '1min', '5min', '15min', 'session' ... 的記錄器
+                          (等同對每個 key 呼叫一次 add_sink)
+        :param timeframes: 要合成的週期 (分鐘)，可加 "session" 代表整個交易時段
+                           例如 [1, 3, 5, 15, 60, "session"]
+        :param tracer: (選填) core.latency.LatencyTracer，有給才會記錄各站延遲
         """
         self.strategy = strategy
-        self.recorders = recorders or {} # 如果沒給，就設為空字典
-        
-        # --- 建立 K 線合成鏈 ---
-        # 邏輯順序：Tick -> 1分K -> 5分K
-        
-        # 1. 準備 5分K 合成器 (等待 1分K 餵給它)
-        self.resampler_5m = BarResampler(interval=5, on_bar_callback=self._on_5min_bar)
-        
-        # 2. 準備 1分K 生成器 (等待 Tick 餵給它)
+        self.tracer = tracer
+
+        # 輸出端 (sink)：任何有 put() 的物件都能掛，例如 Recorder / BarRecorder
+        # key 是資料流名稱：'tick'、'1min'、'5min'... 或 'session'
+        self.sinks = {}
+
+        # 每個週期的訂閱者 (策略可以同時訂閱好幾個週期)
+        self.callbacks = {1: [self.strategy.on_bar]}
+
+        # --- 建立 K 線合成樹 ---
+        # 邏輯順序：Tick -> 1分K -> 3分K / 5分K -> 15分K -> 60分K ...
+        # 每個週期掛在「能整除它的最大週期」底下，只需要一次合成就能往上傳
+        self.timeframes = [1] + sorted({tf for tf in timeframes if tf not in (1, "session")})
+        if "session" in timeframes:
+            self.timeframes.append("session")
+
+        self.resamplers = {}
+        self.children = {tf: [] for tf in self.timeframes}
+        for tf in self.timeframes[1:]:
+            parent = self._pick_parent(tf)
+            self.resamplers[tf] = BarResampler(interval=tf, on_bar_callback=self._make_dispatcher(tf))
+            self.children[parent].append(self.resamplers[tf])
+
+        # 1分K 生成器 (等待 Tick 餵給它)
         self.bg = BarGenerator(on_bar_callback=self._on_1min_bar)
 
+        for stream, sink in (recorders or {}).items():
+            self.add_sink(stream, sink)
+
+        # 每個週期收完幾根 K 棒 (監控用，每根 K 棒才加一次)
+        self._bar_counters = {tf: metrics.counter("engine_bars_total", "引擎收完的 K 棒數",
+                                                  labels={"tf": self._label(tf)})
+                              for tf in self.timeframes}
+
+    def _pick_parent(self, tf):
+        """找出能整除 tf 的最大已建立週期 (交易時段以 15 分鐘對齊，08:45 / 13:45 / 15:00 / 05:00)"""
+        base = 15 if tf == "session" else tf
+        built = [p for p in self.timeframes if p != "session" and p != tf and base % p == 0]
+        return max(built)
+
+    def _make_dispatcher(self, tf):
+        def dispatch(bar):
+            self._on_bar(tf, bar)
+        return dispatch
+
+    @staticmethod
+    def _label(tf):
+        return "session" if tf == "session" else f"{tf}min"
+
+    def add_sink(self, stream, sink):
+        """
+        掛上輸出端 (存檔器)
+        :param stream: 'tick' 或週期名稱 ('1min', '5min', 'session' ...)
+        :param sink: 有 put(item) 方法的物件
+        """
+        self.sinks.setdefault(stream, []).append(sink)
+
+    def subscribe(self, timeframe, callback):
+        """訂閱某個週期的 K 棒 (例如 engine.subscribe(15, strategy.on_15min_bar))"""
+        if timeframe not in self.children:
+            raise ValueError(f"引擎沒有建立 {timeframe} 週期，請在 timeframes 裡加上它")
+        self.callbacks.setdefault(timeframe, []).append(callback)
+
     def process_tick(self, tick):
         """
         [入口] 外部 (API 或 回測) 只要呼叫這個方法，剩下的全自動
         """
-        # 1. 如果有設定 Tick 記錄器，就存檔
-        if 'tick' in self.recorders:
-            self.recorders['tick'].put(tick)
-            
+        tracer = self.tracer
+        if tracer is not None:
+            started = tracer.begin_tick(tick)
+
+        # 1. 如果有掛 Tick 輸出端，就存檔
+        for sink in self.sinks.get('tick', ()):
+            sink.put(tick)
+
         # 2. 餵給 1分K 生成器
         self.bg.update_tick(tick)
 
+        if tracer is not None:
+            tracer.end_tick(started)
+
     def _on_1min_bar(self, bar):
         """
         [內部邏輯] 當 1 分 K 生成後的標準作業程序 (SOP)
         """
         # 1. 顯示 (你可以選擇在 main 裡面印，也可以在這裡印)
         # 為了回測乾淨，我們這裡不強制 print，讓外部自己決定
-        
-        # 2. 存檔 (1分K)
-        if '1min' in self.recorders:
-            self.recorders['1min'].put(bar)
-            
-        # 3. 傳給 5分K 合成器
-        self.resampler_5m.update_bar(bar)
-        
-        # 4. 【關鍵】餵給策略大腦
-        self.strategy.on_bar(bar)
-
-    def _on_5min_bar(self, bar):
-        """
-        [內部邏輯] 當 5 分 K 生成後的 SOP
-        """
-        # 1. 存檔 (5分K)
-        if '5min' in self.recorders:
-            self.recorders['5min'].put(bar)
-            
-        # 2. (選用) 如果你有 5分K 的策略，也可以在這裡呼叫
-        # self.strategy.on_5min_bar(bar)
\ No newline at end of file
+        tracer = self.tracer
+        if tracer is None:
+            self._on_bar(1, bar)
+            return
+
+        # 延遲追蹤：K 棒收完的時間點 + 策略 (1 分 K 訂閱者) 花了多久
+        tracer.bar_closed()
+        self._on_bar(1, bar, tracer)
+
+    def _on_bar(self, tf, bar, tracer=None):
+        """
+        [內部邏輯] 任一週期 K 棒完成後的 SOP：存檔 -> 往上層合成 -> 通知訂閱者
+        """
+        self._bar_counters[tf].inc()
+
+        # 1. 存檔 (每根 K 棒只在這裡寫一次)
+        for sink in self.sinks.get(self._label(tf), ()):
+            sink.put(bar)
+
+        # 2. 傳給更大週期的合成器
+        for child in self.children[tf]:
+            child.update_bar(bar)
+
+        # 3. 【關鍵】餵給策略大腦 (與其他訂閱者)
+        if tracer is not None:
+            t0 = tracer.now()
+        for cb in self.callbacks.get(tf, ()):
+            cb(bar)
+        if tracer is not None:
+            tracer.record("strategy", tracer.now() - t0)
+
+    def flush(self):
+        """收盤/回測結束時，把各週期還沒收完的 K 棒送出去 (由小到大)"""
+        self.bg.flush()
+        for tf in self.timeframes[1:]:
+            self.resamplers[tf].flush()
@@ -0,0 +1,180 @@
+import threading
+import time
+from core import metrics
+
+# ==========================================
+# 報價接收與處理分離 (非同步模式)
+# ==========================================
+# Shioaji 的 callback 只把 Tick 丟進固定容量的環形緩衝區就立刻返回，
+# 由專屬的引擎執行緒取出來跑 BotEngine -> Strategy -> Trader。
+# 下游再慢 (下單、發 Telegram) 都不會卡住券商的報價執行緒。
+
+
+class TickRingBuffer:
+    """
+    固定容量的 Tick 環形緩衝區 (多執行緒安全)
+
+    滿了的時候依 policy 處理：
+    - "block"       : 等到有空位 (預設；不掉資料，但會卡住報價執行緒)
+    - "drop_oldest" : 丟掉最舊的一筆 (保證最新行情一定進得來，但 K 棒的開高低量會失真)
+    - "conflate"    : 併入最後一筆 (價格取最新、成交量相加)，不掉量但會損失中間價位
+    """
+    LOSSY = ("drop_oldest", "conflate")
+    POLICIES = ("block", "drop_oldest", "conflate")
+
+    def __init__(self, capacity=8192, policy="block"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的溢位策略: {policy} (可用: {', '.join(self.POLICIES)})")
+        self.capacity = capacity
+        self.policy = policy
+        self.items = [None] * capacity
+        self.stamps = [0.0] * capacity   # 放進來的時間 (monotonic)，用來算排隊延遲
+        self.head = 0
+        self.size = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+        # --- 監控數字 ---
+        self.max_depth = 0
+        self.dropped = 0
+        self.conflated = 0
+
+    def put(self, tick):
+        """[報價執行緒] 放入一筆 Tick，盡量不等待"""
+        now = time.monotonic()
+        cap = self.capacity
+        with self.cond:
+            if self.size == cap:
+                if self.policy == "block":
+                    while self.size == cap and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                elif self.policy == "drop_oldest":
+                    self.items[self.head] = None
+                    self.head = (self.head + 1) % cap
+                    self.size -= 1
+                    self.dropped += 1
+                else:
+                    last = self.items[(self.head + self.size - 1) % cap]
+                    last.datetime = tick.datetime
+                    last.close = tick.close
+                    last.volume += tick.volume
+                    self.conflated += 1
+                    return
+
+            tail = (self.head + self.size) % cap
+            self.items[tail] = tick
+            self.stamps[tail] = now
+            self.size += 1
+            if self.size > self.max_depth:
+                self.max_depth = self.size
+            self.cond.notify()
+
+    def get_batch(self, max_items=256, timeout=0.5):
+        """[引擎執行緒] 一次取出最多 max_items 筆，回傳 [(tick, 放入時間), ...]"""
+        with self.cond:
+            if self.size == 0 and not self.closed:
+                self.cond.wait(timeout)
+            n = min(self.size, max_items)
+            out = []
+            cap = self.capacity
+            for _ in range(n):
+                out.append((self.items[self.head], self.stamps[self.head]))
+                self.items[self.head] = None
+                self.head = (self.head + 1) % cap
+            self.size -= n
+            if n and self.policy == "block":
+                self.cond.notify_all()   # 叫醒在等空位的報價執行緒
+            return out
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return self.size
+
+
+class IngestWorker(threading.Thread):
+    """引擎執行緒：從緩衝區取 Tick 餵給 BotEngine"""
+
+    def __init__(self, engine, capacity=8192, policy="block", batch_size=256):
+        super().__init__(name="IngestWorker", daemon=True)
+        self.engine = engine
+        self.buffer = TickRingBuffer(capacity=capacity, policy=policy)
+        self.batch_size = batch_size
+        self.running = True
+
+        # --- 監控數字 ---
+        self.processed = 0
+        self.last_lag = 0.0   # 最近一筆 Tick 在緩衝區等了多久 (秒)
+        self.max_lag = 0.0
+        self._last_warn = 0.0
+        self._warned = (0, 0)   # 上次提醒時的 (丟棄, 合併) 筆數
+
+        metrics.counter("engine_ticks_total", "引擎處理完的 Tick 數", fn=lambda: self.processed)
+        metrics.gauge("ingest_queue_depth", "報價緩衝區目前排隊的 Tick 數", fn=lambda: len(self.buffer))
+        metrics.gauge("ingest_lag_seconds", "最近一筆 Tick 在緩衝區等了多久 (秒)", fn=lambda: self.last_lag)
+        metrics.gauge("ingest_max_lag_seconds", "Tick 在緩衝區等過最久的時間 (秒)", fn=lambda: self.max_lag)
+        metrics.counter("ingest_dropped_total", "緩衝區滿了被丟掉的 Tick 數", fn=lambda: self.buffer.dropped)
+        metrics.counter("ingest_conflated_total", "緩衝區滿了被合併的 Tick 數", fn=lambda: self.buffer.conflated)
+
+    def put(self, tick):
+        """[報價執行緒] MarketData 只呼叫這個"""
+        self.buffer.put(tick)
+
+    def run(self):
+        print(f"🧵 [引擎執行緒] 啟動！(容量: {self.buffer.capacity}, 溢位策略: {self.buffer.policy})")
+        if self.buffer.policy in TickRingBuffer.LOSSY:
+            print(f"⚠️ [引擎執行緒] 溢位策略 {self.buffer.policy} 在處理跟不上時會丟棄/合併 Tick，K 棒量價可能失真")
+        while self.running or len(self.buffer):
+            batch = self.buffer.get_batch(self.batch_size)
+            if not batch:
+                continue
+            for tick, stamp in batch:
+                lag = time.monotonic() - stamp
+                self.last_lag = lag
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                try:
+                    self.engine.process_tick(tick)
+                except Exception as e:
+                    print(f"❌ [引擎執行緒錯誤] {e}")
+                self.processed += 1
+            self._warn_if_lossy()
+        self._warn_if_lossy(force=True)
+        print("🧵 [引擎執行緒] 已下班。")
+
+    def _warn_if_lossy(self, force=False):
+        """
+        有新的丟棄/合併就提醒 (第一次發生立刻印，之後最多每 10 秒一次)
+        :param force: 下班時不管間隔，有沒報過的就印出來
+        """
+        counts = (self.buffer.dropped, self.buffer.conflated)
+        if counts == self._warned:
+            return
+        now = time.monotonic()
+        if force or self._warned == (0, 0) or now - self._last_warn >= 10:
+            self._last_warn = now
+            self._warned = counts
+            print(f"\n⚠️ [引擎執行緒] 處理跟不上報價：已丟棄 {counts[0]} 筆、"
+                  f"合併 {counts[1]} 筆 (最大排隊 {self.buffer.max_depth})")
+
+    def stats(self):
+        """佇列深度與延遲 (給 Commander / 監控用)"""
+        return {
+            "depth": len(self.buffer),
+            "max_depth": self.buffer.max_depth,
+            "dropped": self.buffer.dropped,
+            "conflated": self.buffer.conflated,
+            "processed": self.processed,
+            "last_lag_ms": self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
+
+    def stop(self):
+        """停止接收，處理完緩衝區剩下的 Tick 才下班"""
+        self.running = False
+        self.buffer.close()
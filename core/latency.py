@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# ==========================================
+# Tick-to-trade 延遲追蹤 (選用，Settings.LATENCY_TRACE 打開才會掛上)
+# ==========================================
+# 報價 callback 收到 Tick 時蓋一個 monotonic 時間戳 (Tick.recv_ns)，
+# 之後每一站都拿「現在」跟這個時間戳比，丟進各站的直方圖：
+#
+#   MarketData --(queue)--> BotEngine.process_tick --(bar)--> Strategy.on_bar --(order)--> Trader.place_order
+#                           |<------ engine ------>|          |<- strategy ->|            |<--- broker --->|
+#   |<------------------------------------------ tick_to_trade ------------------------------------------->|
+#
+# 直方圖是 HDR 風格的對數-線性分桶：每個 2 的次方區間切 32 格 (相對誤差 < 3.2%)，
+# 記一筆只要算索引 + 一次 list 加法，不存原始樣本，記憶體固定。
+
+_now = time.perf_counter_ns
+
+STAGES = {
+    "queue": "收到報價 -> 引擎開始處理 (非同步模式的排隊時間)",
+    "engine": "process_tick 整段 (含合成 K 棒、策略、下單)",
+    "bar": "收到報價 -> 1 分 K 收完送出 (只算有收 K 棒的 Tick)",
+    "strategy": "1 分 K 訂閱者 (Strategy.on_bar ...) 執行時間",
+    "order": "收到報價 -> 進入 Trader.place_order",
+    "broker": "Trader.place_order 本身 (送單 API)",
+    "tick_to_trade": "收到報價 -> 委託送出 (place_order 返回)",
+}
+
+
+class LatencyHistogram:
+    SUB_BITS = 5
+    SUB = 1 << SUB_BITS          # 每個 2 的次方區間切幾格
+    LINEAR = SUB * 2             # 小於這個值直接一格一個奈秒
+
+    def __init__(self):
+        self.counts = [0] * 1024   # 涵蓋到 2^36 奈秒 (約 68 秒)，更慢的樣本會自動加長
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.min = None
+
+    @classmethod
+    def _index(cls, v):
+        if v < cls.LINEAR:
+            return v
+        shift = v.bit_length() - cls.SUB_BITS - 1
+        return cls.LINEAR + (shift - 1) * cls.SUB + ((v >> shift) - cls.SUB)
+
+    @classmethod
+    def _upper(cls, idx):
+        """這一格能代表的最大值"""
+        if idx < cls.LINEAR:
+            return idx
+        shift = (idx - cls.LINEAR) // cls.SUB + 1
+        mant = (idx - cls.LINEAR) % cls.SUB + cls.SUB
+        return ((mant + 1) << shift) - 1
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        idx = self._index(ns)
+        if idx >= len(self.counts):
+            self.counts.extend([0] * (idx + 1 - len(self.counts)))
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+
+    def percentile(self, q):
+        """第 q 百分位 (奈秒，回傳該格上緣，不超過實際最大值)"""
+        if not self.count:
+            return 0
+        target = max(int(self.count * q / 100.0 + 0.5), 1)
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self._upper(idx), self.max)
+        return self.max
+
+    def snapshot(self):
+        """摘要 (微秒)"""
+        if not self.count:
+            return {"count": 0}
+        us = 1e-3
+        return {
+            "count": self.count,
+            "min_us": self.min * us,
+            "mean_us": self.total / self.count * us,
+            "p50_us": self.percentile(50) * us,
+            "p90_us": self.percentile(90) * us,
+            "p99_us": self.percentile(99) * us,
+            "p999_us": self.percentile(99.9) * us,
+            "max_us": self.max * us,
+        }
+
+
+class LatencyTracer:
+    """
+    各站的延遲直方圖
+    引擎執行緒在 begin_tick / end_tick 之間處理的東西，都以那筆 Tick 的收到時間為起點
+    """
+
+    def __init__(self):
+        self.hist = {s: LatencyHistogram() for s in STAGES}
+        self.started = datetime.now()
+        self.origin = 0         # 目前處理中那筆 Tick 的收到時間 (0 = 沒有在處理 Tick)
+        self._engine_tid = None
+
+    # --- 引擎執行緒 ---
+
+    def begin_tick(self, tick):
+        now = _now()
+        recv = getattr(tick, "recv_ns", 0) or now
+        self.origin = recv
+        self._engine_tid = threading.get_ident()
+        self.hist["queue"].record(now - recv)
+        return now
+
+    def end_tick(self, started):
+        self.hist["engine"].record(_now() - started)
+        self.origin = 0
+
+    def bar_closed(self):
+        if self.origin:
+            self.hist["bar"].record(_now() - self.origin)
+
+    def record(self, stage, ns):
+        self.hist[stage].record(ns)
+
+    @staticmethod
+    def now():
+        return _now()
+
+    # --- 下單 (Trader) ---
+
+    def order_start(self):
+        now = _now()
+        if self.origin and threading.get_ident() == self._engine_tid:
+            self.hist["order"].record(now - self.origin)
+        return now
+
+    def order_end(self, started):
+        now = _now()
+        self.hist["broker"].record(now - started)
+        # 手動指令 (Commander 執行緒) 下的單沒有對應的 Tick，不算 tick-to-trade
+        if self.origin and threading.get_ident() == self._engine_tid:
+            self.hist["tick_to_trade"].record(now - self.origin)
+
+    # --- 報表 ---
+
+    def snapshot(self):
+        return {s: h.snapshot() for s, h in self.hist.items()}
+
+    def reset(self):
+        self.hist = {s: LatencyHistogram() for s in STAGES}
+        self.started = datetime.now()
+
+    def report(self):
+        """給 Commander /latency 與下班時印出的文字報表 (單位: 微秒)"""
+        lines = [f"⏱️ **延遲統計** (自 {self.started.strftime('%H:%M:%S')} 起，單位 µs)", "----------------"]
+        for stage, snap in self.snapshot().items():
+            if not snap["count"]:
+                lines.append(f"{stage}: 無資料")
+                continue
+            lines.append(f"{stage}: n={snap['count']} p50={snap['p50_us']:.0f} "
+                         f"p99={snap['p99_us']:.0f} max={snap['max_us']:.0f}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """寫成 JSON (預設 data/YYYY-MM-DD/latency_HHMMSS.json)，回傳路徑"""
+        if path is None:
+            now = datetime.now()
+            path = f"data/{now.strftime('%Y-%m-%d')}/latency_{now.strftime('%H%M%S')}.json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {"started": self.started.isoformat(timespec="seconds"),
+                "dumped": datetime.now().isoformat(timespec="seconds"),
+                "stages": {s: {"desc": STAGES[s], **snap} for s, snap in self.snapshot().items()}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
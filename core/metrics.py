@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 行程內監控指標 (Prometheus 文字格式，只開在本機)
+# ==========================================
+# - Counter：只會增加的累計數 (Tick 數、K 棒數、下單數、Telegram 成功/失敗...)
+#   每個執行緒各自累加自己的格子 (threading.local)，不用上鎖，抓取 (scrape) 時才加總
+# - Gauge：當下的數值 (佇列深度、排隊延遲、倉位...)，可以 set()，也可以給 fn 在抓取時才讀
+# - Rate：某個 Counter 每秒增加多少 (最近 window 秒的平均；誰來抓、抓幾次都是同一個值)
+#
+# 元件已經自己有統計數字的 (例如 TelegramBot.sent、BatchWriter.written)，
+# 直接註冊 fn 讀那個屬性，熱路徑上完全不用多做事。
+#
+#   curl http://127.0.0.1:9108/metrics
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _fmt_value(v):
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, int):
+        return str(v)
+    return repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def _new_cell(self):
+        cell = [0]
+        with self._lock:
+            self._cells.append(cell)
+        self._local.cell = cell
+        return cell
+
+    def inc(self, n=1):
+        """[任何執行緒] 累加到自己執行緒的格子"""
+        try:
+            self._local.cell[0] += n
+        except AttributeError:
+            self._new_cell()[0] += n
+
+    def value(self):
+        if self.fn is not None:
+            return self.fn()
+        with self._lock:
+            return sum(c[0] for c in self._cells)
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self._value = 0
+
+    def set(self, v):
+        self._value = v
+
+    def value(self):
+        if self.fn is not None:
+            return self.fn()
+        return self._value
+
+
+class Rate(Gauge):
+    """
+    某個 Counter 每秒的增加量 (最近 window 秒的平均)
+    每次讀取都留一個 (時間, 累計數) 樣本 (最多每秒一個)，拿「剛好超過 window 秒前」的那個當起點，
+    所以好幾個抓取端 (Prometheus、/metrics 手動 curl ...) 交錯讀，看到的都是同一段區間的速率
+    """
+
+    def __init__(self, name, help, counter, labels=(), window=60.0):
+        super().__init__(name, help, labels)
+        self.counter = counter
+        self.window = window
+        self._samples = deque([(time.monotonic(), counter.value())])
+        self._lock = threading.Lock()
+
+    def value(self):
+        with self._lock:
+            now, v = time.monotonic(), self.counter.value()
+            samples = self._samples
+            # 起點只保留一個在 window 之前的樣本
+            while len(samples) > 1 and samples[1][0] <= now - self.window:
+                samples.popleft()
+            if now - samples[-1][0] >= 1.0:
+                samples.append((now, v))
+            t0, v0 = samples[0]
+        return (v - v0) / (now - t0) if now > t0 else 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}   # (名稱, 標籤) -> 指標
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        key = (metric.name, metric.labels)
+        with self._lock:
+            old = self._metrics.get(key)
+            # 同名同標籤的 Counter 重複註冊時共用同一個 (例如模組重新載入、好幾個實例)
+            if old is not None and old.kind == metric.kind and metric.fn is None and not isinstance(metric, Rate):
+                return old
+            self._metrics[key] = metric
+            return metric
+
+    def counter(self, name, help, labels=None, fn=None):
+        """
+        :param labels: 標籤字典，例如 {"tf": "5min"}
+        :param fn: (選填) 抓取時呼叫的函式 (元件自己已經有累計數時用)
+        """
+        return self._register(Counter(name, help, tuple(sorted((labels or {}).items())), fn))
+
+    def gauge(self, name, help, labels=None, fn=None):
+        return self._register(Gauge(name, help, tuple(sorted((labels or {}).items())), fn))
+
+    def rate(self, name, help, counter, labels=None, window=60.0):
+        """:param window: 算最近幾秒的平均"""
+        return self._register(Rate(name, help, counter, tuple(sorted((labels or {}).items())), window))
+
+    def unregister(self, metric):
+        with self._lock:
+            if self._metrics.get((metric.name, metric.labels)) is metric:
+                del self._metrics[(metric.name, metric.labels)]
+
+    def render(self):
+        """Prometheus 文字格式 (同名的指標排在一起，只印一次 HELP / TYPE)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+        lines = []
+        last = None
+        for m in metrics:
+            try:
+                v = m.value()
+            except Exception:
+                continue
+            if v is None:
+                continue
+            if m.name != last:
+                lines.append(f"# HELP {m.name} {m.help}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+                last = m.name
+            lines.append(f"{m.name}{_fmt_labels(m.labels)} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+
+# 全系統共用的註冊表
+REGISTRY = MetricsRegistry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+rate = REGISTRY.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass   # 不要每次抓取都印一行
+
+
+def serve_metrics(port, host="127.0.0.1", registry=REGISTRY):
+    """
+    在背景執行緒開 /metrics (預設只聽本機)
+    :return: HTTP server (關機時呼叫 shutdown())；埠被占用回傳 None
+    """
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"⚠️ [Metrics] 無法開啟 {host}:{port} ({e})，監控端點停用")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    print(f"📈 [Metrics] 監控端點: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,44 @@
+class Tick:
+    """
+    內部統一的 Tick 格式 (全系統共用)
+    用 __slots__ 固定欄位：不建 __dict__，每筆 Tick 省記憶體、屬性存取也比較快
+    """
+    __slots__ = ('datetime', 'close', 'volume', 'code', 'recv_ns')
+
+    def __init__(self, datetime, close, volume, code=None, recv_ns=0):
+        self.datetime = datetime
+        self.close = close
+        self.volume = volume
+        self.code = code
+        self.recv_ns = recv_ns   # 收到報價的 time.perf_counter_ns() (延遲追蹤用，0 = 沒蓋)
+
+    @classmethod
+    def from_shioaji(cls, t, recv_ns=0):
+        """把 Shioaji 的 TickFOPv1 轉成內部格式"""
+        return cls(t.datetime, float(t.close), int(t.volume), getattr(t, 'code', None), recv_ns)
+
+    def __repr__(self):
+        return f"<Tick {self.code} {self.datetime} {self.close} x{self.volume}>"
+
+
+class Bar:
+    """
+    內部統一的 K 棒格式 (BarGenerator / BarResampler / BotEngine / 記錄器 / 策略 共用)
+    OHLCV 是固定欄位；指標放在 ind 字典裡 (例如 bar.ind['ma5'])，
+    不再一路往 dict 塞新 key。
+    """
+    __slots__ = ('dt', 'open', 'high', 'low', 'close', 'volume', 'interval', 'ind')
+
+    def __init__(self, dt, open, high, low, close, volume, interval=1, ind=None):
+        self.dt = dt
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.interval = interval   # 標記這是幾分 K ("session" 代表整個交易時段)
+        self.ind = ind if ind is not None else {}
+
+    def __repr__(self):
+        return (f"<Bar {self.interval} {self.dt} O:{self.open} H:{self.high} "
+                f"L:{self.low} C:{self.close} V:{self.volume}>")
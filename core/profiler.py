@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# ==========================================
+# 熱路徑取樣分析器 (執行中隨時開關，不必重啟)
+# ==========================================
+# 背景執行緒每隔幾毫秒看一次「報價 callback 執行緒」與「引擎執行緒」正在跑哪一行
+# (sys._current_frames)，把呼叫堆疊累計起來。停止時寫成 collapsed stack 格式：
+#
+#   IngestWorker;run (ingest.py:133);process_tick (engine.py:92);update_tick (bar_generator.py:40) 123
+#
+# 可以直接丟給 flamegraph.pl / speedscope / inferno 畫火焰圖。
+#
+# 開銷控制：
+# - 只看指定的執行緒，不用 sys.setprofile (被分析的程式碼完全不會變慢，只多了取樣執行緒搶 GIL)
+# - 取樣本身花的時間超過預算 (max_overhead) 就自動拉長間隔
+# - 超過 max_seconds 自動停止，忘了關也不會一直跑
+
+
+class SamplingProfiler:
+    def __init__(self, threads, interval_ms=5.0, max_seconds=300, max_overhead=0.02, max_depth=64):
+        """
+        :param threads: 回傳 {thread ident: 顯示名稱} 的函式 (每次取樣都會問，執行緒晚點才出現也抓得到)
+        :param interval_ms: 取樣間隔 (毫秒)
+        :param max_seconds: 最長取樣時間，到了自動停止
+        :param max_overhead: 取樣耗時佔牆鐘時間的上限 (超過就拉長間隔)
+        :param max_depth: 每個堆疊最多記幾層
+        """
+        self.threads = threads
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+
+        self.stacks = Counter()
+        self.samples = 0
+        self.busy = 0.0          # 取樣本身花掉的時間
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._labels = {}        # code 物件 -> 顯示文字 (快取，避免每次都拼字串)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return False
+        self._stop.clear()
+        self.started = datetime.now()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return False
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self._thread = None
+        return True
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        t_start = time.perf_counter()
+        interval = self.interval
+        while not self._stop.wait(interval):
+            t0 = time.perf_counter()
+            if t0 - t_start >= self.max_seconds:
+                print(f"\n⏹️ [Profiler] 已取樣 {self.max_seconds} 秒，自動停止")
+                break
+
+            targets = self.threads()
+            if targets:
+                frames = sys._current_frames()
+                for tid, name in targets.items():
+                    frame = frames.get(tid)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(name)
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+                del frames
+
+            cost = time.perf_counter() - t0
+            self.busy += cost
+            # 取樣太貴：把間隔拉長到 cost / max_overhead
+            if cost > interval * self.max_overhead:
+                interval = min(cost / self.max_overhead, 1.0)
+        self.elapsed = time.perf_counter() - t_start
+
+    # --- 結果 ---
+
+    def overhead(self):
+        return self.busy / self.elapsed if self.elapsed > 0 else 0.0
+
+    def top(self, n=5):
+        """最常出現在最上層 (正在執行) 的函式"""
+        leaves = Counter()
+        for stack, c in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += c
+        return leaves.most_common(n)
+
+    def write(self, path=None):
+        """寫成 collapsed stack 檔 (預設 data/YYYY-MM-DD/profile_HHMMSS.folded)，回傳路徑"""
+        if path is None:
+            now = self.started or datetime.now()
+            path = f"data/{now.strftime('%Y-%m-%d')}/profile_{now.strftime('%H%M%S')}.folded"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, c in sorted(self.stacks.items()):
+                f.write(f"{stack} {c}\n")
+        return path
+
+    def summary(self):
+        """給 Telegram 的摘要 (函式名稱常有底線，放在程式碼區塊裡，Markdown 才不會解析失敗)"""
+        lines = [f"🔬 **取樣結果**: {self.samples} 筆 / {self.elapsed:.1f} 秒 (取樣開銷 {self.overhead():.2%})", "```"]
+        total = sum(self.stacks.values()) or 1
+        for label, c in self.top():
+            lines.append(f"{c / total:6.1%}  {label}")
+        lines.append("```")
+        return "\n".join(lines)
+
+
+class ProfilerControl:
+    """給 Commander 用的開關：每次 start 建一個新的 SamplingProfiler，stop 時寫檔"""
+
+    def __init__(self, threads, interval_ms=5.0, max_seconds=300):
+        self.threads = threads
+        self.interval_ms = interval_ms
+        self.max_seconds = max_seconds
+        self.current = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.current is not None and self.current.running:
+                return "⚠️ 取樣已經在跑了 (/profile stop 結束)"
+            self.current = SamplingProfiler(self.threads, self.interval_ms, self.max_seconds)
+            self.current.start()
+            names = ", ".join(self.threads().values()) or "(目標執行緒還沒出現，出現後自動開始記錄)"
+            return f"🔬 開始取樣: {names}\n每 {self.interval_ms:g} ms 一次，最長 {self.max_seconds} 秒"
+
+    def stop(self):
+        with self._lock:
+            prof = self.current
+            if prof is None:
+                return "⚠️ 目前沒有在取樣 (/profile start 開始)"
+            prof.stop()
+            self.current = None
+            if not prof.samples:
+                return "⚠️ 沒有取到任何樣本 (報價/引擎執行緒還沒開始跑？)"
+            path = prof.write()
+            return f"{prof.summary()}\n📝 火焰圖資料: `{path}`"
+
+    def status(self):
+        prof = self.current
+        if prof is None:
+            return "💤 目前沒有在取樣"
+        state = "取樣中" if prof.running else "已自動停止 (輸入 /profile stop 存檔)"
+        return f"🔬 {state}：已取 {prof.samples} 筆"
@@ -9,8 +9,13 @@ from modules.trader import Trader
 from modules.strategy import Strategy
 from modules.commander import Commander
 from modules.notifier import TelegramBot
+from modules.recorder import BarRecorder
 from core.engine import BotEngine
 from core.state import SystemState
+from core.ingest import IngestWorker
+from core.latency import LatencyTracer
+from core.metrics import serve_metrics
+from core.profiler import ProfilerControl
 import threading
 
 def main():
@@ -37,17 +42,43 @@ def main():
             sys.exit(1) # 憑證沒啟動就實戰是非常危險的，強制關機
 
     # 2. 初始化核心組件
+    metrics_server = serve_metrics(Settings.METRICS_PORT, Settings.METRICS_HOST) if Settings.METRICS_PORT else None
     bot = TelegramBot()
     state = SystemState()
-    trader = Trader(api=api)
+    tracer = LatencyTracer() if Settings.LATENCY_TRACE else None
+    trader = Trader(api=api, tracer=tracer)
     strategy = Strategy(bot=bot, trader=trader)
-    engine = BotEngine(strategy=strategy)
+    engine = BotEngine(strategy=strategy, timeframes=Settings.TIMEFRAMES, tracer=tracer)
+
+    # K 線存檔統一掛在 BotEngine 上 (MarketData 不再自己合成、自己寫檔)
+    bar_recorders = [BarRecorder(symbol=Settings.TARGET_CONTRACT, interval=iv) for iv in ("1min", "5min")]
+    for rec in bar_recorders:
+        rec.daemon = True
+        rec.start()
+        engine.add_sink(rec.interval, rec)
 
     # 🟢 恢復：Telegram 啟動報告
     bot.send_message(f"🚀 **交易機器人已上線**\n合約：{Settings.TARGET_CONTRACT}\n模式：{'演習' if Settings.DRY_RUN else '實戰'}")
 
-    md = MarketData(api=api, engine=engine, state=state)
-    commander = Commander(bot=bot, system_state=state, trader=trader, strategy=strategy)
+    ingest = None
+    if Settings.INGEST_MODE == "async":
+        ingest = IngestWorker(engine, capacity=Settings.INGEST_CAPACITY, policy=Settings.INGEST_OVERFLOW)
+        ingest.start()
+
+    md = MarketData(api=api, engine=engine, state=state, ingest=ingest)
+
+    # 取樣分析器只看報價 callback 執行緒與引擎執行緒 (同步模式兩者是同一個)
+    def profile_targets():
+        targets = {}
+        if md.callback_tid:
+            targets[md.callback_tid] = "QuoteCallback"
+        if ingest and ingest.ident:
+            targets[ingest.ident] = "IngestWorker"
+        return targets
+    profiler = ProfilerControl(profile_targets, Settings.PROFILE_INTERVAL_MS, Settings.PROFILE_MAX_SECONDS)
+
+    commander = Commander(bot=bot, system_state=state, trader=trader, strategy=strategy,
+                          tracer=tracer, profiler=profiler)
     
     commander.daemon = True 
     commander.start()
@@ -78,7 +109,7 @@ def main():
                     report_msg = commander._sync_strategy_position()
                     
                     # 3. 將同步後的「真實狀態」回報至 Telegram
-                    bot.send_message(f"📊 **成交自動同步報告**\n{report_msg}")
+                    bot.send_message(f"📊 **成交自動同步報告**\n{report_msg}", urgent=True)
                 
                 # 開啟背景執行緒執行，不卡住主程式
                 threading.Thread(target=delayed_sync_report, daemon=True).start()
@@ -95,15 +126,34 @@ def main():
         # 🟢 恢復：Telegram 下班報告
         bot.send_message("👋 **機器人收到下班指令，正在關閉系統...**")
         try:
-            md.stop()        # 報價部門回報
+            md.stop()        # 報價部門回報 (退訂；處理中的 Tick 跑完才返回，之後的不再送進引擎)
+            if ingest:
+                ingest.stop()  # 引擎執行緒把緩衝區處理完
+                ingest.join(timeout=5)
+            if ingest and ingest.is_alive():
+                print("⚠️ [引擎] 緩衝區 5 秒內沒處理完，最後一根 K 棒不收了")
+            else:
+                engine.flush()   # 還沒收完的 1 分 K / N 分 K 送出去 (書記官收工前才寫得進檔)
+            for rec in bar_recorders:
+                rec.stop()   # K 線書記官收工
+                rec.join(timeout=2)
             commander.stop() # 指揮官部門回報
+            if metrics_server:
+                metrics_server.shutdown()
+            if profiler.current:
+                print(profiler.stop())   # 還在取樣就順便存檔
+            if tracer:
+                print(tracer.report())
+                print(f"⏱️ [延遲追蹤] 已存至: {tracer.dump()}")
             api.logout()
             print("✅ [API] 帳號登出成功。")
             bot.send_message("💤 **系統已安全離線。下班囉！**")
         except Exception as e:
             print(f"⚠️ [系統] 關閉時發生微小異常: {e}")
-            bot.send_message(f"⚠️ 關閉時有異常，請手動確認帳戶狀態。")
+            bot.send_message(f"⚠️ 關閉時有異常，請手動確認帳戶狀態。", urgent=True)
 
+        # Telegram 是背景發送，os._exit 前先把佇列裡的訊息送完
+        bot.flush(timeout=5)
         os._exit(0)
 
     signal.signal(signal.SIGINT, exit_gracefully)
@@ -1,15 +1,20 @@
-from datetime import datetime
-import collections
+from datetime import datetime, time, timedelta
+from config.settings import Settings
+from core.models import Bar
+from modules.indicators import build_indicators
 
 class BarGenerator:
 
-    def __init__(self, on_bar_callback):
+    def __init__(self, on_bar_callback, indicators=None):
+        """
+        :param on_bar_callback: 1 分 K 完成後通知誰?
+        :param indicators: (選填) 指標設定 {欄位名: (類型, 參數...)}，預設用 Settings.INDICATORS
+        """
         self.on_bar_callback = on_bar_callback
         self.current_bar = None
-        
-        # --- [新增] 用來存最近 N 根 K 棒的收盤價 ---
-        # deque 是一個雙向佇列，maxlen=20 代表只保留最近 20 根
-        self.history_closes = collections.deque(maxlen=20) 
+
+        # --- 增量指標 (每根 K 棒 O(1) 更新，週期長度不受限制) ---
+        self.indicators = build_indicators(indicators if indicators is not None else Settings.INDICATORS)
 
     def update_tick(self, tick):
         # ... (這部分保持不變) ...
@@ -18,100 +23,140 @@ class BarGenerator:
         tick_dt = tick.datetime
         tick_minute = tick_dt.replace(second=0, microsecond=0)
 
-        if self.current_bar is None or tick_minute > self.current_bar['dt']:
-            if self.current_bar:
-                self.on_bar_close(self.current_bar)
-            
-            self.current_bar = {
-                'dt': tick_minute,
-                'open': price,
-                'high': price,
-                'low': price,
-                'close': price,
-                'volume': volume
-            }
+        bar = self.current_bar
+        if (bar is None or tick_minute > bar.dt) and tick_minute.time() in SESSION_CLOSES:
+            # 13:45:00 / 05:00:00 的收盤撮合併進最後一分鐘，不另開一根只有一筆的 K 棒
+            tick_minute -= ONE_MINUTE
+        if bar is None or tick_minute > bar.dt:
+            if bar:
+                self.on_bar_close(bar)
+
+            self.current_bar = Bar(tick_minute, price, price, price, price, volume)
         else:
+            if price > bar.high: bar.high = price
+            if price < bar.low: bar.low = price
+            bar.close = price
+            bar.volume += volume
+
+    def flush(self):
+        """收盤/回放結束時，把還沒收完的 1 分 K 送出去"""
+        if self.current_bar is not None:
             bar = self.current_bar
-            bar['high'] = max(bar['high'], price)
-            bar['low'] = min(bar['low'], price)
-            bar['close'] = price
-            bar['volume'] += volume
+            self.current_bar = None
+            self.on_bar_close(bar)
 
     def on_bar_close(self, bar):
         """K 棒完成時"""
-        # 1. 把收盤價存入歷史紀錄
-        self.history_closes.append(bar['close'])
-        
-        # 2. [新增] 計算 MA5 和 MA20
-        ma5 = self.calculate_ma(5)
-        ma20 = self.calculate_ma(20)
-        
-        # 3. 把指標塞進 bar 資料裡，方便後面的人用
-        bar['ma5'] = ma5
-        bar['ma20'] = ma20
-        
-        # 4. 送出去
-        self.on_bar_callback(bar)
+        # 1. 更新所有指標，並把結果寫進 bar.ind，方便後面的人用
+        for ind in self.indicators:
+            ind.update(bar)
+            ind.publish(bar.ind)
 
-    def calculate_ma(self, n):
-        """計算最近 n 根的平均值"""
-        if len(self.history_closes) < n:
-            return None # 資料不足
-        
-        # 取最後 n 筆資料
-        # (這裡要注意：history_closes 是從舊到新，所以要切片取最後 n 個)
-        # 但因為 deque 不支援直接切片，我們轉成 list 處理
-        closes = list(self.history_closes)[-n:]
-        return sum(closes) / n
+        # 2. 送出去
+        self.on_bar_callback(bar)
     
+# --- 台指期交易時段 ---
+# 日盤 08:45 ~ 13:45，夜盤 15:00 ~ 隔日 05:00
+DAY_SESSION = (time(8, 45), time(13, 45))
+NIGHT_SESSION = (time(15, 0), time(5, 0))
+SESSION_CLOSES = (DAY_SESSION[1], NIGHT_SESSION[1])
+ONE_MINUTE = timedelta(minutes=1)
+
+def session_bounds(dt):
+    """回傳 dt 所屬交易時段的 (開始, 結束)"""
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    t = dt.time()
+    if DAY_SESSION[0] <= t < NIGHT_SESSION[0]:
+        start = datetime.combine(day.date(), DAY_SESSION[0])
+        end = datetime.combine(day.date(), DAY_SESSION[1])
+    else:
+        # 凌晨的 K 棒屬於前一天晚上開始的夜盤
+        if t < DAY_SESSION[0]:
+            day -= timedelta(days=1)
+        start = datetime.combine(day.date(), NIGHT_SESSION[0])
+        end = datetime.combine(day.date() + timedelta(days=1), NIGHT_SESSION[1])
+    return start.replace(tzinfo=dt.tzinfo), end.replace(tzinfo=dt.tzinfo)
+
 class BarResampler:
     def __init__(self, interval, on_bar_callback):
         """
-        :param interval: 要合成幾分鐘? (例如 5 代表 5分K)
+        :param interval: 要合成幾分鐘? (例如 5 代表 5分K)，"session" 代表整個交易時段
         :param on_bar_callback: 合成完成後通知誰?
+
+        從交易時段開盤起算對齊 (5分K 是 08:45、08:50 ...；60分K 是 08:45、09:45 ... 12:45，
+        夜盤 15:00、16:00 ...)，K 棒時間標記區間開始，不是數滿 N 根。
+        收盤那一分鐘 (13:45 / 05:00) 併進最後一根；該根已經送出時就丟掉，記在 late。
+        只保留一根跑動中的 K 棒，高低量隨到隨更新 (O(1))，不再暫存 1 分 K 清單。
         """
         self.interval = interval
         self.on_bar_callback = on_bar_callback
-        
-        # 暫存區 (用來堆疊 1 分 K)
-        self.bar_buffer = [] 
 
-    def update_bar(self, bar_1min):
+        self.current_bar = None
+        self.bucket_end = None
+        self.last_start = None   # 上一根送出的 K 棒的區間開始
+        self.late = 0            # 區間已經收盤才到的小 K 棒 (被丟掉的) 數量
+
+    def _bucket(self, dt):
+        """回傳 dt 所屬區間的 (開始時間, 收盤時間)"""
+        s_start, s_end = session_bounds(dt)
+        if dt == s_end:
+            # 收盤那一分鐘算進最後一根
+            dt -= ONE_MINUTE
+        elif dt > s_end:
+            # 休息時段 (13:46~14:59、05:01~08:44) 的 K 棒算進下一個時段的第一根
+            opening = NIGHT_SESSION[0] if s_end.time() == DAY_SESSION[1] else DAY_SESSION[0]
+            dt = datetime.combine(s_end.date(), opening).replace(tzinfo=dt.tzinfo)
+            s_start, s_end = session_bounds(dt)
+        if self.interval == "session":
+            return s_start, s_end
+
+        elapsed = int((dt - s_start).total_seconds()) // 60
+        start = s_start + timedelta(minutes=elapsed // self.interval * self.interval)
+        # 收盤時間最晚到該時段結束 (例如 60分K 的 12:45 那根，在 13:45 就收)
+        end = min(start + timedelta(minutes=self.interval), s_end)
+        return start, end
+
+    def update_bar(self, bar):
         """
-        收到一根 1 分 K，嘗試合成 N 分 K
+        收到一根較小週期的 K 棒，更新 N 分 K
         """
-        self.bar_buffer.append(bar_1min)
-
-        # 檢查是否集滿了 N 根
-        if len(self.bar_buffer) >= self.interval:
-            self.generate_n_min_bar()
-
-    def generate_n_min_bar(self):
-        """把 buffer 裡的 1 分 K 融合成一根 N 分 K"""
-        # 1. 取得第一根 (決定開盤價、時間)
-        first_bar = self.bar_buffer[0]
-        # 2. 取得最後一根 (決定收盤價)
-        last_bar = self.bar_buffer[-1]
-
-        # 3. 計算最高、最低、總量
-        # (這裡用 Python 的生成式語法，極快)
-        high_price = max(b['high'] for b in self.bar_buffer)
-        low_price = min(b['low'] for b in self.bar_buffer)
-        total_vol = sum(b['volume'] for b in self.bar_buffer)
-
-        # 4. 組合出新的 N 分 K
-        n_min_bar = {
-            'dt': first_bar['dt'],      # 時間通常用這根 K 棒的開始時間
-            'open': first_bar['open'],
-            'high': high_price,
-            'low': low_price,
-            'close': last_bar['close'],
-            'volume': total_vol,
-            'interval': self.interval   # 標記這是幾分 K
-        }
-
-        # 5. 清空緩衝區
-        self.bar_buffer.clear()
-
-        # 6. 發送出去
-        self.on_bar_callback(n_min_bar)
\ No newline at end of file
+        child_dt = bar.dt
+        child_end = child_dt + timedelta(minutes=bar.interval)
+        start, end = self._bucket(child_dt)
+
+        cur = self.current_bar
+        if cur is not None and start != cur.dt:
+            # 進入新的區間，但上一根還沒收 (中間缺 K 棒) -> 先送出
+            self._emit()
+            cur = None
+
+        if cur is None:
+            if self.last_start is not None and start <= self.last_start:
+                # 這個區間已經收盤送出了 (例如收盤後才到的 13:45 K 棒)，不再另開一根
+                self.late += 1
+                return
+            # 時間用這根 K 棒的開始時間，interval 標記這是幾分 K
+            self.current_bar = Bar(start, bar.open, bar.high, bar.low, bar.close, bar.volume,
+                                   interval=self.interval)
+            self.bucket_end = end
+        else:
+            if bar.high > cur.high: cur.high = bar.high
+            if bar.low < cur.low: cur.low = bar.low
+            cur.close = bar.close
+            cur.volume += bar.volume
+
+        # 最後一根小 K 棒已經到區間終點 -> 立刻收盤，不用等下一根
+        if child_end >= self.bucket_end:
+            self._emit()
+
+    def flush(self):
+        """收盤/回測結束時，把還沒收完的 K 棒送出去"""
+        if self.current_bar is not None:
+            self._emit()
+
+    def _emit(self):
+        bar = self.current_bar
+        self.current_bar = None
+        self.last_start = bar.dt
+        self.bucket_end = None
+        self.on_bar_callback(bar)
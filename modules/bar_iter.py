@@ -0,0 +1,61 @@
+import numpy as np
+from core.models import Bar
+from modules.vector_backtest import prefix_sum_mas
+
+# ==========================================
+# K 線回測的資料準備 (backtest.py / batch_backtest.py 共用)
+# ==========================================
+# 不依賴券商 SDK：批次回測、壓測工具只要 numpy / pandas 就能跑。
+
+# 回測用的指標 (Bar.ind 欄位名 -> 均線週期)；想把 MA5 改成 MA10，改這裡就好，不需重新錄製資料
+INDICATOR_WINDOWS = {
+    'ma5': 15,
+    'ma20': 150,
+}
+
+def calculate_indicators(df):
+    """
+    [回測引擎核心] 動態計算技術指標
+    所有均線共用一次前綴和 (一趟算完)，結果放在大寫欄位 (MA5 / MA20 ...)
+    """
+    # 確保資料按時間排序
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(inplace=True)
+
+    close = df['Close'].to_numpy(dtype=np.float64)
+    mas = prefix_sum_mas(close, list(INDICATOR_WINDOWS.values()))
+    for name, window in INDICATOR_WINDOWS.items():
+        df[name.upper()] = mas[window]
+
+    # 這裡也可以加 RSI, MACD, Bollinger Bands...
+    # df['RSI'] = ...
+
+    return df
+
+def iter_bars(df):
+    """
+    逐根產出 Bar (取代 df.iterrows()，不再每列包成 Series、逐欄轉型)
+    每個欄位整欄一次轉成 Python list；整場回測共用同一個 Bar 物件，每一步只更新欄位值
+    (策略只記數值不留 Bar，所以可以共用)
+    """
+    names = list(INDICATOR_WINDOWS)
+    times = df.index.to_numpy(dtype='datetime64[us]').tolist()
+    opens = df['Open'].to_numpy(dtype=np.float64).tolist()
+    highs = df['High'].to_numpy(dtype=np.float64).tolist()
+    lows = df['Low'].to_numpy(dtype=np.float64).tolist()
+    closes = df['Close'].to_numpy(dtype=np.float64).tolist()
+    vols = df['Volume'].to_numpy(dtype=np.int64).tolist()
+    inds = zip(*[df[n.upper()].to_numpy(dtype=np.float64).tolist() for n in names])
+
+    bar = Bar(None, 0.0, 0.0, 0.0, 0.0, 0)
+    ind = bar.ind
+    for dt, o, h, l, c, v, vals in zip(times, opens, highs, lows, closes, vols, inds):
+        bar.dt = dt
+        bar.open = o
+        bar.high = h
+        bar.low = l
+        bar.close = c
+        bar.volume = v
+        for name, val in zip(names, vals):
+            ind[name] = val   # 這裡是用算的！
+        yield bar
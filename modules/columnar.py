@@ -0,0 +1,249 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 欄式二進位檔 (Tick / K 線封存，memmap 直接讀)
+# ==========================================
+# 一個資料流 = 一個資料夾，每個欄位一個定長二進位檔，只會往後追加：
+#
+#   data/archive/TMF202602_tick/
+#       ts.i8       時間 (int64，datetime64[ns] 的數值，本地時間)
+#       price.f8    價格 (float64)
+#       volume.i8   成交量 (int64)
+#       index.json  每個交易日的列範圍 {"2026-01-05": [起始列, 結束列], ...}
+#       meta.json   欄位定義、索引格式、資料是否依時間排序
+#
+# 讀取時用 numpy.memmap 直接映射，不用解析任何文字。
+# 交易日跟歷史資料庫 (modules/history_store.py) 同一套規則：凌晨 05:00 (含) 以前的夜盤算前一天。
+# 只要資料依時間順序追加，每個交易日就是一段連續的列，日期區間直接切片 (零複製)；
+# 萬一追加了時間倒退的資料，meta 會標記 sorted=false，讀取時改成逐列比對交易日 (會複製)。
+
+TICK_SCHEMA = [("ts", "<i8"), ("price", "<f8"), ("volume", "<i8")]
+BAR_SCHEMA = [("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+              ("close", "<f8"), ("volume", "<i8")]
+
+NS_PER_DAY = 86400 * 10**9
+SESSION_CUT_NS = 5 * 3600 * 10**9   # 05:00 以前 (含) 歸前一個交易日
+INDEX_KIND = "trading_day"           # 舊版封存的索引是日曆日，打開時會重建
+
+
+def trading_day_nums(ns):
+    """int64 奈秒時間 -> 交易日 (1970-01-01 起算的天數)"""
+    return (np.asarray(ns, dtype='<i8') - SESSION_CUT_NS - 1) // NS_PER_DAY
+
+
+def _col_path(root, name, dtype):
+    return os.path.join(root, f"{name}.{np.dtype(dtype).kind}{np.dtype(dtype).itemsize}")
+
+
+def _day_str(day_num):
+    return str(np.datetime64(int(day_num), 'D'))
+
+
+def _write_json(path, obj):
+    """先寫暫存檔再換名，當機也不會留下寫一半的索引"""
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _add_runs(index, ts, offset):
+    """把一段 ts (int64, 從第 offset 列開始) 依交易日切段，併進索引"""
+    days = trading_day_nums(ts)
+    cuts = np.flatnonzero(np.diff(days)) + 1
+    starts = np.concatenate(([0], cuts))
+    ends = np.concatenate((cuts, [len(ts)]))
+    for s, e in zip(starts, ends):
+        key = _day_str(days[s])
+        lo, hi = offset + int(s), offset + int(e)
+        index[key] = [min(index[key][0], lo), hi] if key in index else [lo, hi]
+
+
+def _is_sorted(ts):
+    return len(ts) < 2 or bool(np.all(ts[1:] >= ts[:-1]))
+
+
+class ColumnarWriter:
+    """追加寫入器 (給 Recorder / BarRecorder / 下載工具用)"""
+
+    def __init__(self, root, schema):
+        self.root = root
+        self.schema = schema
+        os.makedirs(root, exist_ok=True)
+
+        self.meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"columns": [[n, d] for n, d in schema], "index": INDEX_KIND, "sorted": True}
+            _write_json(self.meta_path, self.meta)
+
+        self.index_path = os.path.join(root, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+        # 各欄位檔長度可能因為當機不一致，以最短的為準並截掉多出來的部分
+        self.files = {}
+        rows = None
+        for name, dtype in schema:
+            path = _col_path(root, name, dtype)
+            n = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+            rows = n if rows is None else min(rows, n)
+        for name, dtype in schema:
+            path = _col_path(root, name, dtype)
+            f = open(path, 'ab')
+            f.truncate(rows * np.dtype(dtype).itemsize)
+            self.files[name] = f
+        self.rows = rows or 0
+        self._index_dirty = False
+
+        self.last_ts = None
+        if self.rows:
+            ts = np.memmap(_col_path(root, "ts", "<i8"), dtype='<i8', mode='r', shape=(self.rows,))
+            self.last_ts = int(ts[-1])
+            if self.meta.get("index") != INDEX_KIND:
+                # 舊版 (日曆日) 索引：整個重建成交易日索引
+                self.index = {}
+                _add_runs(self.index, np.asarray(ts), 0)
+                self.meta.update(index=INDEX_KIND, sorted=_is_sorted(ts))
+                _write_json(self.meta_path, self.meta)
+                self._index_dirty = True
+            del ts
+
+    def append(self, columns):
+        """
+        追加一批資料
+        :param columns: {欄位名: 陣列}，ts 可以是 datetime64 或 int64 (ns)
+        """
+        ts = np.asarray(columns["ts"])
+        if ts.dtype.kind == 'M':
+            ts = ts.astype('datetime64[ns]').view('<i8')
+        n = len(ts)
+        if n == 0:
+            return
+
+        for name, dtype in self.schema:
+            arr = ts if name == "ts" else np.asarray(columns[name], dtype=dtype)
+            self.files[name].write(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+
+        # 時間倒退：每日索引不再保證是連續的一段，標記起來讓讀取端改用逐列比對
+        if self.meta.get("sorted", True) and (
+                not _is_sorted(ts) or (self.last_ts is not None and ts[0] < self.last_ts)):
+            self.meta["sorted"] = False
+            _write_json(self.meta_path, self.meta)
+            print(f"⚠️ [封存] {self.root} 追加了時間倒退的資料，日期區間改用逐列篩選")
+        self.last_ts = int(ts[-1])
+
+        _add_runs(self.index, ts, self.rows)
+        self.rows += n
+        self._index_dirty = True
+
+    def flush(self, fsync=False):
+        for f in self.files.values():
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        if self._index_dirty:
+            _write_json(self.index_path, self.index)
+            self._index_dirty = False
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def open_archive(root, start=None, end=None, columns=None):
+    """
+    用 memmap 開啟封存資料 (依時間排序的封存零解析、零複製)
+    :param start / end: 交易日字串 'YYYY-MM-DD' (含頭含尾)，不給就是全部
+    :param columns: 要哪些欄位，不給就是全部
+    :return: {欄位名: 陣列}，ts 會轉成 datetime64[ns]
+    """
+    with open(os.path.join(root, "meta.json"), encoding='utf-8') as f:
+        meta = json.load(f)
+    schema = [tuple(c) for c in meta["columns"]]
+    index = {}
+    index_path = os.path.join(root, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path, encoding='utf-8') as f:
+            index = json.load(f)
+
+    maps = {}
+    rows = None
+    for name, dtype in schema:
+        path = _col_path(root, name, dtype)
+        n = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        rows = n if rows is None else min(rows, n)
+    for name, dtype in schema:
+        if columns is not None and name not in columns and name != "ts":
+            continue
+        path = _col_path(root, name, dtype)
+        maps[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,)) if rows else np.empty(0, dtype)
+
+    sel = slice(0, rows)
+    if start is not None or end is not None:
+        if meta.get("index") == INDEX_KIND and meta.get("sorted", True):
+            # 索引還沒涵蓋到的尾巴 (寫入中、尚未 flush 索引) 從 ts 現算
+            covered = max((e for _, e in index.values()), default=0)
+            if covered < rows:
+                _add_runs(index, np.asarray(maps["ts"][covered:]), covered)
+            # 依時間排序 -> 區間內的交易日首尾相接，取最小起點到最大終點就是整段
+            picked = [v for k, v in index.items()
+                      if (start is None or k >= start) and (end is None or k <= end)]
+            if picked:
+                sel = slice(min(v[0] for v in picked), min(max(v[1] for v in picked), rows))
+            else:
+                sel = slice(0, 0)
+        else:
+            # 沒排序 (或舊版索引)：逐列算交易日篩選
+            days = trading_day_nums(maps["ts"])
+            mask = np.ones(rows, dtype=bool)
+            if start is not None:
+                mask &= days >= np.datetime64(start, 'D').astype('<i8')
+            if end is not None:
+                mask &= days <= np.datetime64(end, 'D').astype('<i8')
+            sel = np.flatnonzero(mask)
+
+    out = {}
+    for name, arr in maps.items():
+        if columns is not None and name not in columns:
+            continue
+        out[name] = arr[sel].view('datetime64[ns]') if name == "ts" else arr[sel]
+    return out
+
+
+def archive_days(root):
+    """列出封存裡有哪些交易日 (05:00 以前的夜盤算前一天)"""
+    index_path = os.path.join(root, "index.json")
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, encoding='utf-8') as f:
+        return sorted(json.load(f))
+
+
+def load_bar_frame(root, start=None, end=None):
+    """把 K 線封存讀成 backtest.py 慣用的 DataFrame (Time 索引，Open/High/Low/Close/Volume 欄位)"""
+    cols = open_archive(root, start, end)
+    df = pd.DataFrame({
+        'Open': cols['open'], 'High': cols['high'], 'Low': cols['low'],
+        'Close': cols['close'], 'Volume': cols['volume'],
+    }, index=pd.DatetimeIndex(cols['ts'], name='Time'), copy=False)
+    return df
+
+
+def write_bar_frame(root, df):
+    """把 Time 索引的 OHLCV DataFrame 追加進 K 線封存 (舊 CSV 轉檔用)"""
+    w = ColumnarWriter(root, BAR_SCHEMA)
+    w.append({
+        'ts': df.index.to_numpy(dtype='datetime64[ns]'),
+        'open': df['Open'].to_numpy(), 'high': df['High'].to_numpy(), 'low': df['Low'].to_numpy(),
+        'close': df['Close'].to_numpy(), 'volume': df['Volume'].to_numpy(),
+    })
+    w.close()
@@ -2,16 +2,26 @@ import threading
 import time
 from datetime import datetime
 from config.settings import Settings
+from core import metrics
+
+_COMMANDS = metrics.counter("commander_commands_total", "收到的 Telegram 指令數")
 
 class Commander(threading.Thread):
-    def __init__(self, bot, system_state, trader=None, strategy=None):
+    def __init__(self, bot, system_state, trader=None, strategy=None, tracer=None, profiler=None):
         super().__init__()
         self.bot = bot
         self.state = system_state
         self.trader = trader
         self.strategy = strategy
+        self.tracer = tracer
+        self.profiler = profiler
         self.running = True
 
+        if strategy is not None:
+            metrics.gauge("strategy_position", "策略目前倉位 (多單為正，空單為負)", fn=lambda: self.strategy.position)
+            metrics.gauge("strategy_trading_active", "自動交易是否啟動 (1 = 啟動)",
+                          fn=lambda: self.strategy.is_trading_active)
+
     def _sync_strategy_position(self):
         print("🔄 [Commander] 正在執行倉位同步...")
         if not self.trader or not self.strategy: return "❌ 缺少組件"
@@ -56,6 +66,7 @@ class Commander(threading.Thread):
         arg = raw_parts[1] if len(raw_parts) > 1 else "1"
 
         print(f"\n📥 [指令] 收到: {text} ... 處理中 ...")
+        _COMMANDS.inc()
 
         if cmd == "/start":
             self.bot.send_message("👋 嗨！我是你的交易指揮官。\n輸入 /help 查看指令。")
@@ -65,7 +76,8 @@ class Commander(threading.Thread):
             msg = ("📜 **指令清單**\n----------------\n"
                    "/status - 系統狀態\n/account - 帳戶權益\n"
                    "/stoptrade - 🛑 暫停交易\n/starttrade - 🟢 啟動交易\n"
-                   "/buy [量] - 買進\n/sell [量] - 賣出\n/flatten - 全平倉\n/sync - 同步")
+                   "/buy [量] - 買進\n/sell [量] - 賣出\n/flatten - 全平倉\n/sync - 同步\n"
+                   "/latency [reset] - 延遲統計\n/profile start|stop - 熱路徑取樣")
             self.bot.send_message(msg)
 
         elif cmd == "/status":
@@ -108,6 +120,26 @@ class Commander(threading.Thread):
             price = self.state.get_latest_tick().close if self.state.get_latest_tick() else 0
             for _ in range(int(arg)): self.strategy.sell(0, datetime.now().strftime("%H:%M"), "手動指令")
 
+        elif cmd == "/latency":
+            if not self.tracer:
+                self.bot.send_message("⚠️ 延遲追蹤沒有開 (設定 LATENCY_TRACE=1 後重啟)")
+            elif len(raw_parts) > 1 and raw_parts[1].lower() == "reset":
+                self.tracer.reset()
+                self.bot.send_message("🧹 延遲統計已歸零")
+            else:
+                self.bot.send_message(self.tracer.report())
+
+        elif cmd == "/profile":
+            action = raw_parts[1].lower() if len(raw_parts) > 1 else "status"
+            if not self.profiler:
+                self.bot.send_message("⚠️ 沒有掛取樣分析器")
+            elif action == "start":
+                self.bot.send_message(self.profiler.start())
+            elif action == "stop":
+                self.bot.send_message(self.profiler.stop())
+            else:
+                self.bot.send_message(self.profiler.status())
+
         elif cmd in ["/flatten", "/closeall"]:
             price = self.state.get_latest_tick().close if self.state.get_latest_tick() else 0
             t_str = datetime.now().strftime("%H:%M")
@@ -0,0 +1,293 @@
+import os
+import collections
+import numpy as np
+import pandas as pd
+from config.settings import Settings
+from modules.columnar import load_bar_frame, trading_day_nums
+
+# ==========================================
+# 歷史 K 線資料庫 (依合約 / 交易日分檔)
+# ==========================================
+# 下載工具寫進來、backtest.py / optimize.py 從這裡讀，不再各自處理 CSV：
+#
+#   data/history/TMF202602/2026-01-05.npz
+#   data/history/TMF202602/2026-01-06.npz
+#   ...
+#
+# - 交易日 = 該時段開盤那天：凌晨 05:00 (含) 以前的夜盤 K 線算在前一天
+# - 每個檔案是 numpy 的 .npz，價格/成交量在不失真的前提下降成 float32 / int32
+# - 讀取時只開日期範圍內的檔案，解析過的分檔放在行程內的 LRU 快取
+
+COLUMNS = ["open", "high", "low", "close", "volume"]
+LEGACY_CSV = "{contract}_1min_history.csv"   # 舊版 download_data 存的單一 CSV (放在資料庫根目錄)
+FRAME_NAMES = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+def trading_days(ts):
+    """把 datetime64[ns] 陣列對應到交易日 (datetime64[D])，規則與二進位封存共用"""
+    ns = np.asarray(ts, dtype='datetime64[ns]').view('<i8')
+    return trading_day_nums(ns).astype('datetime64[D]')
+
+
+def _downcast(name, arr):
+    """能無損轉小就轉小 (台指期價格都是整數點，float32 綽綽有餘)"""
+    if name == "volume":
+        if len(arr) == 0 or (arr.min() >= np.iinfo(np.int32).min and arr.max() <= np.iinfo(np.int32).max):
+            return arr.astype(np.int32)
+        return arr.astype(np.int64)
+    small = arr.astype(np.float32)
+    if np.array_equal(small.astype(np.float64), arr, equal_nan=True):
+        return small
+    return arr.astype(np.float64)
+
+
+def read_bar_csv(path):
+    """
+    讀取 K 線 CSV (錄製的 / 舊版下載的都可以)
+    統一成 Time 索引 + Open/High/Low/Close/Volume 欄位
+    """
+    df = pd.read_csv(path)
+
+    # 統一欄位名稱 (首字大寫)，處理不同來源的格式差異
+    # 錄製的可能是 'close', 下載的可能是 'Close'
+    df.columns = [c.capitalize() for c in df.columns]
+
+    # 處理時間欄位
+    df['Time'] = pd.to_datetime(df['Time'])
+    df.set_index('Time', inplace=True) # 設為索引方便計算
+    return df
+
+
+class HistoryStore:
+    def __init__(self, root=None, cache_days=None):
+        """
+        :param root: 資料庫根目錄 (預設 Settings.HISTORY_DIR)
+        :param cache_days: 行程內最多快取幾個分檔 (預設 Settings.HISTORY_CACHE_DAYS)
+        """
+        self.root = root or Settings.HISTORY_DIR
+        self.cache_days = Settings.HISTORY_CACHE_DAYS if cache_days is None else cache_days
+        self._cache = collections.OrderedDict()   # (合約, 日期) -> (mtime_ns, 欄位字典)
+        self._legacy_checked = set()               # 已經檢查過舊版 CSV 的合約
+
+        # --- 監控數字 ---
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, contract, day):
+        return os.path.join(self.root, contract, f"{day}.npz")
+
+    # --- 查詢 ---
+
+    def contracts(self):
+        """資料庫裡有哪些合約"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def days(self, contract, start=None, end=None):
+        """某合約已存了哪些交易日 ('YYYY-MM-DD'，含頭含尾)；還沒有分檔時會先轉入舊版 CSV"""
+        self.import_legacy(contract)
+        folder = os.path.join(self.root, contract)
+        if not os.path.isdir(folder):
+            return []
+        out = []
+        for name in os.listdir(folder):
+            if not name.endswith(".npz"):
+                continue
+            day = name[:-4]
+            if (start is None or day >= str(start)) and (end is None or day <= str(end)):
+                out.append(day)
+        return sorted(out)
+
+    # --- 寫入 ---
+
+    def write_frame(self, contract, df):
+        """
+        把 Time 索引的 OHLCV DataFrame 存進資料庫 (依交易日切檔)
+        同一天已經有資料就合併，時間重複的以新資料為準
+        :return: 寫入了哪些交易日
+        """
+        if len(df) == 0:
+            return []
+        cols = {c.lower(): df[c] for c in df.columns}
+        ts = df.index.to_numpy(dtype='datetime64[ns]')
+        data = {name: cols[name].to_numpy(dtype=np.int64 if name == "volume" else np.float64)
+                for name in COLUMNS}
+
+        order = np.argsort(ts, kind='stable')
+        ts = ts[order]
+        data = {k: v[order] for k, v in data.items()}
+
+        days = trading_days(ts)
+        cuts = np.flatnonzero(days[1:] != days[:-1]) + 1
+        written = []
+        for lo, hi in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(ts)]))):
+            day = str(days[lo])
+            self._write_day(contract, day, ts[lo:hi], {k: v[lo:hi] for k, v in data.items()})
+            written.append(day)
+        return written
+
+    def _write_day(self, contract, day, ts, data):
+        path = self._path(contract, day)
+        if os.path.exists(path):
+            old = self._read(path)
+            ts = np.concatenate((old["ts"], ts))
+            data = {k: np.concatenate((old[k].astype(data[k].dtype), data[k])) for k in COLUMNS}
+            # 穩定排序後，同一時間取最後一筆 (= 新資料)
+            order = np.argsort(ts, kind='stable')
+            ts = ts[order]
+            keep = np.ones(len(ts), dtype=bool)
+            keep[:-1] = ts[1:] != ts[:-1]
+            ts = ts[keep]
+            data = {k: v[order][keep] for k, v in data.items()}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, ts=ts.astype('datetime64[s]'),
+                     **{k: _downcast(k, v) for k, v in data.items()})
+        os.replace(tmp, path)   # 先寫暫存檔再換名，中斷也不會留下壞檔
+        self._cache.pop((contract, day), None)
+
+    def import_csv(self, contract, path):
+        """把舊的單一 CSV (例如 data/history/TMF202602_1min_history.csv) 轉進資料庫"""
+        return self.write_frame(contract, read_bar_csv(path))
+
+    def import_legacy(self, contract):
+        """
+        資料庫裡還沒有這個合約的分檔、但舊版的 <root>/<contract>_1min_history.csv 還在 -> 自動轉進來
+        (每個合約每個行程只檢查一次)
+        :return: 轉進了哪些交易日
+        """
+        if contract in self._legacy_checked:
+            return []
+        self._legacy_checked.add(contract)
+
+        path = os.path.join(self.root, LEGACY_CSV.format(contract=contract))
+        folder = os.path.join(self.root, contract)
+        if not os.path.isfile(path):
+            return []
+        if os.path.isdir(folder) and any(n.endswith(".npz") for n in os.listdir(folder)):
+            return []
+        written = self.import_csv(contract, path)
+        print(f"📦 [歷史資料庫] 已把舊版 {path} 轉進資料庫 ({len(written)} 個交易日)")
+        return written
+
+    # --- 讀取 ---
+
+    @staticmethod
+    def _read(path):
+        with np.load(path) as z:
+            out = {k: z[k] for k in z.files}
+        out["ts"] = out["ts"].astype('datetime64[ns]')
+        return out
+
+    def load_day(self, contract, day):
+        """讀一個分檔 (有快取)，回傳 {欄位名: 陣列}"""
+        key = (contract, day)
+        path = self._path(contract, day)
+        mtime = os.stat(path).st_mtime_ns
+        hit = self._cache.get(key)
+        if hit and hit[0] == mtime:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return hit[1]
+
+        self.misses += 1
+        data = self._read(path)
+        if self.cache_days:
+            self._cache[key] = (mtime, data)
+            while len(self._cache) > self.cache_days:
+                self._cache.popitem(last=False)
+        return data
+
+    def partition_paths(self, contracts, start=None, end=None):
+        """日期範圍內的分檔路徑 (給優化器的結果快取算指紋用)"""
+        if isinstance(contracts, str):
+            contracts = [contracts]
+        return [self._path(c, d) for c in contracts for d in self.days(c, start, end)]
+
+    def iter_days(self, contracts, start=None, end=None):
+        """逐日產出 (合約, 交易日, 欄位字典)，不會一次把整段讀進記憶體"""
+        if isinstance(contracts, str):
+            contracts = [contracts]
+        for contract in contracts:
+            for day in self.days(contract, start, end):
+                yield contract, day, self.load_day(contract, day)
+
+    def load_arrays(self, contracts, start=None, end=None, columns=None):
+        """
+        讀取一段期間的資料，回傳 {欄位名: 陣列} (價格一律 float64、成交量 int64)
+        :param contracts: 合約代碼或代碼清單 (換月時依序接起來)
+        :param start / end: 交易日 'YYYY-MM-DD' (含頭含尾)，不給就是全部
+        :param columns: 要哪些欄位 (open/high/low/close/volume)，不給就是全部
+        """
+        cols = [c.lower() for c in (columns or COLUMNS)]
+        parts = list(self.iter_days(contracts, start, end))
+        n = sum(len(p[2]["ts"]) for p in parts)
+
+        # 先算好總長度再一次配置，避免 concat 產生中間副本
+        out = {"ts": np.empty(n, dtype='datetime64[ns]')}
+        for c in cols:
+            out[c] = np.empty(n, dtype=np.int64 if c == "volume" else np.float64)
+        multi = len({p[0] for p in parts}) > 1
+        if multi:
+            out["contract"] = np.empty(n, dtype=object)
+
+        pos = 0
+        for contract, _, data in parts:
+            m = len(data["ts"])
+            out["ts"][pos:pos + m] = data["ts"]
+            for c in cols:
+                out[c][pos:pos + m] = data[c]
+            if multi:
+                out["contract"][pos:pos + m] = contract
+            pos += m
+
+        # 多個合約 (換月) 依時間排好；單一合約的分檔本來就是照時間排的
+        if multi:
+            order = np.argsort(out["ts"], kind='stable')
+            out = {k: v[order] for k, v in out.items()}
+        return out
+
+    def load(self, contracts, start=None, end=None, columns=None):
+        """同 load_arrays，但回傳 backtest.py 慣用的 DataFrame (Time 索引，Open/High/... 欄位)"""
+        arrays = self.load_arrays(contracts, start, end, columns)
+        ts = arrays.pop("ts")
+        frame = {FRAME_NAMES.get(k, k.capitalize()): v for k, v in arrays.items()}
+        if "Contract" in frame:
+            frame["Contract"] = pd.Categorical(frame["Contract"])
+        return pd.DataFrame(frame, index=pd.DatetimeIndex(ts, name='Time'), copy=False)
+
+
+_default_store = None
+
+def get_store():
+    """行程共用的 HistoryStore (快取才會跨呼叫生效)"""
+    global _default_store
+    if _default_store is None:
+        _default_store = HistoryStore()
+    return _default_store
+
+
+def load_bars(source, start=None, end=None, columns=None):
+    """
+    backtest.py / optimize.py 共用的讀取入口
+    :param source: 合約代碼 (或清單) -> 歷史資料庫
+                   CSV 檔路徑         -> 錄製 / 舊版下載的 CSV
+                   二進位封存資料夾   -> modules/columnar.py 的封存
+    :return: Time 索引的 DataFrame
+    """
+    if isinstance(source, str) and source.lower().endswith(".csv"):
+        df = read_bar_csv(source)
+        if start is not None or end is not None:
+            days = pd.Index(trading_days(df.index.to_numpy(dtype='datetime64[ns]')).astype(str))
+            df = df[(days >= (start or "")) & (days <= (end or "9999"))]
+    elif isinstance(source, str) and os.path.isfile(os.path.join(source, "meta.json")):
+        df = load_bar_frame(source, start, end)
+    else:
+        return get_store().load(source, start, end, columns)
+
+    if columns:
+        df = df[[FRAME_NAMES.get(c.lower(), c) for c in columns]]
+    return df
@@ -0,0 +1,234 @@
+import math
+
+# ==========================================
+# 增量指標引擎 (每根 K 棒 O(1) 更新，任意週期長度)
+# ==========================================
+# 每個指標只記住「跑動中的累計值」與固定大小的環形緩衝區，
+# 不再每根 K 棒把整串歷史轉成 list 重算。
+# 資料不足時輸出 None (與原本 calculate_ma 的行為一致)。
+
+
+class RingBuffer:
+    """固定容量的環形緩衝區，push 時回傳被擠掉的舊值 (還沒滿就回傳 None)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = [0.0] * capacity
+        self.idx = 0
+        self.count = 0
+
+    def push(self, value):
+        old = self.data[self.idx] if self.count == self.capacity else None
+        self.data[self.idx] = value
+        self.idx = (self.idx + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        return old
+
+    def is_full(self):
+        return self.count == self.capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """由舊到新"""
+        start = self.idx if self.count == self.capacity else 0
+        for i in range(self.count):
+            yield self.data[(start + i) % self.capacity]
+
+
+class Indicator:
+    """所有指標的共同介面"""
+
+    def __init__(self, name):
+        self.name = name
+        self.value = None
+
+    def update(self, bar):
+        """收到一根已收盤的 K 棒"""
+        raise NotImplementedError
+
+    def publish(self, values):
+        """把結果寫進 bar.ind (欄位名 -> 值)"""
+        values[self.name] = self.value
+
+
+class SMA(Indicator):
+    """簡單移動平均：running sum，每繞一圈用緩衝區重算一次總和，避免浮點誤差累積"""
+
+    def __init__(self, name, window):
+        super().__init__(name)
+        self.window = window
+        self.buf = RingBuffer(window)
+        self.total = 0.0
+
+    def update(self, bar):
+        price = bar.close
+        old = self.buf.push(price)
+        self.total += price - (old or 0.0)
+        if self.buf.idx == 0:
+            self.total = math.fsum(self.buf.data)  # 攤提後仍是 O(1)
+        if self.buf.is_full():
+            self.value = self.total / self.window
+
+
+class EMA(Indicator):
+    """指數移動平均：前 N 根用 SMA 當種子，之後 ema += alpha * (price - ema)"""
+
+    def __init__(self, name, window):
+        super().__init__(name)
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.seed_sum = 0.0
+        self.seed_count = 0
+
+    def update(self, bar):
+        price = bar.close
+        if self.value is None:
+            self.seed_sum += price
+            self.seed_count += 1
+            if self.seed_count == self.window:
+                self.value = self.seed_sum / self.window
+        else:
+            self.value += self.alpha * (price - self.value)
+
+
+class RSI(Indicator):
+    """相對強弱指標 (Wilder 平滑法)"""
+
+    def __init__(self, name, window=14):
+        super().__init__(name)
+        self.window = window
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.seed_count = 0
+
+    def update(self, bar):
+        price = bar.close
+        if self.prev_close is None:
+            self.prev_close = price
+            return
+        change = price - self.prev_close
+        self.prev_close = price
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+
+        n = self.window
+        if self.seed_count < n:
+            # 前 N 個變動先取簡單平均當種子
+            self.avg_gain += gain / n
+            self.avg_loss += loss / n
+            self.seed_count += 1
+            if self.seed_count < n:
+                return
+        else:
+            self.avg_gain = (self.avg_gain * (n - 1) + gain) / n
+            self.avg_loss = (self.avg_loss * (n - 1) + loss) / n
+
+        if self.avg_loss == 0:
+            self.value = 100.0 if self.avg_gain > 0 else 50.0
+        else:
+            rs = self.avg_gain / self.avg_loss
+            self.value = 100.0 - 100.0 / (1.0 + rs)
+
+
+class ATR(Indicator):
+    """平均真實區間 (Wilder 平滑法)"""
+
+    def __init__(self, name, window=14):
+        super().__init__(name)
+        self.window = window
+        self.prev_close = None
+        self.seed_sum = 0.0
+        self.seed_count = 0
+
+    def update(self, bar):
+        high, low, close = bar.high, bar.low, bar.close
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        n = self.window
+        if self.value is None:
+            self.seed_sum += tr
+            self.seed_count += 1
+            if self.seed_count == n:
+                self.value = self.seed_sum / n
+        else:
+            self.value = (self.value * (n - 1) + tr) / n
+
+
+class Bollinger(Indicator):
+    """
+    布林通道：running sum + running sum of squares (母體標準差)
+    累計值都以第一筆價格為基準 (台指 2 萬點平方相減會吃掉精度)
+    輸出 <name>_mid / <name>_up / <name>_dn 三個欄位
+    """
+
+    def __init__(self, name, window=20, k=2.0):
+        super().__init__(name)
+        self.window = window
+        self.k = k
+        self.buf = RingBuffer(window)
+        self.ref = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.upper = None
+        self.lower = None
+
+    def update(self, bar):
+        if self.ref is None:
+            self.ref = bar.close
+        x = bar.close - self.ref
+        old = self.buf.push(x)
+        if old is None:
+            self.total += x
+            self.total_sq += x * x
+        else:
+            self.total += x - old
+            self.total_sq += x * x - old * old
+        if self.buf.idx == 0:
+            self.total = math.fsum(self.buf.data)
+            self.total_sq = math.fsum(v * v for v in self.buf.data)
+
+        if self.buf.is_full():
+            n = self.window
+            mean = self.total / n
+            var = max(self.total_sq / n - mean * mean, 0.0)
+            band = self.k * math.sqrt(var)
+            self.value = self.ref + mean
+            self.upper = self.value + band
+            self.lower = self.value - band
+
+    def publish(self, values):
+        values[f"{self.name}_mid"] = self.value
+        values[f"{self.name}_up"] = self.upper
+        values[f"{self.name}_dn"] = self.lower
+
+
+INDICATOR_TYPES = {
+    "sma": SMA,
+    "ema": EMA,
+    "rsi": RSI,
+    "atr": ATR,
+    "boll": Bollinger,
+}
+
+
+def build_indicators(config):
+    """
+    依設定建立指標清單
+    :param config: {欄位名: (類型, 參數...)}，例如 {"ma5": ("sma", 5), "bb": ("boll", 20, 2.0)}
+    """
+    indicators = []
+    for name, spec in config.items():
+        kind, *args = spec
+        cls = INDICATOR_TYPES.get(kind.lower())
+        if cls is None:
+            raise ValueError(f"未知的指標類型: {kind} ({name})")
+        indicators.append(cls(name, *args))
+    return indicators
@@ -1,97 +1,73 @@
-import os
-import csv
-from datetime import datetime
+import threading
+import time
 from config.settings import Settings
+from core.models import Tick
+from core import metrics
+
+_TICKS = metrics.counter("marketdata_ticks_total", "收到的報價筆數")
+_ERRORS = metrics.counter("marketdata_errors_total", "報價 callback 處理失敗的次數")
+metrics.rate("marketdata_ticks_per_second", "每秒收到的報價筆數 (最近 1 分鐘平均)", _TICKS)
 
 class MarketData:
-    def __init__(self, api, engine, state):
+    """
+    行情轉接器：只負責「訂閱報價 -> 轉成內部 Tick -> 交給 BotEngine」
+    K 線合成與存檔全部走 BotEngine 那一條管線 (每筆 Tick 只合成一次、只寫一次)
+    """
+    def __init__(self, api, engine, state, ingest=None):
+        """
+        :param ingest: (選填) IngestWorker；有給就只把 Tick 丟進緩衝區，由引擎執行緒處理
+        """
         self.api = api
         self.engine = engine
         self.state = state
+        # callback 要呼叫的入口：非同步模式丟緩衝區，同步模式直接跑引擎
+        self._dispatch = ingest.put if ingest is not None else engine.process_tick
         self.symbol = Settings.TARGET_CONTRACT
-        
-        # 資料夾與檔案
-        self.date_str = datetime.now().strftime("%Y-%m-%d")
-        self.file_dir = f"data/{self.date_str}"
-        os.makedirs(self.file_dir, exist_ok=True)
-        self.file_1min = f"{self.file_dir}/{self.symbol}_1min.csv"
-        self.file_5min = f"{self.file_dir}/{self.symbol}_5min.csv"
-        
-        for f in [self.file_1min, self.file_5min]:
-            if not os.path.exists(f):
-                with open(f, 'w', newline='', encoding='utf-8') as f_obj:
-                    csv.writer(f_obj).writerow(["Time", "Open", "High", "Low", "Close", "Volume"])
-
-        self.cur_1m = None
-        self.cur_5m = None
-        print(f"📡 [MarketData] 報價錄製官就位。")
+        self.callback_tid = None   # 券商報價 callback 跑在哪個執行緒 (給取樣分析器用)
+        self.contract = None
+        # stop() 之後 callback 不再碰引擎；鎖保證 stop() 返回時沒有 Tick 還在處理中
+        # (同步模式下主執行緒接著要 engine.flush()，不能跟 callback 執行緒同時改 K 棒)
+        self.stopped = False
+        self._lock = threading.Lock()
+        print(f"📡 [MarketData] 報價接收員就位。")
 
     def connect(self):
         # 🟢 換回安靜的 v1 callback
         self.api.quote.set_on_tick_fop_v1_callback(self._on_tick_v1)
-        contract = self.api.Contracts.Futures.TMF[self.symbol]
-        self.api.quote.subscribe(contract, quote_type="tick")
+        self.contract = self.api.Contracts.Futures.TMF[self.symbol]
+        self.api.quote.subscribe(self.contract, quote_type="tick")
         print(f"✅ [MarketData] 訂閱 {self.symbol} 成功。")
 
     def _on_tick_v1(self, exchange, tick):
         """這是最安靜的監聽方式"""
+        recv_ns = time.perf_counter_ns()   # 收到報價的時間 (延遲追蹤的起點)
+        if self.callback_tid is None:
+            self.callback_tid = threading.get_ident()
         try:
             # 💓 心跳點點
             print(".", end="", flush=True)
+            _TICKS.inc()
+
+            # 建立內部格式 (core.models.Tick，類別只定義一次)
+            my_tick = Tick.from_shioaji(tick, recv_ns)
 
-            # 建立內部格式
-            class InternalTick:
-                def __init__(self, t):
-                    self.datetime = t.datetime
-                    self.close = float(t.close)
-                    self.volume = int(t.volume)
-            
-            my_tick = InternalTick(tick)
-            
             # 分發
-            self.state.update(my_tick)
-            self.engine.process_tick(my_tick)
-            self._update_bar(my_tick)
+            with self._lock:
+                if self.stopped:
+                    return
+                self.state.update(my_tick)
+                self._dispatch(my_tick)
         except Exception as e:
-            # 這裡不印東西，避免干擾點點
-            pass
-
-    def _update_bar(self, tick):
-        # 1min 邏輯
-        if self.cur_1m is None: 
-            self.cur_1m = self._new_bar(tick)
-        elif tick.datetime.minute != self.cur_1m['dt'].minute:
-            print("") # 存檔時換行
-            self._save(self.file_1min, self.cur_1m, "1min")
-            self.cur_1m = self._new_bar(tick)
-        else: 
-            self._merge(self.cur_1m, tick)
-
-        # 5min 邏輯
-        if self.cur_5m is None: 
-            self.cur_5m = self._new_bar(tick)
-        elif tick.datetime.minute % 5 == 0 and tick.datetime.minute != self.cur_5m['dt'].minute:
-            self._save(self.file_5min, self.cur_5m, "5min")
-            self.cur_5m = self._new_bar(tick)
-        else: 
-            self._merge(self.cur_5m, tick)
-
-    def _new_bar(self, t):
-        return {'dt': t.datetime, 'open': t.close, 'high': t.close, 'low': t.close, 'close': t.close, 'volume': t.volume}
-
-    def _merge(self, b, t):
-        b['high'] = max(b['high'], t.close)
-        b['low'] = min(b['low'], t.close)
-        b['close'] = t.close
-        b['volume'] += t.volume
-
-    def _save(self, path, b, lbl):
-        try:
-            with open(path, 'a', newline='') as f:
-                csv.writer(f).writerow([b['dt'].strftime("%Y-%m-%d %H:%M:%S"), b['open'], b['high'], b['low'], b['close'], b['volume']])
-            print(f"💾 [MarketData] {lbl} 存檔 ({b['dt'].strftime('%H:%M')}) Close: {b['close']}")
-        except:
-            pass
+            # 這裡不印東西，避免干擾點點 (次數看 /metrics)
+            _ERRORS.inc()
 
     def stop(self):
-        print("\n🍵 [MarketData] 報價錄製官打卡下班。")
\ No newline at end of file
+        """停止接收報價：等處理中的 Tick 跑完，之後進來的一律不送引擎，再跟券商退訂"""
+        with self._lock:
+            self.stopped = True
+        if self.contract is not None:
+            try:
+                self.api.quote.unsubscribe(self.contract, quote_type="tick")
+            except Exception as e:
+                print(f"⚠️ [MarketData] 退訂 {self.symbol} 失敗: {e}")
+        print("\n🍵 [MarketData] 報價接收員打卡下班。")
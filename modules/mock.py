@@ -1,13 +1,15 @@
 # modules/mock.py
-from datetime import datetime
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from core.models import Tick
+
+class MockTick(Tick):
+    """假裝是 Shioaji 的 Tick (直接沿用內部 Tick 的 __slots__ 格式)"""
+    __slots__ = ()
 
-class MockTick:
-    """假裝是 Shioaji 的 Tick"""
     def __init__(self, code, dt, price, volume):
-        self.code = code
-        self.datetime = dt
-        self.close = price
-        self.volume = volume
+        super().__init__(dt, price, volume, code)
 
 class MockBot:
     """假裝是 TelegramBot"""
@@ -31,7 +33,15 @@ class MockShioaji:
     這是一個高仿真的 Shioaji API 物件。
     目的是騙過 Trader，讓它以為自己連上了真正的交易所。
     """
-    def __init__(self):
+    def __init__(self, kbars_delay=0.0, kbars_fail_after=None):
+        """
+        :param kbars_delay: 每次 kbars 查詢假裝花多少秒 (測試平行下載用)
+        :param kbars_fail_after: 第幾次 kbars 之後開始丟例外 (測試中斷續傳用)，None = 永不失敗
+        """
+        self.kbars_delay = kbars_delay
+        self.kbars_fail_after = kbars_fail_after
+        self.kbars_calls = 0
+
         # 1. 建立假的帳號
         self.stock_account = "Mock_Account_123"
         
@@ -45,6 +55,8 @@ class MockShioaji:
                     def __missing__(self, key):
                         return MockContract(key)
                 self.TMF = AutoDict()
+                self.TXF = AutoDict()
+                self.MXF = AutoDict()
                 
         class Contracts:
             def __init__(self):
@@ -86,4 +98,47 @@ class MockShioaji:
             equity = 1000000
             available_margin = 900000
             total_pnl = 5000
-        return MockBalance()
\ No newline at end of file
+        return MockBalance()
+
+    # --- 👇 新增：假歷史 K 線 (離線測試 tools/download_data.py 用) 👇 ---
+    def kbars(self, contract, start, end, timeout=30000):
+        """
+        假裝是 api.kbars：回傳 [start, end] 日曆日內的 1 分 K
+        日盤 08:46~13:45、夜盤 15:01~隔天 05:00 (K 線時間為收盤時間)，週末沒有日盤/夜盤
+        價格只跟合約與時間有關，同一根 K 線不管查幾次都一樣
+        """
+        self.kbars_calls += 1
+        if self.kbars_fail_after is not None and self.kbars_calls > self.kbars_fail_after:
+            raise ConnectionError("MockAPI: kbars 連線中斷")
+        if self.kbars_delay:
+            time.sleep(self.kbars_delay)
+
+        first = datetime.strptime(str(start), "%Y-%m-%d")
+        last = datetime.strptime(str(end), "%Y-%m-%d") + timedelta(days=1)
+        stamps = []
+        day = first - timedelta(days=1)   # 前一天的夜盤會延續到 start 當天凌晨
+        while day < last:
+            if day.weekday() < 5:
+                stamps.append(np.arange(np.datetime64(day.replace(hour=8, minute=46)),
+                                        np.datetime64(day.replace(hour=13, minute=46)), np.timedelta64(1, 'm')))
+                stamps.append(np.arange(np.datetime64(day.replace(hour=15, minute=1)),
+                                        np.datetime64(day.replace(hour=5, minute=1) + timedelta(days=1)),
+                                        np.timedelta64(1, 'm')))
+            day += timedelta(days=1)
+        ts = np.concatenate(stamps).astype('datetime64[ns]') if stamps else np.empty(0, 'datetime64[ns]')
+        ts = ts[(ts >= np.datetime64(first)) & (ts < np.datetime64(last))]
+
+        minutes = ts.view('<i8') // 60_000_000_000
+        seed = sum(map(ord, contract.code))
+        close = (20000 + seed + np.round(300 * np.sin(minutes / 720.0)) + minutes % 7).astype(float)
+
+        class MockKbars:
+            pass
+        kb = MockKbars()
+        kb.ts = ts.view('<i8').tolist()
+        kb.Open = (close - 1).tolist()
+        kb.High = (close + 3).tolist()
+        kb.Low = (close - 4).tolist()
+        kb.Close = close.tolist()
+        kb.Volume = (minutes % 97 + 1).tolist()
+        return kb
@@ -1,35 +1,193 @@
 import requests
 import time
+import threading
+from collections import deque
 from config.settings import Settings
+from core import metrics
 
 class TelegramBot:
-    def __init__(self):
+    """
+    Telegram 通知 (非同步版)
+
+    send_message 只把訊息丟進佇列就返回，由背景執行緒負責發送：
+    - 共用 requests.Session (連線重複使用，不必每次重新握手)
+    - 依 Telegram 限制節流 (同一個聊天室每秒最多 1 則)
+    - 節流期間累積的訊息合併成一則送出 (超過 4096 字就分成好幾則，每則之間照樣節流)
+    - 合併的那則被拒收 (Markdown 格式錯誤) 時拆開逐則重送，還是不行就改送純文字
+    - 佇列滿了先丟最舊的一般訊息；交易通知 (urgent) 永遠不丟
+    - 關機前呼叫 flush() 把佇列裡的訊息送完
+    """
+    MAX_TEXT_LEN = 4096   # Telegram 單則訊息上限
+
+    def __init__(self, api_base=None, min_interval=None, queue_size=None):
+        """
+        :param api_base: API 位址 (測試時可指向本機的假伺服器)
+        :param min_interval: 兩次發送的最短間隔 (秒)
+        :param queue_size: 待發佇列上限，滿了會丟掉最舊的一般訊息 (urgent 訊息不受限)
+        """
         self.token = Settings.TELEGRAM_TOKEN
         self.chat_id = Settings.TELEGRAM_CHAT_ID
-        self.base_url = f"https://api.telegram.org/bot{self.token}"
+        api_base = api_base or Settings.TELEGRAM_API_BASE
+        self.base_url = f"{api_base}/bot{self.token}"
+        self.min_interval = Settings.TELEGRAM_MIN_INTERVAL if min_interval is None else min_interval
 
-    def send_message(self, text):
-        """發送一般訊息"""
-        url = f"{self.base_url}/sendMessage"
-        data = {
-            "chat_id": self.chat_id,
-            "text": text,
-            "parse_mode": "Markdown" # 支援粗體等格式
-        }
-        try:
-            requests.post(url, data=data, timeout=5)
-        except Exception as e:
-            print(f"❌ [TG發送失敗] {e}")
+        # 發送與收訊各用一個 Session (Commander 的 long polling 在別的執行緒)
+        self.send_session = requests.Session()
+        self.poll_session = requests.Session()
+
+        self.queue = deque()   # [(urgent, text), ...] 依時間先後
+        self.queue_size = queue_size or Settings.TELEGRAM_QUEUE_SIZE
+        self._pending = 0      # 還沒送完的訊息數 (佇列中 + 發送中)
+        self._cond = threading.Condition()
+        self._last_post = 0.0
+
+        # --- 統計 ---
+        self.sent = 0        # 實際 POST 次數
+        self.failed = 0
+        self.dropped = 0     # 佇列滿了被丟掉的一般訊息數
+        self.coalesced = 0   # 被合併進別則的訊息數
+
+        metrics.counter("telegram_sent_total", "Telegram 成功送出的次數", fn=lambda: self.sent)
+        metrics.counter("telegram_failed_total", "Telegram 送出失敗的次數", fn=lambda: self.failed)
+        metrics.counter("telegram_dropped_total", "Telegram 佇列滿了被丟掉的訊息數", fn=lambda: self.dropped)
+        metrics.gauge("telegram_queue_depth", "Telegram 待發訊息數", fn=lambda: self._pending)
+
+        self.sender = threading.Thread(target=self._run_sender, name="TelegramSender", daemon=True)
+        self.sender.start()
+
+    def send_message(self, text, urgent=False):
+        """
+        發送訊息 (不會卡住呼叫端)
+        :param urgent: True = 交易相關 (進出場、成交回報)，佇列再滿也不會被丟掉
+        """
+        with self._cond:
+            if len(self.queue) >= self.queue_size:
+                # 佇列滿了：丟掉最舊的一則一般訊息；全是 urgent 時，新的一般訊息直接丟掉
+                victim = next((i for i, (u, _) in enumerate(self.queue) if not u), None)
+                if victim is not None:
+                    del self.queue[victim]
+                    self.dropped += 1
+                    self._pending -= 1
+                elif not urgent:
+                    self.dropped += 1
+                    return
+            self.queue.append((urgent, text))
+            self._pending += 1
+            self._cond.notify_all()
 
     def send_alert(self, title, msg):
         """發送警報 (加上警示圖示)"""
         text = f"🚨 *{title}*\n----------------\n{msg}"
-        self.send_message(text)
+        self.send_message(text, urgent=True)
 
     def send_info(self, title, msg):
         """發送通知 (加上資訊圖示)"""
         text = f"ℹ️ *{title}*\n----------------\n{msg}"
-        self.send_message(text)
+        self.send_message(text, urgent=True)
+
+    def flush(self, timeout=5.0):
+        """
+        等佇列裡的訊息都送出去 (給 exit_gracefully 用)
+        :return: True = 全部送完, False = 超時
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"⚠️ [TG] 關機前還有 {self._pending} 則訊息沒送出")
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # --- 背景發送 ---
+
+    def _done(self, n):
+        with self._cond:
+            self._pending -= n
+            if self._pending <= 0:
+                self._cond.notify_all()
+
+    def _run_sender(self):
+        while True:
+            with self._cond:
+                while not self.queue:
+                    self._cond.wait()
+
+            # 節流：距離上次發送太近就先等，等待期間進來的訊息會一起合併
+            self._throttle()
+
+            # 一次只送一則 (最多 4096 字)，裝不下的留在佇列，下一輪照樣先節流再送
+            with self._cond:
+                batch = [self.queue.popleft()[1]]
+                length = len(batch[0])
+                while self.queue and length + len(self.queue[0][1]) + 2 <= self.MAX_TEXT_LEN:
+                    batch.append(self.queue.popleft()[1])
+                    length += len(batch[-1]) + 2
+
+            self.coalesced += len(batch) - 1
+            self._deliver(batch)
+            self._done(len(batch))
+
+    def _throttle(self):
+        wait = self.min_interval - (time.monotonic() - self._last_post)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _deliver(self, batch):
+        """
+        送出合併好的一批訊息
+        被 Telegram 拒收 (4xx，多半是某一則的 Markdown 沒配對，例如路徑裡的 _) 時，
+        拆開逐則重送，單則還是被拒就改用純文字，不讓一則壞訊息拖累同批的交易通知
+        """
+        status = self._post("\n\n".join(batch))
+        if not self._rejected(status):
+            if status != 200:
+                self.failed += 1
+            return
+        for text in batch:
+            if len(batch) > 1:
+                self._throttle()
+                status = self._post(text)
+            if self._rejected(status):
+                self._throttle()
+                status = self._post(text, markdown=False)
+            if status != 200:
+                self.failed += 1
+
+    @staticmethod
+    def _rejected(status):
+        # 429 是限流 (_post 已經重試過)，不是內容有問題
+        return status is not None and 400 <= status < 500 and status != 429
+
+    def _post(self, text, markdown=True):
+        """
+        :return: HTTP 狀態碼 (成功 = 200)，連線失敗回傳 None
+        """
+        url = f"{self.base_url}/sendMessage"
+        data = {"chat_id": self.chat_id, "text": text}
+        if markdown:
+            data["parse_mode"] = "Markdown"  # 支援粗體等格式
+        status = None
+        for _ in range(3):
+            try:
+                self._last_post = time.monotonic()
+                resp = self.send_session.post(url, data=data, timeout=5)
+                status = resp.status_code
+                if status == 429:
+                    # 被 Telegram 限流：照它說的秒數等待後重送
+                    retry_after = resp.json().get("parameters", {}).get("retry_after", 1)
+                    time.sleep(retry_after)
+                    continue
+                if resp.ok:
+                    self.sent += 1
+                    return 200
+                print(f"❌ [TG發送失敗] HTTP {status}: {resp.text[:200]}")
+                return status
+            except Exception as e:
+                print(f"❌ [TG發送失敗] {e}")
+                return None
+        return status
 
     # 👇 [新增] 這就是 Commander 缺少的耳朵 👇
     def get_updates(self, offset=None):
@@ -43,9 +201,9 @@ class TelegramBot:
             "offset": offset
         }
         try:
-            resp = requests.get(url, params=params, timeout=15)
+            resp = self.poll_session.get(url, params=params, timeout=15)
             result = resp.json()
-            
+
             if result.get("ok"):
                 return result.get("result", [])
             else:
@@ -56,4 +214,4 @@ class TelegramBot:
             return []
         except Exception as e:
             print(f"❌ [TG連線失敗] {e}")
-            return []
\ No newline at end of file
+            return []
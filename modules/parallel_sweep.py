@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from modules.vector_backtest import crossover_backtest
+
+# ==========================================
+# 多核心參數掃描 (optimize.py 的 parallel 模式)
+# ==========================================
+# 收盤價只寫一次到暫存 memmap 檔，所有 worker 直接映射同一份資料，
+# 不必每個行程各自 pickle 一份 DataFrame。
+
+
+class ProgressReporter:
+    """掃描進度回報 (取代原本 current_it % 5 的印法，改成依時間節流並附上速度與剩餘時間)"""
+
+    def __init__(self, total, label="優化器", interval=1.0):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.start_time = time.monotonic()
+        self.last_print = self.start_time
+
+    def update(self, n=1):
+        self.done += n
+        now = time.monotonic()
+        if now - self.last_print < self.interval and self.done < self.total:
+            return
+        self.last_print = now
+
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        pct = self.done / self.total * 100 if self.total else 100.0
+        print(f"⏳ [{self.label}] 已完成 {self.done}/{self.total} 組 ({pct:.0f}%) "
+              f"| {rate:.1f} 組/秒 | 預估剩餘 {eta:.0f} 秒")
+
+
+class SharedPrices:
+    """
+    把收盤價 (或任何 float64 陣列，例如 [均線數, K 線數] 的指標矩陣) 發布成唯讀的 memmap 檔
+    (with 區塊結束時自動刪除)
+    用法：
+        with SharedPrices(close) as shared:
+            pool = mp.Pool(initializer=_init_worker, initargs=shared.spec)
+    """
+
+    def __init__(self, close):
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.tmp_dir = None
+        self.path = None
+
+    @property
+    def spec(self):
+        return (self.path, self.close.shape)
+
+    def __enter__(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix="taiex_sweep_")
+        self.path = os.path.join(self.tmp_dir, "close.f64")
+        mm = np.memmap(self.path, dtype=np.float64, mode='w+', shape=(max(self.close.size, 1),))
+        mm[:self.close.size] = self.close.ravel()
+        mm.flush()
+        del mm
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        return False
+
+
+# --- Worker 端狀態 (每個行程各一份) ---
+_worker_close = None
+_worker_mas = {}
+
+
+def map_shared(path, shape):
+    """[worker] 映射 SharedPrices 發布的陣列 (唯讀、零複製)"""
+    size = int(np.prod(shape))
+    return np.memmap(path, dtype=np.float64, mode='r', shape=(max(size, 1),))[:size].reshape(shape)
+
+
+def _init_worker(path, shape):
+    global _worker_close
+    _worker_close = map_shared(path, shape)
+    _worker_mas.clear()
+
+
+def _worker_ma(window):
+    """同一個 worker 內每個 window 只算一次 (與 serial 模式一樣用 rolling，結果逐位元相同)"""
+    ma = _worker_mas.get(window)
+    if ma is None:
+        ma = pd.Series(_worker_close).rolling(window=window).mean().to_numpy()
+        _worker_mas[window] = ma
+    return ma
+
+
+def _run_task(task):
+    """一個任務 = 一組 (short, long) 配上所有斜率"""
+    s, l, slope_list, friction = task
+    ma_s = _worker_ma(s)
+    ma_l = _worker_ma(l)
+    rows = []
+    for sp in slope_list:
+        p, c = crossover_backtest(_worker_close, ma_s, ma_l, sp, friction)
+        rows.append({'short': s, 'long': l, 'slope': sp, 'profit': p, 'trades': c})
+    return rows
+
+
+def sweep_parallel(close, short_list, long_list, slope_list, friction, workers=None):
+    """
+    用行程池平行掃描所有 (short, long, slope) 組合
+    :param workers: 行程數 (None = 全部核心)
+    :return: 與 serial 模式相同欄位、相同順序的 DataFrame
+    """
+    slope_list = list(slope_list)
+    tasks = [(s, l, slope_list, friction) for s in short_list for l in long_list if s < l]
+    workers = workers or os.cpu_count() or 1
+    progress = ProgressReporter(len(tasks) * len(slope_list))
+
+    results = {}
+    with SharedPrices(close) as shared:
+        with mp.Pool(processes=workers, initializer=_init_worker, initargs=shared.spec) as pool:
+            for rows in pool.imap_unordered(_run_task, tasks):
+                for r in rows:
+                    results[(r['short'], r['long'], r['slope'])] = r
+                progress.update(len(rows))
+
+    # 依原本的掃描順序排好，排行榜才會與 serial 模式一模一樣
+    ordered = [results[(s, l, sp)] for s, l, _, _ in tasks for sp in slope_list]
+    return pd.DataFrame(ordered, columns=['short', 'long', 'slope', 'profit', 'trades'])
@@ -0,0 +1,202 @@
+import math
+import itertools
+import numpy as np
+import pandas as pd
+from modules.vector_backtest import crossover_signals, settle_signals, prefix_sum_mas
+
+# ==========================================
+# 自適應參數搜尋 (粗掃 -> 逐步細化，搭配 successive halving 提早淘汰)
+# ==========================================
+# 窮舉網格在參數變多時會爆炸 (4 個維度各 20 個值 = 16 萬組)。這裡改成：
+#
+#   1. 每個維度先挑幾個等距的值做粗網格
+#   2. Successive halving：所有候選先只跑前 1/9 的資料，留下前 1/3 再跑 1/3 的資料，
+#      最後剩下的才跑完整資料 (爛組合很早就被刷掉，不會浪費整段回測)
+#   3. 在贏家附近縮小步距再搜一輪，直到步距為 1 或用完評估預算
+#
+# 預算本來就夠跑完整網格時不做上面這些，直接窮舉 (結果跟 optimize.py 的網格掃描一致)。
+# 均線只依賴過去的價格，所以「前 N 根的回測」直接切整段算好的均線就好，不必重算。
+
+
+class CrossoverEvaluator:
+    """
+    雙均線 + 斜率濾網的評估函式 (4 個維度：interval / short / long / slope)
+    interval = 用幾分 K 跑 (1 分 K 依時鐘重新取樣；BarResampler 則是從開盤起算，2、10 分 K 的切點會不同)
+    """
+
+    def __init__(self, df, friction):
+        """
+        :param df: 有 Time 索引與 Close 欄位的 1 分 K DataFrame
+        """
+        self.close_1m = df['Close']
+        self.friction = friction
+        self._series = {}
+        self._mas = {}
+
+        # --- 統計 ---
+        self.calls = 0
+        self.bars = 0      # 實際跑過的 K 線數 (換算成 1 分 K)
+
+    def series(self, interval):
+        """interval 分 K 的收盤價 (每個週期只取樣一次)"""
+        close = self._series.get(interval)
+        if close is None:
+            if interval == 1:
+                close = self.close_1m.to_numpy(dtype=np.float64)
+            else:
+                close = self.close_1m.resample(f"{interval}min").last().dropna().to_numpy(dtype=np.float64)
+            self._series[interval] = close
+        return close
+
+    def ma(self, interval, window):
+        key = (interval, window)
+        ma = self._mas.get(key)
+        if ma is None:
+            ma = prefix_sum_mas(self.series(interval), [window])[window]
+            self._mas[key] = ma
+        return ma
+
+    def __call__(self, params, frac=1.0):
+        """
+        :param params: {'interval', 'short', 'long', 'slope'} (interval 省略 = 1)
+        :param frac: 只跑前多少比例的資料
+        :return: (總損益, 交易次數)
+        """
+        interval = params.get('interval', 1)
+        close = self.series(interval)
+        n = len(close) if frac >= 1.0 else max(int(math.ceil(len(close) * frac)), 1)
+        self.calls += 1
+        self.bars += n * interval
+
+        sig = crossover_signals(self.ma(interval, params['short'])[:n],
+                                self.ma(interval, params['long'])[:n], params['slope'])
+        return settle_signals(close[:n], sig, self.friction)
+
+
+def _spread(values, k):
+    """從排序好的清單裡挑 k 個大致等距的索引 (含頭尾)"""
+    if len(values) <= k:
+        return list(range(len(values)))
+    return sorted({round(i * (len(values) - 1) / (k - 1)) for i in range(k)})
+
+
+class AdaptiveSearch:
+    def __init__(self, evaluate, space, budget=2000, constraint=None,
+                 coarse_points=5, eta=3, min_frac=1 / 9, keep=3):
+        """
+        :param evaluate: 評估函式 evaluate(params, frac) -> (分數, 交易次數)，分數越高越好
+        :param space: {維度名: 可用的值 (會排序)}，例如 {'short': range(3, 61), ...}
+        :param budget: 評估次數上限 (不論跑了多少比例的資料都算一次；快取命中不算)
+        :param constraint: 過濾不合法組合的函式 (例如 short < long)
+        :param coarse_points: 粗網格每個維度挑幾個值
+        :param eta: 每輪留下 1/eta，資料量放大 eta 倍
+        :param min_frac: 第一輪只跑多少比例的資料
+        :param keep: 每一層細化時，在前幾名附近搜尋
+        """
+        self.evaluate = evaluate
+        self.names = list(space)
+        self.values = {k: sorted(set(v)) for k, v in space.items()}
+        self.budget = budget
+        self.constraint = constraint or (lambda p: True)
+        self.coarse_points = coarse_points
+        self.eta = eta
+        self.min_frac = min_frac
+        self.keep = keep
+
+        self.evals = 0
+        self.cache = {}   # (參數索引, frac) -> (分數, 交易次數)
+        self.full = {}    # 參數索引 -> (分數, 交易次數)，跑過完整資料的
+        self.seen = set() # 送進過 successive halving 的組合 (被淘汰的不再重跑)
+
+    def _params(self, key):
+        return {n: self.values[n][i] for n, i in zip(self.names, key)}
+
+    def _score(self, key, frac):
+        hit = self.cache.get((key, frac))
+        if hit is not None:
+            return hit
+        if self.evals >= self.budget:
+            return None
+        self.evals += 1
+        res = self.evaluate(self._params(key), frac)
+        self.cache[(key, frac)] = res
+        if frac >= 1.0:
+            self.full[key] = res
+        return res
+
+    def _fractions(self):
+        fracs = []
+        f = self.min_frac
+        while f < 1.0 - 1e-9:
+            fracs.append(f)
+            f *= self.eta
+        return fracs + [1.0]
+
+    def successive_halving(self, keys):
+        """對一批候選跑 successive halving，回傳跑完整資料的倖存者"""
+        self.seen.update(keys)
+        alive = [k for k in keys if self.constraint(self._params(k))]
+
+        # 一整輪 halving 約花 n * eta / (eta - 1) 次評估；預算不夠就等距抽樣，確保至少有組合跑到完整資料
+        cap = int((self.budget - self.evals) * (self.eta - 1) / self.eta)
+        if cap <= 0:
+            return []
+        if len(alive) > cap:
+            alive = [alive[i] for i in np.linspace(0, len(alive) - 1, cap).round().astype(int)]
+        for frac in self._fractions():
+            scored = []
+            for k in alive:
+                res = self._score(k, frac)
+                if res is None:
+                    break   # 預算用完
+                scored.append((res[0], k))
+            if not scored:
+                return []
+            # 同分保持原順序 (sorted 是穩定排序)
+            scored.sort(key=lambda x: -x[0])
+            if frac >= 1.0 or len(scored) < len(alive):
+                return [k for _, k in scored]
+            alive = [k for _, k in scored[:max(len(scored) // self.eta, 1)]]
+        return alive
+
+    def run(self):
+        """
+        :return: 跑過完整資料的所有組合 (DataFrame，依分數排序)
+        """
+        # 0. 預算夠跑完整網格：直接全部跑完整資料 (結果就是窮舉的最佳解，不會有組合在半途被錯殺)
+        if self.grid_size() <= self.budget:
+            for key in itertools.product(*[range(len(self.values[n])) for n in self.names]):
+                if self.constraint(self._params(key)):
+                    self._score(key, 1.0)
+            return self.results()
+
+        # 1. 粗網格
+        axes = [_spread(self.values[n], self.coarse_points) for n in self.names]
+        self.successive_halving(list(itertools.product(*axes)))
+
+        # 2. 逐步細化：步距 = 粗網格間距的一半、再一半 ... 直到 1
+        radius = [max((len(self.values[n]) - 1) // (2 * max(self.coarse_points - 1, 1)), 1) for n in self.names]
+        while self.evals < self.budget:
+            winners = [k for k, _ in sorted(self.full.items(), key=lambda kv: -kv[1][0])[:self.keep]]
+            cand = set()
+            for w in winners:
+                around = [sorted({min(max(i + d, 0), len(self.values[n]) - 1) for d in (-r, 0, r)})
+                          for i, n, r in zip(w, self.names, radius)]
+                cand.update(itertools.product(*around))
+            fresh = [k for k in sorted(cand) if k not in self.seen]
+            if fresh:
+                self.successive_halving(fresh)
+            if all(r == 1 for r in radius) and not fresh:
+                break
+            radius = [max(r // 2, 1) for r in radius]
+
+        return self.results()
+
+    def results(self):
+        rows = [{**self._params(k), 'profit': float(p), 'trades': int(c)} for k, (p, c) in self.full.items()]
+        df = pd.DataFrame(rows, columns=self.names + ['profit', 'trades'])
+        return df.sort_values('profit', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    def grid_size(self):
+        """完整網格有幾組 (對照用)"""
+        return math.prod(len(v) for v in self.values.values())
@@ -1,115 +1,281 @@
 import threading
+import collections
 import csv
 import os
 import queue  # <--- 必須引入這個
+import time
+import numpy as np
 from datetime import datetime
+from config.settings import Settings
+from core import metrics
+from modules.columnar import ColumnarWriter, TICK_SCHEMA, BAR_SCHEMA
 
-class Recorder(threading.Thread):
-    def __init__(self, symbol="TMF"):
+class BatchWriter(threading.Thread):
+    """
+    批次寫檔的共同底座 (Recorder / BarRecorder 共用)
+
+    - 每輪最多收 batch_size 筆或等 batch_ms 毫秒，格式化後一次 writelines
+    - 檔案用大緩衝區開啟，依 flush_interval 秒 flush 一次 (0 = 每批都 flush)，可選擇 fsync
+    - 佇列有上限；滿了不會卡住呼叫端，多出來的先放到溢出區 (spill)，之後照順序分批補寫
+    - 溢出區也有上限 (RECORDER_SPILL_SIZE)；再滿就丟掉新資料並計數 (dropped)，寫檔執行緒會印警告
+    - (選用) 同一批資料也追加到欄式二進位封存 (modules/columnar.py)，回測可用 memmap 直接讀
+    """
+    schema = None   # 二進位封存的欄位定義 (子類別指定)
+
+    def __init__(self, file_path, header, label, archive_root=None):
         super().__init__()
-        self.symbol = symbol
-        self.running = True
-        
-        # [修改 1] 自己擁有一個信箱 (不再依賴外部 EventBus)
-        self.queue = queue.Queue()
-        
-        # 準備 CSV 檔案路徑
-        self.date_str = datetime.now().strftime("%Y-%m-%d")
-        self.file_dir = f"data/{self.date_str}"
-        os.makedirs(self.file_dir, exist_ok=True)
-        self.file_path = f"{self.file_dir}/{self.symbol}_tick.csv"
-        
+        self.file_path = file_path
+        self.label = label
+
+        self.batch_size = Settings.RECORDER_BATCH_SIZE
+        self.batch_sec = Settings.RECORDER_BATCH_MS / 1000
+        self.flush_interval = Settings.RECORDER_FLUSH_INTERVAL
+        self.fsync = Settings.RECORDER_FSYNC
+
+        # 自己擁有一個信箱 (有上限) + 溢出區
+        self.queue = queue.Queue(maxsize=Settings.RECORDER_QUEUE_SIZE)
+        self.spill = collections.deque()
+        self.spill_size = Settings.RECORDER_SPILL_SIZE
+        self._spill_lock = threading.Lock()
+
+        # --- 監控數字 ---
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0     # 因為佇列滿了而進溢出區的筆數
+        self.dropped = 0     # 溢出區也滿了而丟掉的筆數
+        self.max_depth = 0
+        self._warned_drops = 0
+        self._last_warn = 0.0
+
+        stream = {"file": os.path.basename(file_path)}
+        metrics.gauge("recorder_queue_depth", "錄製器待寫筆數 (佇列 + 溢出區)",
+                      labels=stream, fn=lambda: self.queue.qsize() + len(self.spill))
+        metrics.counter("recorder_written_total", "錄製器已寫入筆數", labels=stream, fn=lambda: self.written)
+        metrics.counter("recorder_spilled_total", "佇列滿了進溢出區的筆數", labels=stream, fn=lambda: self.spilled)
+        metrics.counter("recorder_dropped_total", "溢出區也滿了被丟掉的筆數", labels=stream, fn=lambda: self.dropped)
+
+        # 二進位封存 (Settings.RECORDER_BINARY 關掉就不寫)
+        self.archive = None
+        if archive_root and Settings.RECORDER_BINARY:
+            self.archive = ColumnarWriter(archive_root, self.schema)
+
         # 初始化 CSV
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
         if not os.path.exists(self.file_path):
             with open(self.file_path, 'w', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(["Time", "Price", "Volume"])
+                writer.writerow(header)
+
+    def put(self, item):
+        """讓 Engine 呼叫 (不會卡住行情執行緒)"""
+        # 溢出區還有東西時，新資料也排進溢出區，才能維持寫入順序
+        if self.spill:
+            with self._spill_lock:
+                if self.spill:
+                    self._spill(item)
+                    return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self._spill_lock:
+                self._spill(item)
+
+    def _spill(self, item):
+        """放進溢出區 (呼叫端要先拿 _spill_lock)；滿了就丟掉"""
+        if len(self.spill) >= self.spill_size:
+            self.dropped += 1
+            return
+        self.spill.append(item)
+        self.spilled += 1
+
+    def format_row(self, item):
+        """把一筆資料轉成一行 CSV 文字 (子類別實作)"""
+        raise NotImplementedError
+
+    def to_columns(self, items):
+        """把一批資料轉成 {欄位名: 陣列} (子類別實作，寫二進位封存用)"""
+        raise NotImplementedError
+
+    def on_written(self, items):
+        """一批寫完後的通知 (子類別可覆寫)"""
+        pass
 
-    # [修改 2] 新增這個方法，讓 Engine 可以呼叫
-    def put(self, tick):
-        self.queue.put(tick)
+    def _collect(self, stopping=False):
+        """
+        收一批：先等第一筆，之後最多收到 batch_size 筆或 batch_ms 毫秒；回傳 (資料, 是否收到毒藥丸)
+        :param stopping: 已經收過毒藥丸，只剩溢出區要補寫 (不再等佇列)
+        """
+        items = []
+        stop = stopping
+        if not stopping:
+            try:
+                first = self.queue.get(timeout=0.5)
+                if first is None: # 毒藥丸
+                    stop = True
+                else:
+                    items.append(first)
+            except queue.Empty:
+                pass
+
+        deadline = time.monotonic() + self.batch_sec
+        while items and not stop and len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+            else:
+                items.append(item)
+
+        depth = self.queue.qsize() + len(items) + len(self.spill)
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        # 溢出區的資料都比佇列裡的晚到：等佇列清空 (或要下班) 再接著補寫，每批一樣最多 batch_size 筆
+        room = self.batch_size - len(items)
+        if self.spill and room > 0 and (stop or self.queue.empty()):
+            with self._spill_lock:
+                for _ in range(min(room, len(self.spill))):
+                    items.append(self.spill.popleft())
+        return items, stop
 
     def run(self):
-        print(f"💾 [Tick錄影機] 啟動！(存檔: {self.file_path})")
-        
-        with open(self.file_path, 'a', newline='', buffering=1) as f:
-            writer = csv.writer(f)
-            
-            while self.running:
-                try:
-                    # [修改 3] 從自己的 Queue 拿資料
-                    tick = self.queue.get()
-                    
-                    if tick is None: # 毒藥丸
-                        break
-                    
-                    # 解析資料
-                    ts = tick.datetime.strftime("%H:%M:%S.%f")[:-3]
-                    price = float(tick.close)
-                    volume = int(tick.volume)
-                    
-                    writer.writerow([ts, price, volume])
-                    
-                except Exception as e:
-                    print(f"❌ [Tick錄影機錯誤] {e}")
-        
-        print("💾 [Tick錄影機] 已下班。")
+        print(f"💾 [{self.label}] 啟動！(存檔: {self.file_path})")
+
+        last_flush = time.monotonic()
+        stopping = False
+        with open(self.file_path, 'a', newline='', buffering=1024 * 1024) as f:
+            while True:
+                items, stopping = self._collect(stopping)
+                if items:
+                    try:
+                        f.writelines([self.format_row(it) for it in items])
+                        if self.archive:
+                            self.archive.append(self.to_columns(items))
+                        self.written += len(items)
+                        self.batches += 1
+                        self.on_written(items)
+                    except Exception as e:
+                        print(f"❌ [{self.label}錯誤] {e}")
+                self._warn_if_dropped()
+
+                # 收到毒藥丸後，溢出區也寫完才下班
+                stop = stopping and not self.spill
+                now = time.monotonic()
+                if stop or now - last_flush >= self.flush_interval:
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                    if self.archive:
+                        self.archive.flush(fsync=self.fsync)
+                    last_flush = now
+                if stop:
+                    break
+
+        if self.archive:
+            self.archive.close()
+
+        print(f"💾 [{self.label}] 已下班。(寫入 {self.written} 筆 / {self.batches} 批，"
+              f"溢出 {self.spilled} 筆，丟棄 {self.dropped} 筆)")
+
+    def _warn_if_dropped(self):
+        """有新的丟棄就提醒 (第一次立刻印，之後最多每 10 秒一次)"""
+        dropped = self.dropped
+        if dropped == self._warned_drops:
+            return
+        now = time.monotonic()
+        if self._warned_drops == 0 or now - self._last_warn >= 10:
+            self._last_warn = now
+            self._warned_drops = dropped
+            print(f"\n⚠️ [{self.label}] 寫檔跟不上：溢出區已滿 ({self.spill_size} 筆)，已丟棄 {dropped} 筆")
+
+    def stats(self):
+        """佇列與寫入統計 (給監控用)"""
+        return {
+            "depth": self.queue.qsize() + len(self.spill),
+            "max_depth": self.max_depth,
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+        }
 
     def stop(self):
-        self.running = False
+        # 毒藥丸一定要放得進去 (佇列滿時用阻塞的 put 等空位)
         self.queue.put(None)
 
-# --- BarRecorder 保持不變，但為了完整性我也貼在這裡 ---
+class Recorder(BatchWriter):
+    schema = TICK_SCHEMA
+
+    def __init__(self, symbol="TMF"):
+        self.symbol = symbol
+
+        # 準備 CSV 檔案路徑
+        self.date_str = datetime.now().strftime("%Y-%m-%d")
+        self.file_dir = f"data/{self.date_str}"
+        super().__init__(f"{self.file_dir}/{self.symbol}_tick.csv",
+                         ["Time", "Price", "Volume"], "Tick錄影機",
+                         archive_root=f"{Settings.ARCHIVE_DIR}/{self.symbol}_tick")
+
+    def format_row(self, tick):
+        # 不用 strftime (每筆 Tick 都叫太貴)，直接拼 HH:MM:SS.fff
+        dt = tick.datetime
+        return (f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d},"
+                f"{float(tick.close)},{int(tick.volume)}\n")
+
+    def to_columns(self, ticks):
+        # 二進位檔存完整日期時間 (CSV 只有時分秒)
+        return {
+            "ts": np.array([t.datetime for t in ticks], dtype='datetime64[ns]'),
+            "price": [t.close for t in ticks],
+            "volume": [t.volume for t in ticks],
+        }
+
+# --- BarRecorder：BotEngine 的 K 線輸出端 (唯一寫 <symbol>_<interval>.csv 的地方) ---
+
+class BarRecorder(BatchWriter):
+    schema = BAR_SCHEMA
+    LOG_INTERVAL = 300   # 存檔訊息最多幾秒印一次
 
-class BarRecorder(threading.Thread):
     def __init__(self, symbol="TMF", interval="1min"):
-        super().__init__()
         self.symbol = symbol
         self.interval = interval
-        self.running = True
-        self.queue = queue.Queue()
-        
+        self._last_log = float("-inf")
+
         self.date_str = datetime.now().strftime("%Y-%m-%d")
         self.file_dir = f"data/{self.date_str}"
-        os.makedirs(self.file_dir, exist_ok=True)
-        self.file_path = f"{self.file_dir}/{self.symbol}_{self.interval}.csv"
-        
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Time", "Open", "High", "Low", "Close", "Volume", "MA5", "MA20"])
+        super().__init__(f"{self.file_dir}/{self.symbol}_{self.interval}.csv",
+                         ["Time", "Open", "High", "Low", "Close", "Volume", "MA5", "MA20"],
+                         f"K線書記官 {self.interval}",
+                         archive_root=f"{Settings.ARCHIVE_DIR}/{self.symbol}_{self.interval}")
 
-    def put(self, bar):
-        self.queue.put(bar)
+    def format_row(self, bar):
+        # 寫完整日期時間，backtest.py 可以直接讀回來
+        t_str = bar.dt.strftime("%Y-%m-%d %H:%M:%S")
+        ma5 = f"{bar.ind['ma5']:.2f}" if bar.ind.get('ma5') else ""
+        ma20 = f"{bar.ind['ma20']:.2f}" if bar.ind.get('ma20') else ""
+        return f"{t_str},{bar.open},{bar.high},{bar.low},{bar.close},{bar.volume},{ma5},{ma20}\n"
 
-    def run(self):
-        print(f"🕯 [K線書記官] 啟動！(存檔: {self.file_path})")
-        
-        with open(self.file_path, 'a', newline='', buffering=1) as f:
-            writer = csv.writer(f)
-            
-            while self.running:
-                try:
-                    bar = self.queue.get()
-                    if bar is None: break
-
-                    t_str = bar['dt'].strftime("%H:%M")
-                    o = bar['open']
-                    h = bar['high']
-                    l = bar['low']
-                    c = bar['close']
-                    v = bar['volume']
-                    
-                    ma5 = f"{bar['ma5']:.2f}" if bar.get('ma5') else ""
-                    ma20 = f"{bar['ma20']:.2f}" if bar.get('ma20') else ""
-                    
-                    writer.writerow([t_str, o, h, l, c, v, ma5, ma20])
-                    
-                except Exception as e:
-                    print(f"❌ [K線存檔錯誤] {e}")
-        
-        print(f"🕯 [K線書記官] ({self.interval}) 已下班。")
+    def to_columns(self, bars):
+        return {
+            "ts": np.array([b.dt for b in bars], dtype='datetime64[ns]'),
+            "open": [b.open for b in bars],
+            "high": [b.high for b in bars],
+            "low": [b.low for b in bars],
+            "close": [b.close for b in bars],
+            "volume": [b.volume for b in bars],
+        }
 
-    def stop(self):
-        self.running = False
-        self.queue.put(None)
\ No newline at end of file
+    def on_written(self, bars):
+        # 最多每 LOG_INTERVAL 秒印一次 (不要每批都洗版)
+        now = time.monotonic()
+        if now - self._last_log < self.LOG_INTERVAL:
+            return
+        self._last_log = now
+        last = bars[-1]
+        print(f"\n💾 [K線書記官] {self.interval} 存檔 ({last.dt.strftime('%H:%M')}) Close: {last.close} "
+              f"(累計 {self.written} 根)")
@@ -0,0 +1,133 @@
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from core.models import Tick
+from modules.columnar import open_archive
+
+# ==========================================
+# Tick 回放 (走跟實盤一模一樣的 BotEngine 流程)
+# ==========================================
+# 錄下來的 Tick (CSV 或二進位封存) -> BotEngine.process_tick -> BarGenerator
+# -> BarResampler -> Strategy，能跑多快就跑多快。
+# 一次只讀一段 (chunk)，好幾天的檔案也不會整個載進記憶體。
+
+CHUNK_SIZE = 200_000   # 每段幾筆 Tick
+
+_DATE_DIR = re.compile(r"(\d{4}-\d{2}-\d{2})")
+_HALF_DAY_NS = 12 * 3600 * 10**9
+
+
+def _csv_chunks(path, chunk_size):
+    """
+    Recorder 錄的 CSV：Time 只有時分秒 (HH:MM:SS.fff)，日期取自資料夾名稱 data/YYYY-MM-DD/
+    夜盤過午夜時間會倒退，偵測到就把日期往後推一天
+    """
+    m = _DATE_DIR.search(os.path.dirname(os.path.abspath(path)))
+    base = np.datetime64(m.group(1), 'ns') if m else None
+    day_offset = 0
+    last_ns = None
+
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        chunk.columns = [c.capitalize() for c in chunk.columns]
+        times = chunk['Time'].astype(str)
+        if base is not None and len(times) and len(times.iloc[0]) <= 12:
+            tod = pd.to_timedelta(times).to_numpy(dtype='timedelta64[ns]').view('<i8')
+            # 跟上一筆比倒退超過半天 = 跨過午夜
+            prev = np.concatenate(([last_ns if last_ns is not None else tod[0]], tod[:-1]))
+            rollover = np.cumsum(tod - prev < -_HALF_DAY_NS) + day_offset
+            day_offset = int(rollover[-1])
+            last_ns = int(tod[-1])
+            ts = base + (tod + rollover * 86400 * 10**9).astype('timedelta64[ns]')
+        else:
+            ts = pd.to_datetime(times).to_numpy(dtype='datetime64[ns]')
+        yield ts, chunk['Price'].to_numpy(dtype=np.float64), chunk['Volume'].to_numpy(dtype=np.int64)
+
+
+def _archive_chunks(root, chunk_size, start=None, end=None):
+    """二進位封存：memmap 映射，每段只切一個視窗出來"""
+    cols = open_archive(root, start, end, columns=['ts', 'price', 'volume'])
+    n = len(cols['ts'])
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        yield cols['ts'][lo:hi], cols['price'][lo:hi], cols['volume'][lo:hi]
+
+
+def iter_tick_chunks(source, chunk_size=CHUNK_SIZE, start=None, end=None):
+    """
+    逐段讀出 Tick
+    :param source: Recorder 錄的 CSV 檔 (data/YYYY-MM-DD/TMF_tick.csv) 或二進位封存資料夾 (data/archive/TMF_tick)
+    :param start / end: 只有二進位封存支援，日期 'YYYY-MM-DD' (含頭含尾)
+    :return: 產生 (時間 datetime64[ns], 價格, 成交量) 三個陣列
+    """
+    if os.path.isdir(source):
+        yield from _archive_chunks(source, chunk_size, start, end)
+    else:
+        yield from _csv_chunks(source, chunk_size)
+
+
+class TickReplayer:
+    def __init__(self, engine, chunk_size=CHUNK_SIZE, code=None):
+        """
+        :param engine: 已經建好的 BotEngine (策略、週期、輸出端都照實盤的方式掛)
+        :param chunk_size: 每段讀幾筆
+        :param code: 填進 Tick.code 的合約代碼
+        """
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.code = code
+
+        # --- 統計 ---
+        self.ticks = 0
+        self.bars = 0
+        self.elapsed = 0.0
+        engine.subscribe(1, self._count_bar)
+
+    def _count_bar(self, bar):
+        self.bars += 1
+
+    def run(self, sources, start=None, end=None, flush=True):
+        """
+        依序回放一個或多個檔案 (多天就給多個，照時間排好)
+        :param flush: 回放完是否把還沒收完的 K 棒送出去
+        :return: stats()
+        """
+        if isinstance(sources, str):
+            sources = [sources]
+
+        process = self.engine.process_tick
+        # 沒有掛 Tick 輸出端時，Tick 只是把值傳給 BarGenerator，可以共用同一個物件
+        reuse = not self.engine.sinks.get('tick')
+        tick = Tick(None, 0.0, 0, self.code)
+        code = self.code
+
+        t0 = time.perf_counter()
+        for src in sources:
+            for ts, price, volume in iter_tick_chunks(src, self.chunk_size, start, end):
+                # 一次把整段轉成 Python 物件 (比逐筆轉型快很多)
+                dts = ts.astype('datetime64[us]').tolist()
+                prices = price.tolist()
+                vols = volume.tolist()
+                if reuse:
+                    for dt, p, v in zip(dts, prices, vols):
+                        tick.datetime = dt
+                        tick.close = p
+                        tick.volume = v
+                        process(tick)
+                else:
+                    for dt, p, v in zip(dts, prices, vols):
+                        process(Tick(dt, p, v, code))
+                self.ticks += len(prices)
+        if flush:
+            self.engine.flush()
+        self.elapsed += time.perf_counter() - t0
+        return self.stats()
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "bars": self.bars,
+            "seconds": self.elapsed,
+            "ticks_per_sec": self.ticks / self.elapsed if self.elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,142 @@
+import os
+import time
+import hashlib
+import sqlite3
+
+# ==========================================
+# 優化器結果快取 (存在硬碟，跨次執行沿用)
+# ==========================================
+# Key = (資料檔指紋, short, long, slope, friction)
+# 同一份資料只要參數算過一次就不再重算，加一個 long_ma 只會跑新增的組合。
+
+
+class ResultCache:
+    def __init__(self, path="data/cache/optimize_results.sqlite", max_bytes=64 * 1024 * 1024):
+        """
+        :param path: SQLite 檔案位置
+        :param max_bytes: 快取檔案上限，超過就淘汰最久沒用到的結果
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                fingerprint TEXT, short INTEGER, long INTEGER, slope INTEGER, friction REAL,
+                profit REAL, trades INTEGER, last_used REAL,
+                PRIMARY KEY (fingerprint, short, long, slope, friction)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON results (last_used)")
+        # 大檔案每次都重算 hash 太慢，用 (路徑, 大小, 修改時間) 記住算過的指紋
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT
+            )""")
+        self.conn.commit()
+
+    def fingerprint(self, data_path):
+        """資料檔內容的 SHA-256 (檔案沒變就直接用上次的結果)；資料夾 (二進位封存) 則合併裡面所有檔案"""
+        if os.path.isdir(data_path):
+            names = sorted(n for n in os.listdir(data_path) if not n.endswith(".tmp"))
+            return self.fingerprint_many([os.path.join(data_path, n) for n in names])
+
+        st = os.stat(data_path)
+        key = os.path.abspath(data_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, digest FROM fingerprints WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        h = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        self.conn.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                          (key, st.st_size, st.st_mtime_ns, digest))
+        self.conn.commit()
+        return digest
+
+    def fingerprint_many(self, paths, salt=""):
+        """多個檔案合起來的指紋 (歷史資料庫的一段日期、封存資料夾)；salt 可放日期範圍等額外條件"""
+        h = hashlib.sha256(salt.encode())
+        for path in paths:
+            if os.path.exists(path):
+                h.update(os.path.basename(path).encode())
+                h.update(self.fingerprint(path).encode())
+        return h.hexdigest()
+
+    def get_many(self, fingerprint, combos, friction):
+        """
+        查詢已算過的組合 (組合先放進暫存表，一次 JOIN 查完，不必每組各查一次)
+        :param combos: [(short, long, slope), ...]
+        :return: {(short, long, slope): (profit, trades)}
+        """
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS wanted (short INTEGER, long INTEGER, slope INTEGER)")
+        self.conn.execute("DELETE FROM wanted")
+        self.conn.executemany("INSERT INTO wanted VALUES (?, ?, ?)",
+                              [(int(s), int(l), int(sp)) for s, l, sp in combos])
+
+        rows = self.conn.execute(
+            "SELECT r.rowid, r.short, r.long, r.slope, r.profit, r.trades "
+            "FROM wanted w JOIN results r "
+            "ON r.fingerprint = ? AND r.short = w.short AND r.long = w.long "
+            "AND r.slope = w.slope AND r.friction = ?",
+            (fingerprint, friction)).fetchall()
+        found = {(s, l, sp): (p, c) for _, s, l, sp, p, c in rows}
+
+        if rows:
+            now = time.time()
+            self.conn.executemany("UPDATE results SET last_used = ? WHERE rowid = ?",
+                                  [(now, r[0]) for r in rows])
+        self.conn.commit()
+        return found
+
+    def put_many(self, fingerprint, rows, friction):
+        """
+        寫入新結果
+        :param rows: [{'short', 'long', 'slope', 'profit', 'trades'}, ...]
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(fingerprint, int(r['short']), int(r['long']), int(r['slope']), friction,
+              float(r['profit']), int(r['trades']), now) for r in rows])
+        self.conn.commit()
+        self._evict(before=now)
+
+    def _size_bytes(self):
+        """實際有用到的大小 (刪掉的列留下的空頁會被之後的寫入重複利用，不算在內)"""
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, before):
+        """
+        超過上限時，每次淘汰最久沒用到的 1/4，直到低於上限
+        只淘汰 last_used 早於 before 的結果 (這一批剛寫入的不會被自己擠掉)；
+        last_used 相同時依 rowid (寫入順序) 先舊後新。
+        不做 VACUUM：空出來的頁面留在檔案裡給下一次寫入用，檔案大小維持在上限附近。
+        """
+        dropped = 0
+        while self._size_bytes() > self.max_bytes:
+            total = self.conn.execute(
+                "SELECT COUNT(*) FROM results WHERE last_used < ?", (before,)).fetchone()[0]
+            if total == 0:
+                break
+            drop = max(total // 4, 1)
+            self.conn.execute(
+                "DELETE FROM results WHERE rowid IN "
+                "(SELECT rowid FROM results WHERE last_used < ? ORDER BY last_used, rowid LIMIT ?)",
+                (before, drop))
+            self.conn.commit()
+            dropped += drop
+        if dropped:
+            print(f"🧹 [結果快取] 超過容量上限，已淘汰 {dropped} 筆舊結果")
+
+    def close(self):
+        self.conn.close()
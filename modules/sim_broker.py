@@ -0,0 +1,166 @@
+import os
+import numpy as np
+import pandas as pd
+from config.settings import Settings
+
+# ==========================================
+# 模擬券商 (回測專用，靜音快速版)
+# ==========================================
+# 介面跟 Trader 一樣 (place_order / get_positions / get_account_balance)，
+# 但不建 Order、不印東西、不碰 API：成交、損益、帳本都記在記憶體陣列裡，
+# 回測結束再 write_ledger() 一次寫檔。
+#
+# 成交價 = 參考價 ± 滑價 (買進往上、賣出往下)，每口每邊再扣手續費 (單位都是點)
+
+
+class SimBroker:
+    LEDGER_COLUMNS = ["Time", "Action", "Qty", "Price", "Fill", "Fee", "Profit", "Position", "Total_Profit", "Note"]
+
+    def __init__(self, slippage=None, fee=None, capacity=1024):
+        """
+        :param slippage: 每口每邊滑價 (點)，預設 Settings.SIM_SLIPPAGE
+        :param fee: 每口每邊手續費+稅 (點)，預設 Settings.SIM_FEE
+        :param capacity: 帳本初始容量 (不夠會自動加倍)
+        """
+        self.slippage = Settings.SIM_SLIPPAGE if slippage is None else slippage
+        self.fee = Settings.SIM_FEE if fee is None else fee
+        self.account = "Sim_Account"
+
+        # 參考價：策略每根 K 棒呼叫 mark()，市價單就用這個價格成交
+        self.mark_dt = None
+        self.mark_price = 0.0
+
+        # --- 部位與損益 ---
+        self.position = 0
+        self.avg_price = 0.0
+        self.realized = 0.0      # 已實現損益 (已扣滑價，未扣手續費)
+        self.fees = 0.0
+        self.trades = 0          # 平倉次數
+
+        # --- 帳本 (numpy 陣列，容量不夠就加倍) ---
+        self.n = 0
+        self._alloc(capacity)
+        self.notes = []
+
+    def _alloc(self, capacity):
+        old = getattr(self, "cols", None)
+        self.cols = {
+            "time": np.empty(capacity, dtype='datetime64[us]'),
+            "side": np.empty(capacity, dtype=np.int8),
+            "qty": np.empty(capacity, dtype=np.int32),
+            "price": np.empty(capacity, dtype=np.float64),
+            "fill": np.empty(capacity, dtype=np.float64),
+            "fee": np.empty(capacity, dtype=np.float64),
+            "profit": np.empty(capacity, dtype=np.float64),
+            "position": np.empty(capacity, dtype=np.int32),
+            "total": np.empty(capacity, dtype=np.float64),
+        }
+        if old is not None:
+            for k, v in old.items():
+                self.cols[k][:self.n] = v[:self.n]
+
+    def mark(self, dt, price):
+        """更新參考價 (策略每根 K 棒呼叫一次)"""
+        self.mark_dt = dt
+        self.mark_price = price
+
+    # --- Trader 相容介面 ---
+
+    def place_order(self, contract_code, action, quantity=1, price=0, note=""):
+        """市價單 (price <= 0) 用參考價成交；note (下單原因) 記進帳本；回傳成交序號"""
+        ref = price if price > 0 else self.mark_price
+        return self.fill(self.mark_dt, action, quantity, ref, note)
+
+    def get_positions(self):
+        if self.position == 0:
+            return []
+        return [{
+            "code": Settings.TARGET_CONTRACT,
+            "direction": "Buy" if self.position > 0 else "Sell",
+            "quantity": abs(self.position),
+            "price": self.avg_price,
+            "pnl": (self.mark_price - self.avg_price) * self.position,
+        }]
+
+    def get_account_balance(self):
+        return {"equity": self.net_profit, "available": self.net_profit, "total_pnl": self.net_profit}
+
+    # --- 撮合 ---
+
+    def fill(self, dt, action, quantity, price, note=""):
+        side = 1 if action == "Buy" else -1
+        fill_price = price + side * self.slippage
+        fee = self.fee * quantity
+
+        # 先平掉反向部位，剩下的才是新開倉
+        profit = 0.0
+        closing = min(quantity, abs(self.position)) if self.position * side < 0 else 0
+        if closing:
+            profit = (fill_price - self.avg_price) * closing * -side
+            self.realized += profit
+            self.trades += 1
+        opening = quantity - closing
+        if opening:
+            held = abs(self.position) - closing
+            self.avg_price = (self.avg_price * held + fill_price * opening) / (held + opening)
+        self.position += side * quantity
+        if self.position == 0:
+            self.avg_price = 0.0
+        self.fees += fee
+
+        i = self.n
+        if i == len(self.cols["side"]):
+            self._alloc(i * 2)
+        c = self.cols
+        c["time"][i] = dt if dt is not None else np.datetime64('NaT')
+        c["side"][i] = side
+        c["qty"][i] = quantity
+        c["price"][i] = price
+        c["fill"][i] = fill_price
+        c["fee"][i] = fee
+        c["profit"][i] = profit
+        c["position"][i] = self.position
+        c["total"][i] = self.realized - self.fees
+        self.notes.append(note)
+        self.n = i + 1
+        return i
+
+    # --- 結果 ---
+
+    @property
+    def net_profit(self):
+        """已實現損益 - 手續費 (點)"""
+        return self.realized - self.fees
+
+    def ledger(self):
+        """帳本轉成 DataFrame (只在需要時才建)"""
+        n = self.n
+        c = self.cols
+        return pd.DataFrame({
+            "Time": c["time"][:n],
+            "Action": np.where(c["side"][:n] > 0, "Buy", "Sell"),
+            "Qty": c["qty"][:n],
+            "Price": c["price"][:n],
+            "Fill": c["fill"][:n],
+            "Fee": c["fee"][:n],
+            "Profit": c["profit"][:n],
+            "Position": c["position"][:n],
+            "Total_Profit": c["total"][:n],
+            "Note": self.notes[:n],
+        }, columns=self.LEDGER_COLUMNS)
+
+    def write_ledger(self, path):
+        """回測結束時一次寫出整本帳"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ledger().to_csv(path, index=False, float_format="%.1f")
+        return path
+
+    def summary(self):
+        return {
+            "fills": self.n,
+            "trades": self.trades,
+            "position": self.position,
+            "gross": float(self.realized),
+            "fees": float(self.fees),
+            "net": float(self.net_profit),
+        }
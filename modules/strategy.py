@@ -4,9 +4,19 @@ from datetime import datetime
 from config.settings import Settings
 
 class Strategy:
-    def __init__(self, bot, trader=None):
+    def __init__(self, bot, trader=None, quiet=False):
+        """
+        :param trader: Trader (實盤/演習) 或 SimBroker (回測)
+        :param quiet: 靜音模式 (回測用)：不印訊號、不發 Telegram，交易紀錄先放記憶體，
+                      最後呼叫 flush_ledger() 一次寫檔
+        """
         self.bot = bot
         self.trader = trader
+        self.quiet = quiet
+        self.ledger_rows = []      # 靜音模式下暫存的交易紀錄
+
+        # SimBroker 需要每根 K 棒的參考價來撮合市價單
+        self._mark = getattr(trader, 'mark', None)
         self.position = 0          # 目前持倉總數 (多單為正，空單為負)
         self.entry_price = 0.0     # 成本價
         self.is_trading_active = True 
@@ -34,23 +44,25 @@ class Strategy:
     def on_bar(self, bar):
         """策略核心邏輯：雙均線交叉判斷"""
         if not self.is_trading_active:
-            if bar.get('ma5') and bar.get('ma20'):
-                self.prev_ma5 = bar['ma5']
-                self.prev_ma20 = bar['ma20']
+            if bar.ind.get('ma5') and bar.ind.get('ma20'):
+                self.prev_ma5 = bar.ind['ma5']
+                self.prev_ma20 = bar.ind['ma20']
             return
 
         # 確保有指標數據
-        curr_ma5 = bar.get('ma5')
-        curr_ma20 = bar.get('ma20')
+        curr_ma5 = bar.ind.get('ma5')
+        curr_ma20 = bar.ind.get('ma20')
         if curr_ma5 is None or curr_ma20 is None:
             return
 
-        close_price = bar['close']
-        time_str = bar['dt'].strftime("%H:%M")
+        close_price = bar.close
+        if self._mark:
+            self._mark(bar.dt, close_price)
 
         if self.prev_ma5 is not None and self.prev_ma20 is not None:
             # 🔥 黃金交叉 (MA5 往上穿過 MA20)
             if self.prev_ma5 < self.prev_ma20 and curr_ma5 > curr_ma20:
+                time_str = bar.dt.strftime("%H:%M")   # 有訊號才需要格式化時間
                 if self.position == 0:
                     self.buy(close_price, time_str, "黃金交叉")
                 elif self.position < 0:
@@ -58,6 +70,7 @@ class Strategy:
 
             # 🔥 死亡交叉 (MA5 往下穿過 MA20)
             elif self.prev_ma5 > self.prev_ma20 and curr_ma5 < curr_ma20:
+                time_str = bar.dt.strftime("%H:%M")
                 if self.position == 0:
                     self.sell(close_price, time_str, "死亡交叉")
                 elif self.position > 0:
@@ -78,22 +91,24 @@ class Strategy:
             profit = float(self.entry_price) - price
             self.total_profit += profit
             self.trade_count += 1
-            msg = f"⚪ [空單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
-            print(f"\n{msg}")
-            self.bot.send_info("平倉通知", msg)
+            if not self.quiet:
+                msg = f"⚪ [空單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
+                print(f"\n{msg}")
+                self.bot.send_info("平倉通知", msg)
             self._log_trade(time, "COVER", price, profit, note)
         else:
             # 如果原本沒單或有多單，就是單純的開倉/加碼
-            msg = f"🔴 [買進] {time} 價格: {price} ({note})"
-            print(f"\n{msg}")
-            self.bot.send_alert("策略訊號", msg)
+            if not self.quiet:
+                msg = f"🔴 [買進] {time} 價格: {price} ({note})"
+                print(f"\n{msg}")
+                self.bot.send_alert("策略訊號", msg)
             self._log_trade(time, "BUY", price, 0, note)
 
         self.position += 1  # 倉位累加
         self.entry_price = price
         
         if self.trader:
-            self.trader.place_order(Settings.TARGET_CONTRACT, "Buy", 1)
+            self.trader.place_order(Settings.TARGET_CONTRACT, "Buy", 1, note=note)
 
     def sell(self, price, time, note=""):
         price = float(price)
@@ -102,48 +117,56 @@ class Strategy:
             profit = price - float(self.entry_price)
             self.total_profit += profit
             self.trade_count += 1
-            msg = f"⚪ [多單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
-            print(f"\n{msg}")
-            self.bot.send_info("平倉通知", msg)
+            if not self.quiet:
+                msg = f"⚪ [多單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
+                print(f"\n{msg}")
+                self.bot.send_info("平倉通知", msg)
             self._log_trade(time, "SELL_OFFSET", price, profit, note)
         else:
             # 如果原本沒單或有空單，就是單純的開空/加碼
-            msg = f"🟢 [做空] {time} 價格: {price} ({note})"
-            print(f"\n{msg}")
-            self.bot.send_alert("策略訊號", msg)
+            if not self.quiet:
+                msg = f"🟢 [做空] {time} 價格: {price} ({note})"
+                print(f"\n{msg}")
+                self.bot.send_alert("策略訊號", msg)
             self._log_trade(time, "SELL", price, 0, note)
 
         self.position -= 1  # 倉位累扣
         self.entry_price = price
 
         if self.trader:
-            self.trader.place_order(Settings.TARGET_CONTRACT, "Sell", 1)
+            self.trader.place_order(Settings.TARGET_CONTRACT, "Sell", 1, note=note)
 
     def sell_offset(self, price, time, note=""):
         profit = float(price) - float(self.entry_price)
         self.total_profit += profit
         self.trade_count += 1
         self.position = 0 # 平倉則歸零
-        msg = f"⚪ [多單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
-        print(f"\n{msg}")
-        self.bot.send_info("平倉通知", msg)
+        if not self.quiet:
+            msg = f"⚪ [多單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
+            print(f"\n{msg}")
+            self.bot.send_info("平倉通知", msg)
         self._log_trade(time, "SELL_OFFSET", price, profit, note)
         if self.trader:
-            self.trader.place_order(Settings.TARGET_CONTRACT, "Sell", 1)
+            self.trader.place_order(Settings.TARGET_CONTRACT, "Sell", 1, note=note)
 
     def cover(self, price, time, note=""):
         profit = float(self.entry_price) - float(price)
         self.total_profit += profit
         self.trade_count += 1
         self.position = 0 # 平倉則歸零
-        msg = f"⚪ [空單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
-        print(f"\n{msg}")
-        self.bot.send_info("平倉通知", msg)
+        if not self.quiet:
+            msg = f"⚪ [空單平倉] {time} 價格: {price} | 損益: {profit:.0f} | 累積: {self.total_profit:.0f}"
+            print(f"\n{msg}")
+            self.bot.send_info("平倉通知", msg)
         self._log_trade(time, "COVER", price, profit, note)
         if self.trader:
-            self.trader.place_order(Settings.TARGET_CONTRACT, "Buy", 1)
+            self.trader.place_order(Settings.TARGET_CONTRACT, "Buy", 1, note=note)
 
     def _log_trade(self, time_str, action, price, profit, note):
+        if self.quiet:
+            # 靜音模式：先記在記憶體，flush_ledger() 再一次寫檔
+            self.ledger_rows.append((time_str, action, price, profit, self.total_profit, note))
+            return
         try:
             mode = "DRY_RUN" if Settings.DRY_RUN else "LIVE"
             with open(self.file_path, 'a', newline='', encoding='utf-8') as f:
@@ -152,4 +175,20 @@ class Strategy:
                                  f"{profit:.1f}" if profit != 0 else "", 
                                  f"{self.total_profit:.1f}", note])
         except Exception as e:
-            print(f"❌ 紀錄 CSV 失敗: {e}")
\ No newline at end of file
+            print(f"❌ 紀錄 CSV 失敗: {e}")
+
+    def flush_ledger(self):
+        """[靜音模式] 把記憶體裡的交易紀錄一次寫進 CSV"""
+        if not self.ledger_rows:
+            return
+        mode = "DRY_RUN" if Settings.DRY_RUN else "LIVE"
+        try:
+            with open(self.file_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerows([t, mode, action, price,
+                                  f"{profit:.1f}" if profit != 0 else "",
+                                  f"{total:.1f}", note]
+                                 for t, action, price, profit, total, note in self.ledger_rows)
+            self.ledger_rows.clear()
+        except Exception as e:
+            print(f"❌ 紀錄 CSV 失敗: {e}")
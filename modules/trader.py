@@ -1,11 +1,19 @@
 import shioaji as sj
 from shioaji import constant, account
 from config.settings import Settings
+from core import metrics
+
+_ORDERS = {a: metrics.counter("orders_total", "送出的委託數", labels={"action": a}) for a in ("Buy", "Sell")}
+_ORDER_FAILURES = metrics.counter("order_failures_total", "下單失敗的次數")
 
 class Trader:
-    def __init__(self, api):
+    def __init__(self, api, tracer=None):
+        """
+        :param tracer: (選填) core.latency.LatencyTracer，記錄 tick-to-trade 與送單延遲
+        """
         self.api = api
         self.account = None
+        self.tracer = tracer
         
         print("💳 [Trader] 正在掃描可用帳號...")
         try:
@@ -26,7 +34,24 @@ class Trader:
             if self.api.stock_account:
                 self.account = self.api.stock_account
 
-    def place_order(self, contract_code, action, quantity=1, price=0):
+    def place_order(self, contract_code, action, quantity=1, price=0, note=""):
+        """
+        :param note: 下單原因 (策略訊號說明)，只用來印在日誌上
+        """
+        tracer = self.tracer
+        started = tracer.order_start() if tracer is not None else 0
+        try:
+            result = self._place_order(contract_code, action, quantity, price, note)
+        finally:
+            if tracer is not None:
+                tracer.order_end(started)
+        if result is None:
+            _ORDER_FAILURES.inc()
+        else:
+            _ORDERS["Buy" if action == "Buy" else "Sell"].inc()
+        return result
+
+    def _place_order(self, contract_code, action, quantity=1, price=0, note=""):
         try:
             if not self.account:
                 print("❌ [下單失敗] 無有效帳號")
@@ -68,12 +93,13 @@ class Trader:
                 account=self.account
             )
 
+            reason = f" ({note})" if note else ""
             if Settings.DRY_RUN:
                 print(f"🚧 [演習模式] 攔截下單！")
-                print(f"   📝 內容: {action} {contract_code} x {quantity} @ {input_price}")
+                print(f"   📝 內容: {action} {contract_code} x {quantity} @ {input_price}{reason}")
                 return "DryRun_Success_ID"
             else:
-                print(f"⚡ [真實下單] 發送中... {action} {contract_code} x {quantity} @ {input_price}")
+                print(f"⚡ [真實下單] 發送中... {action} {contract_code} x {quantity} @ {input_price}{reason}")
                 trade = self.api.place_order(contract, order)
                 print(f"✅ [Trader] 委託已送出: {action} {contract_code} x{quantity}")
                 print(f"   👉 類型: {p_type}, 條件: {o_type}")
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 向量化回測核心 (給 optimize.py 掃參數用)
+# ==========================================
+# 原本 run_backtest_with_filter 用 iterrows() 一根一根跑，
+# 這裡把「交叉訊號 → 斜率濾網 → 倉位切換 → 摩擦成本 → 交易次數」
+# 全部改成 NumPy 陣列運算，結果與逐筆迴圈完全相同。
+
+
+def shift(arr, n):
+    """等同 pandas 的 Series.shift(n)：往後移 n 格，前面補 NaN"""
+    out = np.empty_like(arr, dtype=np.float64)
+    if n <= 0:
+        out[:] = arr
+        return out
+    out[:n] = np.nan
+    out[n:] = arr[:-n]
+    return out
+
+
+def crossover_signals(ma_s, ma_l, slope_p):
+    """
+    算出每根 K 線的進場方向 (向量版)
+    :return: int8 陣列，1 = 黃金交叉進多、-1 = 死亡交叉進空、0 = 無動作
+    """
+    prev_s = shift(ma_s, 1)
+    prev_l = shift(ma_l, 1)
+
+    # 長均線斜率 (當前 MA_L 減掉 N 根前的 MA_L)
+    slope = ma_l - shift(ma_l, slope_p)
+
+    # 等同原本的 dropna(subset=['prev_ma_s', 'prev_ma_l', 'ma_l_slope'])
+    valid = ~(np.isnan(prev_s) | np.isnan(prev_l) | np.isnan(slope))
+
+    golden = valid & (prev_s < prev_l) & (ma_s > ma_l)
+    death = valid & (prev_s > prev_l) & (ma_s < ma_l)
+
+    # 斜率濾網：slope_p 為 0 代表不過濾
+    if slope_p != 0:
+        golden &= slope > 0
+        death &= slope < 0
+
+    signal = np.zeros(len(ma_s), dtype=np.int8)
+    signal[golden] = 1
+    signal[death] = -1
+    return signal
+
+
+def settle_signals(close, signal, friction):
+    """
+    把訊號陣列結算成 (總損益, 交易次數)
+
+    原本迴圈的規則：每個被接受的訊號都會把 entry_price 設成當根收盤價，
+    只有「方向反轉」時才結算上一筆。所以第 k 個訊號的損益就是
+    前一個訊號方向 × (本次收盤 - 前次收盤) - 摩擦成本。
+    """
+    idx = np.flatnonzero(signal)
+    if len(idx) < 2:
+        return 0.0, 0
+
+    d = signal[idx].astype(np.float64)
+    c = close[idx]
+
+    flips = d[1:] != d[:-1]
+    trade_count = int(np.count_nonzero(flips))
+    if trade_count == 0:
+        return 0.0, 0
+
+    pnl = d[:-1][flips] * (c[1:][flips] - c[:-1][flips]) - friction
+    # 用 cumsum 逐筆累加 (與迴圈的 += 順序一致，浮點數結果不會有誤差)
+    total_profit = float(np.cumsum(pnl)[-1])
+    return total_profit, trade_count
+
+
+def settle_curve(close, signal, friction):
+    """
+    同 settle_signals，但回傳每根 K 線的累積已實現損益 (權益曲線)
+    損益記在「方向反轉」那根 K 線上，最後一個值等於 settle_signals 的總損益
+    """
+    curve = np.zeros(len(close), dtype=np.float64)
+    idx = np.flatnonzero(signal)
+    if len(idx) < 2:
+        return curve, 0
+
+    d = signal[idx].astype(np.float64)
+    c = close[idx]
+    flips = d[1:] != d[:-1]
+    pnl = d[:-1][flips] * (c[1:][flips] - c[:-1][flips]) - friction
+    curve[idx[1:][flips]] = pnl
+    return np.cumsum(curve), int(np.count_nonzero(flips))
+
+
+def crossover_backtest(close, ma_s, ma_l, slope_p, friction):
+    """
+    雙均線 + 長均線斜率濾網的向量化回測
+    :param close: 收盤價 (float64 陣列)
+    :param ma_s / ma_l: 短 / 長均線 (前面不足的部分為 NaN)
+    :return: (總損益, 交易次數)
+    """
+    signal = crossover_signals(ma_s, ma_l, slope_p)
+    return settle_signals(close, signal, friction)
+
+
+# ==========================================
+# 批次模式：共用前綴和，一次算完整張參數表
+# ==========================================
+
+def prefix_sum_mas(close, windows):
+    """
+    一次 cumsum，算出所有需要的均線 (取代每組參數各自 rolling().mean())
+    :return: {window: ma 陣列}，前 window-1 根為 NaN
+
+    報價是整數時 (台指期都是整數點) 走 int64 前綴和，結果與 pandas rolling 完全相同；
+    有小數時改用扣掉基準價的 float 前綴和降低累積誤差，但兩條均線剛好相等的 K 線
+    可能與 rolling 判讀不同 (浮點數捨入方向不同)。
+    """
+    n = len(close)
+    if n == 0:
+        return {w: np.empty(0) for w in windows}
+
+    if np.isnan(close).any():
+        # 有缺值就退回 pandas (NaN 會汙染前綴和)，但每個 window 仍只算一次
+        s = pd.Series(close)
+        return {w: s.rolling(window=w).mean().to_numpy() for w in set(windows)}
+
+    integral = np.all(close == np.round(close))
+    if integral:
+        csum = np.concatenate(([0], np.cumsum(close.astype(np.int64))))
+        base = 0.0
+    else:
+        base = float(close[0])
+        csum = np.concatenate(([0.0], np.cumsum(close - base)))
+
+    mas = {}
+    for w in set(windows):
+        ma = np.full(n, np.nan)
+        if w <= n:
+            ma[w - 1:] = (csum[w:] - csum[:-w]) / w + base
+        mas[w] = ma
+    return mas
+
+
+def _settle_matrix(close, signal, friction):
+    """
+    settle_signals 的多維版：signal 最後一軸是時間，前面幾軸是參數組合
+    只在「有訊號的 K 線」上運算 (訊號很稀疏)，不必展開整個時間軸
+    :return: (總損益陣列, 交易次數陣列)
+    """
+    shape = signal.shape[:-1]
+    flat = signal.reshape(-1, signal.shape[-1])
+
+    # nonzero 依 (組合, 時間) 排序，同一組合的訊號會排在一起
+    rows, bars = np.nonzero(flat)
+    d = flat[rows, bars].astype(np.float64)
+    c = close[bars]
+
+    flips = (rows[1:] == rows[:-1]) & (d[1:] != d[:-1])
+    pnl = d[:-1][flips] * (c[1:][flips] - c[:-1][flips]) - friction
+    counts = np.bincount(rows[1:][flips], minlength=len(flat))
+
+    # 與單組版本一樣逐列用 cumsum 依序累加，確保結果逐位元相同
+    totals = np.zeros(len(flat))
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    for k in np.flatnonzero(counts):
+        totals[k] = np.cumsum(pnl[bounds[k]:bounds[k + 1]])[-1]
+    return totals.reshape(shape), counts.reshape(shape)
+
+
+def batch_crossover_backtest(close, short_list, long_list, slope_list, friction):
+    """
+    一次評估所有 (short, long, slope) 組合
+
+    - 所有均線共用一次前綴和
+    - 外層只跑短均線，內層把 (long, slope) 攤成 3 維陣列 [L, P, 時間] 一起算
+    :return: DataFrame，欄位 short / long / slope / profit / trades (short >= long 的組合會略過)
+    """
+    close = np.asarray(close, dtype=np.float64)
+    long_list = list(long_list)
+    slope_list = list(slope_list)
+    mas = prefix_sum_mas(close, list(short_list) + long_list)
+
+    ma_l = np.stack([mas[l] for l in long_list])                     # [L, N]
+    prev_l = np.stack([shift(row, 1) for row in ma_l])              # [L, N]
+    slope = np.stack([[row - shift(row, p) for p in slope_list]
+                      for row in ma_l])                             # [L, P, N]
+    slope_valid = ~np.isnan(slope)
+    slope_on = np.array([p != 0 for p in slope_list])[None, :, None]
+    slope_up = ~slope_on | (slope > 0)
+    slope_dn = ~slope_on | (slope < 0)
+
+    rows = []
+    for s in short_list:
+        ma_s = mas[s]
+        prev_s = shift(ma_s, 1)
+
+        golden = (prev_s < prev_l) & (ma_s > ma_l)                  # [L, N]
+        death = (prev_s > prev_l) & (ma_s < ma_l)
+        base_valid = ~(np.isnan(prev_s) | np.isnan(prev_l))
+
+        valid = base_valid[:, None, :] & slope_valid                 # [L, P, N]
+        signal = np.zeros(slope.shape, dtype=np.int8)
+        signal[valid & golden[:, None, :] & slope_up] = 1
+        signal[valid & death[:, None, :] & slope_dn] = -1
+
+        totals, counts = _settle_matrix(close, signal, friction)
+        for i, l in enumerate(long_list):
+            if s >= l:
+                continue
+            for j, p in enumerate(slope_list):
+                rows.append({'short': s, 'long': l, 'slope': p,
+                             'profit': float(totals[i, j]), 'trades': int(counts[i, j])})
+
+    return pd.DataFrame(rows, columns=['short', 'long', 'slope', 'profit', 'trades'])
@@ -0,0 +1,139 @@
+import os
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from modules.vector_backtest import crossover_signals, settle_signals, settle_curve, prefix_sum_mas
+from modules.parallel_sweep import ProgressReporter, SharedPrices, map_shared
+from modules.history_store import trading_days
+
+# ==========================================
+# Walk-forward 優化 (滾動樣本內挑參數、樣本外驗證)
+# ==========================================
+# |---- 訓練 N 天 ----|-- 測試 M 天 --|
+#          |---- 訓練 N 天 ----|-- 測試 M 天 --|
+#                   |---- 訓練 N 天 ----|-- 測試 M 天 --|
+#
+# 每個 fold 在訓練區間挑出總損益最高的 (short, long, slope)，拿去跑緊接著的測試區間，
+# 最後把所有測試區間的損益接起來，就是「沒有偷看未來」的樣本外權益曲線。
+#
+# - 所有均線只在整段資料上算一次 (只用到過去的價格，切到哪個 fold 都一樣)，
+#   收盤價 + 均線矩陣透過 memmap 給所有 worker 共用
+# - 每個 fold 是一個獨立任務，丟進行程池平行跑
+
+
+def make_folds(index, train_days, test_days):
+    """
+    依交易日切出滾動視窗
+    :param index: DatetimeIndex (已排序)
+    :return: [(訓練起, 訓練迄, 測試起, 測試迄, 訓練首日, 訓練末日, 測試首日, 測試末日), ...]
+             前四個是 K 線位置 (含頭不含尾)
+    """
+    days = trading_days(index.to_numpy(dtype='datetime64[ns]'))
+    uniq = np.unique(days)
+    starts = np.searchsorted(days, uniq, side='left')
+    ends = np.append(starts[1:], len(days))
+
+    folds = []
+    i = 0
+    while i + train_days < len(uniq):
+        t_end = i + train_days
+        o_end = min(t_end + test_days, len(uniq))
+        folds.append((int(starts[i]), int(starts[t_end]), int(starts[t_end]), int(ends[o_end - 1]),
+                      str(uniq[i]), str(uniq[t_end - 1]), str(uniq[t_end]), str(uniq[o_end - 1])))
+        i += test_days
+    return folds
+
+
+# --- Worker 端狀態 ---
+_wf_data = None      # [1 + 均線數, K 線數]：第 0 列是收盤價
+_wf_rows = {}        # 均線週期 -> 列號
+
+
+def _init_wf_worker(path, shape, windows):
+    global _wf_data
+    _wf_data = map_shared(path, shape)
+    _wf_rows.clear()
+    _wf_rows.update({w: i + 1 for i, w in enumerate(windows)})
+
+
+def _signal(s, l, sp, lo, hi):
+    """
+    算 [lo, hi) 區間的訊號：往前多借幾根 K 線給 shift 用，
+    結果跟在整段資料上算完再切片完全相同
+    """
+    pad = max(lo - (sp + 1), 0)
+    sig = crossover_signals(_wf_data[_wf_rows[s], pad:hi], _wf_data[_wf_rows[l], pad:hi], sp)
+    return sig[lo - pad:]
+
+
+def _run_fold(task):
+    """一個 fold：訓練區間掃完整張參數表挑最佳，再跑測試區間"""
+    k, (tr_lo, tr_hi, te_lo, te_hi), combos, friction = task
+    close = _wf_data[0]
+
+    best = None
+    for s, l, sp in combos:
+        p, c = settle_signals(close[tr_lo:tr_hi], _signal(s, l, sp, tr_lo, tr_hi), friction)
+        # 同分取掃描順序在前的 (跟排行榜的穩定排序一致)
+        if best is None or p > best[3]:
+            best = (s, l, sp, p, c)
+
+    s, l, sp, train_profit, train_trades = best
+    curve, test_trades = settle_curve(close[te_lo:te_hi], _signal(s, l, sp, te_lo, te_hi), friction)
+    return k, best, curve, test_trades
+
+
+def walk_forward(df, short_list, long_list, slope_list, friction, train_days=20, test_days=5, workers=None):
+    """
+    :param df: 有 Time 索引與 Close 欄位的 DataFrame
+    :return: (各 fold 摘要 DataFrame, 拼接後的樣本外權益曲線 DataFrame)
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    folds = make_folds(df.index, train_days, test_days)
+    if not folds:
+        raise ValueError(f"資料只有 {len(np.unique(trading_days(df.index.to_numpy())))} 個交易日，"
+                         f"不夠切出 訓練 {train_days} 天 + 測試 的視窗")
+
+    combos = [(s, l, sp) for s in short_list for l in long_list if s < l for sp in slope_list]
+    windows = sorted(set(short_list) | set(long_list))
+    mas = prefix_sum_mas(close, windows)
+    block = np.vstack([close] + [mas[w] for w in windows])
+
+    tasks = [(k, f[:4], combos, friction) for k, f in enumerate(folds)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    progress = ProgressReporter(len(tasks), label="Walk-forward")
+
+    results = {}
+    with SharedPrices(block) as shared:
+        initargs = shared.spec + (windows,)
+        if workers == 1:
+            _init_wf_worker(*initargs)
+            for t in tasks:
+                r = _run_fold(t)
+                results[r[0]] = r
+                progress.update()
+        else:
+            with mp.Pool(processes=workers, initializer=_init_wf_worker, initargs=initargs) as pool:
+                for r in pool.imap_unordered(_run_fold, tasks):
+                    results[r[0]] = r
+                    progress.update()
+
+    # 依時間順序把測試區間接起來：每段的曲線從上一段的終點繼續累加
+    rows, pieces, offset = [], [], 0.0
+    index = df.index
+    for k, f in enumerate(folds):
+        _, (s, l, sp, train_profit, train_trades), curve, test_trades = results[k]
+        te_lo, te_hi = f[2], f[3]
+        train_start, train_end, test_start, test_end = f[4:]
+        test_profit = float(curve[-1]) if len(curve) else 0.0
+        rows.append({'fold': k, 'train': f"{train_start}~{train_end}", 'test': f"{test_start}~{test_end}",
+                     'short': s, 'long': l, 'slope': sp,
+                     'train_profit': train_profit, 'train_trades': train_trades,
+                     'test_profit': test_profit, 'test_trades': test_trades})
+        pieces.append(pd.DataFrame({'fold': k, 'short': s, 'long': l, 'slope': sp,
+                                    'equity': curve + offset}, index=index[te_lo:te_hi]))
+        offset += test_profit
+
+    summary = pd.DataFrame(rows, columns=['fold', 'train', 'test', 'short', 'long', 'slope',
+                                          'train_profit', 'train_trades', 'test_profit', 'test_trades'])
+    return summary, pd.concat(pieces)
@@ -1,107 +1,223 @@
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from modules.vector_backtest import crossover_backtest, batch_crossover_backtest
+from modules.parallel_sweep import ProgressReporter, sweep_parallel
+from modules.result_cache import ResultCache
+from modules.history_store import load_bars, get_store
+from modules.walk_forward import walk_forward
+from modules.param_search import AdaptiveSearch, CrossoverEvaluator
 
 # ================= 設定區 =================
-DATA_PATH = "data/history/TMF202602_1min_history.csv"  # 你的 K 線路徑
+DATA_SOURCE = "TMF202602"  # 歷史資料庫的合約 (換月可給清單)；也可以是 CSV 路徑或二進位封存資料夾
+START_DATE = None          # 交易日 'YYYY-MM-DD' (含頭含尾)，None = 全部
+END_DATE = None
 FRICTION_COST = 5.0        # 設定更嚴格一點：每趟進出扣 2 點 (手續費 + 滑價)
 SLOPE_PERIOD = 0           # 用過去 5 分鐘的 MA 變化來判斷斜率
+SWEEP_MODE = "batch"       # "serial" = 逐組回測 / "batch" = 共用前綴和，一次算完整張參數表 / "parallel" = 多核心
+                           # "adaptive" = 粗掃 + 逐步細化 (用下面的 SEARCH_SPACE，不走窮舉)
+N_WORKERS = None           # parallel 模式的行程數 (None = 全部核心)
+RESULT_CACHE = "data/cache/optimize_results.sqlite"  # 結果快取 (設 None 關閉)
+CACHE_MAX_MB = 64          # 快取檔案上限，超過就淘汰最久沒用到的結果
 
-def run_backtest_with_filter(df, short_ma, long_ma, slope_p):
+# Walk-forward：滾動「訓練 N 天挑參數 -> 測試 M 天驗證」，輸出拼接後的樣本外權益曲線 (取代單一排行榜)
+WALK_FORWARD = False
+WF_TRAIN_DAYS = 20         # 每個 fold 的訓練交易日數
+WF_TEST_DAYS = 5           # 每個 fold 的測試交易日數 (也是視窗往前滾的步長)
+WF_OUTPUT_DIR = "data/walk_forward"
+
+# 自適應搜尋 (SWEEP_MODE = "adaptive")：4 個維度，完整網格太大就用這個
+SEARCH_SPACE = {
+    'interval': [1, 2, 3, 5, 10, 15],   # 用幾分 K 跑
+    'short': range(3, 61),
+    'long': range(20, 301, 5),
+    'slope': range(0, 21),
+}
+SEARCH_BUDGET = 3000       # 評估次數上限 (只跑前段資料也算一次)
+
+# 設定掃描範圍 (你可以根據需求調整)
+SHORT_MA_LIST = [5, 10, 15, 20, 30]
+LONG_MA_LIST  = [60, 80, 100, 120, 150, 200]
+SLOPE_LIST    = [SLOPE_PERIOD]   # 想連斜率一起掃就多放幾個，例如 [0, 3, 5, 10]
+
+def load_prices(source, start=None, end=None):
+    """只讀收盤價 (歷史資料庫只開日期範圍內的分檔；二進位封存用 memmap 直接映射)"""
+    return load_bars(source, start, end, columns=['close'])
+
+def data_fingerprint(cache, source, start=None, end=None):
+    """資料來源的指紋：檔案 / 資料夾直接算，歷史資料庫則合併日期範圍內的分檔"""
+    if isinstance(source, str) and os.path.exists(source):
+        if start is None and end is None:
+            return cache.fingerprint(source)
+        return cache.fingerprint_many([source], salt=f"{start}~{end}")
+    paths = get_store().partition_paths(source, start, end)
+    return cache.fingerprint_many(paths, salt=f"{source}|{start}~{end}")
+
+def run_backtest_with_filter(df, short_ma, long_ma, slope_p, friction=FRICTION_COST):
     """
     核心回測邏輯：具備長均線斜率濾網
+    (向量化版本：不再 copy 整張表、不再 iterrows，交給 NumPy 一次算完)
     """
-    work_df = df.copy()
-    
+    close = df['Close'].to_numpy(dtype=np.float64)
+    close_s = pd.Series(close)
+
     # 計算指標
-    work_df['ma_s'] = work_df['Close'].rolling(window=short_ma).mean()
-    work_df['ma_l'] = work_df['Close'].rolling(window=long_ma).mean()
-    
-    # 計算長均線斜率 (當前 MA_L 減掉 N 分鐘前的 MA_L)
-    work_df['ma_l_slope'] = work_df['ma_l'] - work_df['ma_l'].shift(slope_p)
-    
-    # 紀錄前一根 K 線狀態 (避免偷看未來)
-    work_df['prev_ma_s'] = work_df['ma_s'].shift(1)
-    work_df['prev_ma_l'] = work_df['ma_l'].shift(1)
-    
-    # 移除空值
-    work_df.dropna(subset=['prev_ma_s', 'prev_ma_l', 'ma_l_slope'], inplace=True)
-    
-    position = 0      # 1:多單, -1:空單, 0:空手
-    entry_price = 0
-    total_profit = 0
-    trade_count = 0
-    
-    for _, row in work_df.iterrows():
-        # --- 黃金交叉邏輯 ---
-        if row['prev_ma_s'] < row['prev_ma_l'] and row['ma_s'] > row['ma_l']:
-            # 💡 修正：如果 SLOPE_PERIOD 為 0，或者是斜率大於 0 才進場
-            if SLOPE_PERIOD == 0 or row['ma_l_slope'] > 0:
-                if position == -1: 
-                    total_profit += (entry_price - row['Close']) - FRICTION_COST
-                    trade_count += 1
-                entry_price = row['Close']
-                position = 1
-                
-        # --- 死亡交叉邏輯 ---
-        elif row['prev_ma_s'] > row['prev_ma_l'] and row['ma_s'] < row['ma_l']:
-            # 💡 修正：如果 SLOPE_PERIOD 為 0，或者是斜率小於 0 才進場
-            if SLOPE_PERIOD == 0 or row['ma_l_slope'] < 0:
-                if position == 1: 
-                    total_profit += (row['Close'] - entry_price) - FRICTION_COST
-                    trade_count += 1
-                entry_price = row['Close']
-                position = -1
-                
-    return total_profit, trade_count
+    ma_s = close_s.rolling(window=short_ma).mean().to_numpy()
+    ma_l = close_s.rolling(window=long_ma).mean().to_numpy()
+
+    return crossover_backtest(close, ma_s, ma_l, slope_p, friction)
+
+def sweep_serial(df, short_list, long_list, slope_list, friction=FRICTION_COST):
+    """逐組跑 run_backtest_with_filter (對照組，結果應與 batch 模式相同)"""
+    rows = []
+    progress = ProgressReporter(sum(1 for s in short_list for l in long_list if s < l) * len(slope_list))
+
+    for s in short_list:
+        for l in long_list:
+            if s >= l: continue
+            for sp in slope_list:
+                p, c = run_backtest_with_filter(df, s, l, sp, friction)
+                rows.append({'short': s, 'long': l, 'slope': sp, 'profit': p, 'trades': c})
+                progress.update()
+
+    return pd.DataFrame(rows, columns=['short', 'long', 'slope', 'profit', 'trades'])
+
+def sweep_batch(df, short_list, long_list, slope_list, friction=FRICTION_COST):
+    """所有均線共用一次前綴和，(long, slope) 攤成陣列一起算"""
+    close = df['Close'].to_numpy(dtype=np.float64)
+    return batch_crossover_backtest(close, short_list, long_list, slope_list, friction)
+
+def sweep_in_parallel(df, short_list, long_list, slope_list, friction=FRICTION_COST, workers=N_WORKERS):
+    """多核心掃描：收盤價透過 memmap 共用，結果與 serial 模式逐位元相同"""
+    close = df['Close'].to_numpy(dtype=np.float64)
+    return sweep_parallel(close, short_list, long_list, slope_list, friction, workers)
+
+def run_sweep(df, short_list, long_list, slope_list, friction=FRICTION_COST):
+    """依 SWEEP_MODE 選擇掃描方式"""
+    if SWEEP_MODE == "batch":
+        return sweep_batch(df, short_list, long_list, slope_list, friction)
+    elif SWEEP_MODE == "parallel":
+        return sweep_in_parallel(df, short_list, long_list, slope_list, friction)
+    return sweep_serial(df, short_list, long_list, slope_list, friction)
+
+def sweep_with_cache(df, cache, fingerprint, short_list, long_list, slope_list, friction=FRICTION_COST):
+    """
+    先查快取，只跑還沒算過的組合 (例如只多加了一個 long_ma)
+    回傳的表格順序與不開快取時完全相同
+    """
+    combos = [(s, l, sp) for s in short_list for l in long_list if s < l for sp in slope_list]
+    known = cache.get_many(fingerprint, combos, friction)
+    missing = [c for c in combos if c not in known]
+    print(f"🗃️ [結果快取] 命中 {len(known)} 組，需要重算 {len(missing)} 組")
+
+    if missing:
+        # 用「涵蓋所有缺漏組合」的最小子網格去跑，順手算到的組合也一併存起來
+        sub_s = [s for s in short_list if any(m[0] == s for m in missing)]
+        sub_l = [l for l in long_list if any(m[1] == l for m in missing)]
+        sub_p = [p for p in slope_list if any(m[2] == p for m in missing)]
+        fresh = run_sweep(df, sub_s, sub_l, sub_p, friction)
+        rows = fresh.to_dict('records')
+        cache.put_many(fingerprint, rows, friction)
+        for r in rows:
+            known[(r['short'], r['long'], r['slope'])] = (r['profit'], r['trades'])
+
+    ordered = [{'short': s, 'long': l, 'slope': sp, 'profit': known[(s, l, sp)][0], 'trades': known[(s, l, sp)][1]}
+               for s, l, sp in combos]
+    return pd.DataFrame(ordered, columns=['short', 'long', 'slope', 'profit', 'trades'])
+
+def build_leaderboard(res):
+    """把結果表轉成排行榜格式 (依總損益排序)"""
+    board = pd.DataFrame({
+        '組合(S/L)': [f"{s}/{l}" for s, l in zip(res['short'], res['long'])],
+        '斜率': res['slope'].to_numpy(),
+        '總損益': res['profit'].round(1).to_numpy(),
+        '交易次數': res['trades'].to_numpy(),
+        '期望值': [round(p / c, 2) if c > 0 else 0 for p, c in zip(res['profit'], res['trades'])],
+    })
+    # mergesort 是穩定排序，同分時保持掃描順序，各模式的排行榜才會一致
+    return board.sort_values(by='總損益', ascending=False, kind='mergesort')
+
+def run_walk_forward(df):
+    """Walk-forward 模式：印出各 fold 的選參與樣本外成績，並存下樣本外權益曲線"""
+    print(f"🚶 [Walk-forward] 訓練 {WF_TRAIN_DAYS} 天 / 測試 {WF_TEST_DAYS} 天")
+    try:
+        summary, equity = walk_forward(df, SHORT_MA_LIST, LONG_MA_LIST, SLOPE_LIST, FRICTION_COST,
+                                       WF_TRAIN_DAYS, WF_TEST_DAYS, N_WORKERS)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    print("\n" + "="*60)
+    print("🧪 Walk-forward 各 fold (樣本內挑參數 -> 樣本外驗證)")
+    print("="*60)
+    print(summary.round(1).to_string(index=False))
+    print("-"*60)
+    oos = summary['test_profit'].sum()
+    ins = summary['train_profit'].sum()
+    print(f"💰 樣本外總損益: {oos:.0f} 點 (交易 {summary['test_trades'].sum()} 次) | "
+          f"同期樣本內平均每 fold: {ins / len(summary):.0f} 點")
+
+    os.makedirs(WF_OUTPUT_DIR, exist_ok=True)
+    path = f"{WF_OUTPUT_DIR}/oos_equity_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    equity.to_csv(path)
+    print(f"📈 樣本外權益曲線已存至: {path}")
+
+def run_adaptive_search(df):
+    """自適應搜尋模式：粗網格 -> successive halving 淘汰 -> 在贏家附近細化"""
+    evaluator = CrossoverEvaluator(df, FRICTION_COST)
+    search = AdaptiveSearch(evaluator, SEARCH_SPACE, budget=SEARCH_BUDGET,
+                            constraint=lambda p: p['short'] < p['long'])
+    print(f"🔎 [自適應搜尋] 完整網格 {search.grid_size():,} 組 | 評估預算 {SEARCH_BUDGET} 次")
+
+    t0 = datetime.now()
+    res = search.run()
+    sec = (datetime.now() - t0).total_seconds()
+
+    board = res.copy()
+    board['expectancy'] = [round(p / c, 2) if c > 0 else 0 for p, c in zip(res['profit'], res['trades'])]
+    print("\n" + "="*60)
+    print("🏆 自適應搜尋排行榜 (interval = 幾分 K)")
+    print("="*60)
+    print(board.head(15).round(1).to_string(index=False))
+    print("-"*60)
+    print(f"⚡ 評估 {search.evals} 次 (跑完整資料的 {len(res)} 組)，"
+          f"實際跑了約 {evaluator.bars / max(len(df), 1):.0f} 趟完整回測的 K 線量，耗時 {sec:.1f} 秒")
 
 # ================= 主程式 =================
 if __name__ == "__main__":
-    print(f"🚀 [優化器] 開始參數掃描...")
-    print(f"📊 數據源: {DATA_PATH}")
-    print(f"⛽ 摩擦成本: {FRICTION_COST} 點 | 斜率參考: {SLOPE_PERIOD} 分鐘\n")
+    print(f"🚀 [優化器] 開始參數掃描... (模式: {SWEEP_MODE})")
+    print(f"📊 數據源: {DATA_SOURCE} ({START_DATE or '最早'} ~ {END_DATE or '最新'})")
+    print(f"⛽ 摩擦成本: {FRICTION_COST} 點 | 斜率參考: {SLOPE_LIST} 分鐘\n")
 
     try:
-        raw_df = pd.read_csv(DATA_PATH)
+        raw_df = load_prices(DATA_SOURCE, START_DATE, END_DATE)
     except FileNotFoundError:
-        print(f"❌ 找不到檔案: {DATA_PATH}，請確認路徑是否正確。")
+        print(f"❌ 找不到檔案: {DATA_SOURCE}，請確認路徑是否正確。")
+        exit()
+    if raw_df.empty:
+        print(f"❌ 沒有資料: {DATA_SOURCE}，請先跑 tools/download_data.py 下載歷史 K 線。")
         exit()
 
-    all_results = []
-    
-    # 設定掃描範圍 (你可以根據需求調整)
-    short_ma_list = [5, 10, 15, 20, 30]
-    long_ma_list  = [60, 80, 100, 120, 150, 200]
-    
-    total_iterations = len(short_ma_list) * len(long_ma_list)
-    current_it = 0
-
-    for s in short_ma_list:
-        for l in long_ma_list:
-            current_it += 1
-            if s >= l: continue
-            
-            p, c = run_backtest_with_filter(raw_df, s, l, SLOPE_PERIOD)
-            
-            expectancy = round(p / c, 2) if c > 0 else 0
-            
-            all_results.append({
-                '組合(S/L)': f"{s}/{l}",
-                '總損益': round(p, 1),
-                '交易次數': c,
-                '期望值': expectancy
-            })
-            
-            if current_it % 5 == 0:
-                print(f"⏳ 已完成 {current_it}/{total_iterations} 組...")
-
-    # 轉換成 DataFrame 方便展示
-    res_df = pd.DataFrame(all_results)
-    
-    # 依照總損益排序
-    res_df = res_df.sort_values(by='總損益', ascending=False)
+    if WALK_FORWARD:
+        run_walk_forward(raw_df)
+        exit()
+
+    if SWEEP_MODE == "adaptive":
+        run_adaptive_search(raw_df)
+        exit()
+
+    if RESULT_CACHE:
+        cache = ResultCache(RESULT_CACHE, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+        fp = data_fingerprint(cache, DATA_SOURCE, START_DATE, END_DATE)
+        res = sweep_with_cache(raw_df, cache, fp, SHORT_MA_LIST, LONG_MA_LIST, SLOPE_LIST)
+        cache.close()
+    else:
+        res = run_sweep(raw_df, SHORT_MA_LIST, LONG_MA_LIST, SLOPE_LIST)
+
+    res_df = build_leaderboard(res)
 
     print("\n" + "="*60)
     print("🏆 參數優化排行榜 (斜率濾網版)")
     print("="*60)
-    print(res_df.head(15).to_string(index=False))
\ No newline at end of file
+    print(res_df.head(15).to_string(index=False))
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 測試直接 import 專案根目錄的模組 (modules/、core/、optimize.py ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def bars():
+    """合成 1 分 K (整數點隨機漫步)，2000 根，夠產生上百次均線交叉"""
+    rng = np.random.default_rng(42)
+    n = 2000
+    close = np.round(20000 + np.cumsum(rng.normal(0, 5, n)))
+    idx = pd.date_range("2025-01-02 08:46", periods=n, freq="min", name="Time")
+    return pd.DataFrame({'Open': close, 'High': close + 2, 'Low': close - 2,
+                         'Close': close, 'Volume': rng.integers(1, 100, n)}, index=idx)
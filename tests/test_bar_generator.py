@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from core.engine import BotEngine
+from core.models import Bar, Tick
+from modules.bar_generator import BarResampler
+
+TIMEFRAMES = [1, 3, 5, 15, 60, "session"]
+
+
+def session_ticks(start, end, price=20000):
+    """start ~ end (不含) 每 30 秒一筆，最後補一筆收盤撮合 (剛好落在 end)"""
+    ticks = []
+    t = start
+    while t < end:
+        ticks.append(Tick(t, price, 1))
+        price += 1
+        t += timedelta(seconds=30)
+    ticks.append(Tick(end, price, 1))
+    return ticks
+
+
+def run_engine(ticks):
+    engine = BotEngine(SimpleNamespace(on_bar=lambda bar: None), timeframes=TIMEFRAMES)
+    out = {tf: [] for tf in TIMEFRAMES}
+    for tf in TIMEFRAMES[1:]:
+        engine.subscribe(tf, out[tf].append)
+    engine.callbacks[1].append(out[1].append)
+    for tick in ticks:
+        engine.process_tick(tick)
+    engine.flush()
+    return engine, out
+
+
+@pytest.fixture(scope="module")
+def day_and_night():
+    ticks = (session_ticks(datetime(2025, 1, 2, 8, 45), datetime(2025, 1, 2, 13, 45))
+             + session_ticks(datetime(2025, 1, 2, 15, 0), datetime(2025, 1, 3, 5, 0), price=21000))
+    return ticks, run_engine(ticks)
+
+
+def test_one_session_bar_per_session(day_and_night):
+    ticks, (_, out) = day_and_night
+    sessions = out["session"]
+    assert [b.dt for b in sessions] == [datetime(2025, 1, 2, 8, 45), datetime(2025, 1, 2, 15, 0)]
+
+    day_ticks = [t for t in ticks if t.datetime <= datetime(2025, 1, 2, 13, 45)]
+    assert sessions[0].volume == len(day_ticks)
+    assert sessions[0].open == day_ticks[0].close
+    assert sessions[0].close == day_ticks[-1].close   # 收盤撮合算在日盤這根裡
+    assert sessions[1].volume == len(ticks) - len(day_ticks)
+
+
+@pytest.mark.parametrize("tf", TIMEFRAMES)
+def test_no_bars_start_at_session_close(day_and_night, tf):
+    _, (_, out) = day_and_night
+    closes = {datetime(2025, 1, 2, 13, 45), datetime(2025, 1, 3, 5, 0)}
+    assert not closes & {b.dt for b in out[tf]}
+
+
+def test_closing_tick_folds_into_last_minute(day_and_night):
+    _, (_, out) = day_and_night
+    last_day = [b for b in out[1] if b.dt.date() == datetime(2025, 1, 2).date() and b.dt.hour < 15][-1]
+    assert last_day.dt == datetime(2025, 1, 2, 13, 44)
+    assert last_day.volume == 3
+
+
+def test_volume_is_conserved(day_and_night):
+    ticks, (engine, out) = day_and_night
+    for tf in TIMEFRAMES:
+        assert sum(b.volume for b in out[tf]) == len(ticks), tf
+        if tf != 1:
+            assert engine.resamplers[tf].late == 0
+
+
+def test_hourly_bars_anchor_at_session_open(day_and_night):
+    _, (_, out) = day_and_night
+    starts = [b.dt for b in out[60]]
+    assert starts[:5] == [datetime(2025, 1, 2, h, 45) for h in range(8, 13)]
+    assert starts[5] == datetime(2025, 1, 2, 15, 0)
+    assert starts[-1] == datetime(2025, 1, 3, 4, 0)
+    # 最後一根 12:45 ~ 13:45 只有 60 分鐘，夜盤 14 根
+    assert len(starts) == 5 + 14
+
+
+def test_late_child_bar_is_dropped():
+    out = []
+    rs = BarResampler(5, out.append)
+    for m in range(40, 45):
+        rs.update_bar(Bar(datetime(2025, 1, 2, 13, m), 1, 1, 1, 1, 1))
+    rs.update_bar(Bar(datetime(2025, 1, 2, 13, 45), 2, 2, 2, 2, 1))
+    rs.flush()
+    assert [b.dt for b in out] == [datetime(2025, 1, 2, 13, 40)]
+    assert out[0].volume == 5
+    assert rs.late == 1
+
+
+def test_break_bar_goes_to_next_session():
+    out = []
+    rs = BarResampler(15, out.append)
+    rs.update_bar(Bar(datetime(2025, 1, 2, 14, 59), 1, 1, 1, 1, 1))
+    rs.update_bar(Bar(datetime(2025, 1, 2, 15, 0), 1, 1, 1, 1, 1))
+    rs.flush()
+    assert [(b.dt, b.volume) for b in out] == [(datetime(2025, 1, 2, 15, 0), 2)]
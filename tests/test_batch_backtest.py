@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_backtest
+from modules import history_store
+from modules.history_store import HistoryStore
+
+
+@pytest.fixture
+def store_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = HistoryStore(root=str(tmp_path / "history"))
+    monkeypatch.setattr(history_store, "_default_store", store)
+    rng = np.random.default_rng(3)
+    for day in ("2025-01-02", "2025-01-03", "2025-01-06"):
+        idx = pd.date_range(f"{day} 08:46", periods=300, freq="min", name="Time").astype("datetime64[ns]")
+        close = np.round(20000 + np.cumsum(rng.normal(0, 5, len(idx))))
+        store.write_frame("TMF", pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1,
+                                               "Close": close, "Volume": 1}, index=idx))
+    return batch_backtest.find_jobs(mode="store", contracts=["TMF"])
+
+
+def test_parallel_batch_matches_serial(store_jobs):
+    assert [j[2] for j in store_jobs] == ["2025-01-02", "2025-01-03", "2025-01-06"]
+    serial, serial_ledger = batch_backtest.run_batch(store_jobs, workers=1)
+    parallel, parallel_ledger = batch_backtest.run_batch(store_jobs, workers=2)
+
+    assert (serial["error"] == "").all()
+    cols = ["day", "contract", "bars", "profit", "trades", "net", "fees"]
+    pd.testing.assert_frame_equal(serial[cols], parallel[cols])
+    pd.testing.assert_frame_equal(serial_ledger, parallel_ledger)
@@ -0,0 +1,40 @@
+from tools.bench_pipeline import aggregate, compare
+
+
+def run(tps, rss=70.0, **p99):
+    lat = {stage: {"count": 100, "p50_us": v / 2, "p99_us": v} for stage, v in p99.items()}
+    return {"pipeline": "async", "desc": "", "error": "", "ticks": 1000, "bars": 10,
+            "feed_seconds": 1.0, "total_seconds": 1000 / tps, "ticks_per_sec": tps,
+            "peak_rss_mb": rss, "run_rss_mb": 1.0, "latency_us": lat}
+
+
+def test_aggregate_takes_median_and_trimmed_noise():
+    runs = [run(t, engine=e, queue=q) for t, e, q in
+            [(100, 8, 50), (104, 9, 52), (40, 7, 51), (98, 30, 49), (102, 8, 50)]]
+    agg = aggregate(runs)
+    assert agg["runs"] == 5
+    assert agg["ticks_per_sec"] == 100
+    assert agg["latency_us"]["engine"]["p99_us"] == 8
+    # 頭尾各去掉一個：偶發的一次慢跑不會把雜訊撐大
+    assert agg["noise"]["ticks_per_sec"] == (102 - 98) / 100
+    assert agg["noise"]["latency_us"]["engine"]["p99_us"] == (9 - 8) / 8
+
+
+def test_compare_checks_every_stage():
+    base = {"async": aggregate([run(100, engine=8, queue=50, tick_to_trade=60)] * 5)}
+    same = {"async": aggregate([run(95, engine=9, queue=55, tick_to_trade=65)] * 5)}
+    assert compare(same, base) == []
+
+    worse = {"async": aggregate([run(100, engine=8, queue=90, tick_to_trade=100)] * 5)}
+    problems = compare(worse, base)
+    assert len(problems) == 2
+    assert any("queue p99" in p for p in problems) and any("tick_to_trade p99" in p for p in problems)
+
+
+def test_measured_noise_widens_tolerance():
+    base = {"async": aggregate([run(t, engine=8) for t in (100, 100, 80, 120, 100, 100, 100)])}
+    noisy = {"async": aggregate([run(t, engine=8) for t in (70, 80, 85, 95, 110)])}
+    assert base["async"]["noise"]["ticks_per_sec"] == 0.0
+    assert noisy["async"]["noise"]["ticks_per_sec"] > 0.15
+    assert compare(noisy, base) == []                    # 掉 15% 但在量到的雜訊內
+    assert compare({"async": aggregate([run(85, engine=8)] * 5)}, base)   # 沒有雜訊就算退步
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from modules.columnar import (TICK_SCHEMA, ColumnarWriter, archive_days, load_bar_frame,
+                              open_archive, write_bar_frame)
+
+
+def night_and_day_ticks():
+    """1/2 日盤、1/2 夜盤 (跨到 1/3 凌晨)、1/3 日盤，每 10 分鐘一筆"""
+    spans = [("2025-01-02 08:45", "2025-01-02 13:45"),
+             ("2025-01-02 15:00", "2025-01-03 05:00"),
+             ("2025-01-03 08:45", "2025-01-03 13:45")]
+    ts = np.concatenate([pd.date_range(a, b, freq="10min").to_numpy(dtype='datetime64[ns]') for a, b in spans])
+    return ts, np.arange(len(ts), dtype=np.float64)
+
+
+def write_ticks(root, ts, price, chunks=3):
+    w = ColumnarWriter(str(root), TICK_SCHEMA)
+    for part in np.array_split(np.arange(len(ts)), chunks):
+        w.append({"ts": ts[part], "price": price[part], "volume": np.ones(len(part))})
+    w.close()
+
+
+def test_days_follow_trading_day_rule(tmp_path):
+    ts, price = night_and_day_ticks()
+    write_ticks(tmp_path / "a", ts, price)
+    assert archive_days(str(tmp_path / "a")) == ["2025-01-02", "2025-01-03"]
+
+    cols = open_archive(str(tmp_path / "a"), "2025-01-02", "2025-01-02")
+    got = pd.DatetimeIndex(cols["ts"])
+    assert got[0] == pd.Timestamp("2025-01-02 08:45")
+    assert got[-1] == pd.Timestamp("2025-01-03 05:00")   # 凌晨的夜盤算 1/2
+    assert len(got) == np.count_nonzero(ts <= np.datetime64("2025-01-03T05:00"))
+
+    cols = open_archive(str(tmp_path / "a"), start="2025-01-03")
+    assert pd.DatetimeIndex(cols["ts"])[0] == pd.Timestamp("2025-01-03 08:45")
+
+
+def test_unsorted_appends_select_rows_per_day(tmp_path):
+    ts, price = night_and_day_ticks()
+    order = np.argsort(ts)[::-1]          # 整個倒過來寫
+    write_ticks(tmp_path / "b", ts[order], price[order])
+    with open(tmp_path / "b" / "meta.json") as f:
+        assert json.load(f)["sorted"] is False
+
+    cols = open_archive(str(tmp_path / "b"), "2025-01-03", "2025-01-03", columns=["price"])
+    expect = price[ts >= np.datetime64("2025-01-03T08:45")]
+    assert sorted(cols["price"]) == sorted(expect)
+
+
+def test_legacy_calendar_index_is_rebuilt(tmp_path):
+    ts, price = night_and_day_ticks()
+    root = tmp_path / "c"
+    write_ticks(root, ts, price)
+    # 模擬舊版：meta 沒有索引格式、index.json 用日曆日
+    with open(root / "meta.json", "w") as f:
+        json.dump({"columns": [list(c) for c in TICK_SCHEMA]}, f)
+    with open(root / "index.json", "w") as f:
+        json.dump({"2025-01-02": [0, 10], "2025-01-03": [10, len(ts)]}, f)
+
+    cols = open_archive(str(root), "2025-01-02", "2025-01-02")
+    assert pd.DatetimeIndex(cols["ts"])[-1] == pd.Timestamp("2025-01-03 05:00")
+
+    ColumnarWriter(str(root), TICK_SCHEMA).close()
+    assert archive_days(str(root)) == ["2025-01-02", "2025-01-03"]
+    with open(root / "meta.json") as f:
+        assert json.load(f)["index"] == "trading_day"
+
+
+def test_bar_frame_round_trip(tmp_path):
+    idx = pd.date_range("2025-01-02 08:46", periods=50, freq="min", name="Time").astype("datetime64[ns]")
+    df = pd.DataFrame({"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": np.arange(50.0), "Volume": 3},
+                      index=idx)
+    write_bar_frame(str(tmp_path / "bars"), df)
+    back = load_bar_frame(str(tmp_path / "bars"))
+    assert (back.index == df.index).all()
+    assert list(back.columns) == list(df.columns)
+    np.testing.assert_array_equal(back.to_numpy(dtype=float), df.to_numpy(dtype=float))
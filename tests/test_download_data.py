@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from modules.history_store import HistoryStore, trading_days
+from modules.mock import MockShioaji
+from tools import download_data
+from tools.download_data import Journal, download_history, fetch_chunk, plan_chunks, weekdays
+
+START, END = "2025-01-06", "2025-01-17"   # 兩週 = 10 個平日
+CODE = "TMF202602"
+
+
+class HolidayMock(MockShioaji):
+    """指定的交易日查不到資料 (假裝是國定假日)"""
+
+    def __init__(self, holidays, **kwargs):
+        super().__init__(**kwargs)
+        self.holidays = set(holidays)
+
+    def kbars(self, contract, start, end, timeout=30000):
+        kb = super().kbars(contract, start, end, timeout)
+        days = trading_days(np.array(kb.ts, dtype='datetime64[ns]')).astype(str)
+        keep = ~np.isin(days, list(self.holidays))
+        for name in ("ts", "Open", "High", "Low", "Close", "Volume"):
+            setattr(kb, name, np.asarray(getattr(kb, name))[keep].tolist())
+        return kb
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(root=str(tmp_path / "history"), cache_days=0)
+
+
+def assert_complete(store, code, start=START, end=END, api=None):
+    """資料庫內容 = 一次查完整段的結果 (沒有缺漏、沒有重複)"""
+    expected = fetch_chunk(api or MockShioaji(), code, start, end)
+    got = store.load(code, start, end)
+    assert got.index.is_unique
+    assert (got.index == expected.index).all()
+    for col in ("Open", "High", "Low", "Close", "Volume"):
+        np.testing.assert_array_equal(got[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float))
+
+
+def test_first_download_then_incremental_rerun(store):
+    api = MockShioaji(kbars_delay=0.01)
+    summary = download_history(api, [CODE], START, END, workers=3, chunk_days=3, store=store)
+    assert summary[CODE] == {"chunks": 4, "bars": len(store.load(CODE)), "days": 10, "failed": 0}
+    assert api.kbars_calls == 4
+    assert store.days(CODE) == weekdays(START, END)
+    assert_complete(store, CODE)
+
+    # 再跑一次：只重抓最後一個已存的交易日 (可能是盤中抓的半天)
+    assert plan_chunks(store, Journal(store), CODE, START, END) == [(END, END, [END])]
+    api = MockShioaji()
+    summary = download_history(api, [CODE], START, END, workers=3, chunk_days=3, store=store)
+    assert api.kbars_calls == 1 and summary[CODE]["days"] == 1
+    assert_complete(store, CODE)
+
+
+def test_resume_after_connection_drops(store, monkeypatch):
+    monkeypatch.setattr(download_data, "MAX_RETRIES", 1)
+    api = MockShioaji(kbars_fail_after=2)
+    summary = download_history(api, [CODE], START, END, workers=1, chunk_days=2, store=store)
+    assert summary[CODE]["chunks"] == 2 and summary[CODE]["failed"] == 3
+    assert store.days(CODE) == weekdays(START, END)[:4]
+
+    # 續傳：補上沒下載的 6 天 + 重抓最後一個已存的日子
+    chunks = plan_chunks(store, Journal(store), CODE, START, END, chunk_days=2)
+    assert [d for c in chunks for d in c[2]] == weekdays(START, END)[3:]
+    summary = download_history(MockShioaji(), [CODE], START, END, workers=2, chunk_days=2, store=store)
+    assert summary[CODE]["failed"] == 0
+    assert store.days(CODE) == weekdays(START, END)
+    assert_complete(store, CODE)
+
+
+def test_empty_days_are_journaled_and_not_refetched(store):
+    holiday = "2025-01-08"
+    api = HolidayMock([holiday])
+    download_history(api, [CODE], START, END, workers=2, chunk_days=5, store=store)
+    assert holiday not in store.days(CODE)
+    assert Journal(store).empty_days(CODE) == {holiday}
+    assert_complete(store, CODE, api=HolidayMock([holiday]))
+
+    missing = [d for c in plan_chunks(store, Journal(store), CODE, START, END) for d in c[2]]
+    assert missing == [END]
+
+
+def test_multiple_contracts(store):
+    codes = ["TMF202602", "TXF202602"]
+    summary = download_history(MockShioaji(), codes, START, END, workers=4, chunk_days=5, store=store)
+    assert store.contracts() == codes
+    for code in codes:
+        assert summary[code]["days"] == 10 and summary[code]["failed"] == 0
+        assert_complete(store, code)
+    a, b = (store.load(c, START, END)["Close"].to_numpy() for c in codes)
+    assert not np.array_equal(a, b)     # 各合約各寫各的資料夾，不會混在一起
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import history_store
+from modules.columnar import write_bar_frame
+from modules.history_store import HistoryStore, load_bars, trading_days
+
+
+def frame(start, periods, price=20000.0, freq="min"):
+    idx = pd.date_range(start, periods=periods, freq=freq, name="Time").astype("datetime64[ns]")
+    close = price + np.arange(periods, dtype=np.float64)
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": np.arange(periods) + 1}, index=idx)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    st = HistoryStore(root=str(tmp_path / "history"), cache_days=4)
+    monkeypatch.setattr(history_store, "_default_store", st)
+    return st
+
+
+def assert_same(a, b):
+    assert (a.index == b.index).all()
+    for col in ("Open", "High", "Low", "Close", "Volume"):
+        np.testing.assert_array_equal(a[col].to_numpy(dtype=float), b[col].to_numpy(dtype=float))
+
+
+def test_trading_day_cut_at_0500():
+    ts = pd.to_datetime(["2025-01-02 08:45", "2025-01-02 23:59", "2025-01-03 05:00", "2025-01-03 05:01"])
+    assert list(trading_days(ts.to_numpy()).astype(str)) == ["2025-01-02"] * 3 + ["2025-01-03"]
+
+
+def test_round_trip_by_trading_day(store):
+    df = pd.concat([frame("2025-01-02 08:45", 300), frame("2025-01-02 15:00", 841, 21000.0),
+                    frame("2025-01-03 08:45", 300, 22000.0)])
+    assert store.write_frame("TMF", df) == ["2025-01-02", "2025-01-03"]
+    assert store.days("TMF") == ["2025-01-02", "2025-01-03"]
+
+    assert_same(store.load("TMF"), df)
+    one = store.load("TMF", "2025-01-02", "2025-01-02")
+    assert one.index[-1] == pd.Timestamp("2025-01-03 05:00")
+    assert store.load("TMF", columns=["close"]).columns.tolist() == ["Close"]
+
+
+def test_rewrite_merges_and_prefers_new_rows(store):
+    df = frame("2025-01-02 09:00", 10)
+    store.write_frame("TMF", df)
+    newer = frame("2025-01-02 09:05", 10, price=30000.0)
+    store.write_frame("TMF", newer)
+
+    got = store.load("TMF")
+    assert len(got) == 15
+    assert got["Close"].iloc[4] == df["Close"].iloc[4]
+    assert got["Close"].iloc[5] == 30000.0
+
+
+def test_cache_is_invalidated_on_write(store):
+    store.write_frame("TMF", frame("2025-01-02 09:00", 5))
+    store.load("TMF")
+    store.load("TMF")
+    assert store.hits == 1
+    store.write_frame("TMF", frame("2025-01-02 09:00", 5, price=1.0))
+    assert store.load("TMF")["Close"].iloc[0] == 1.0
+
+
+def test_load_bars_sources_agree(store, tmp_path):
+    df = frame("2025-01-02 08:45", 120)
+    store.write_frame("TMF", df)
+    csv_path = tmp_path / "bars.csv"
+    df.to_csv(csv_path, date_format="%Y-%m-%d %H:%M:%S")
+    write_bar_frame(str(tmp_path / "archive"), df)
+
+    for source in ("TMF", str(csv_path), str(tmp_path / "archive")):
+        assert_same(load_bars(source, "2025-01-02", "2025-01-02"), df)
+        assert load_bars(source, "2025-01-03").empty
+
+
+def test_legacy_csv_is_imported_when_store_is_empty(store, capsys):
+    df = frame("2025-01-02 08:45", 60)
+    os.makedirs(store.root, exist_ok=True)
+    df.to_csv(os.path.join(store.root, "TMF202602_1min_history.csv"), date_format="%Y-%m-%d %H:%M:%S")
+
+    got = load_bars("TMF202602")
+    assert_same(got, df)
+    assert "舊版" in capsys.readouterr().out
+    # 已經有分檔就不再重匯
+    assert HistoryStore(root=store.root).import_legacy("TMF202602") == []
+
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+
+from core.models import Bar
+from modules.indicators import SMA, EMA, Bollinger, RingBuffer, build_indicators
+
+
+def make_bars(closes):
+    t0 = datetime(2025, 1, 2, 8, 45)
+    return [Bar(t0 + timedelta(minutes=i), c, c + 1, c - 1, c, 1) for i, c in enumerate(closes)]
+
+
+@pytest.fixture
+def closes():
+    rng = np.random.default_rng(5)
+    return list(np.round(20000 + np.cumsum(rng.normal(0, 8, 5000))))
+
+
+def test_ring_buffer_returns_evicted_values():
+    buf = RingBuffer(3)
+    assert [buf.push(v) for v in (1, 2, 3, 4, 5)] == [None, None, None, 1, 2]
+    assert list(buf) == [3, 4, 5]
+
+
+@pytest.mark.parametrize("window", [1, 5, 20, 240])
+def test_sma_matches_full_recompute_exactly(closes, window):
+    sma = SMA("ma", window)
+    for i, bar in enumerate(make_bars(closes)):
+        sma.update(bar)
+        if i + 1 < window:
+            assert sma.value is None
+        else:
+            # 原本 calculate_ma 的算法：取最後 n 筆加總
+            assert sma.value == sum(closes[i + 1 - window:i + 1]) / window
+
+
+def test_ema_matches_pandas(closes):
+    window = 12
+    ema = EMA("ema", window)
+    values = []
+    for bar in make_bars(closes):
+        ema.update(bar)
+        values.append(ema.value)
+
+    seeded = pd.Series(closes, dtype=float)
+    seeded.iloc[:window] = np.nan
+    seeded.iloc[window - 1] = np.mean(closes[:window])
+    expected = seeded.ewm(span=window, adjust=False, ignore_na=True).mean()
+    assert values[:window - 1] == [None] * (window - 1)
+    np.testing.assert_allclose(values[window - 1:], expected.iloc[window - 1:], rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("window,k", [(20, 2.0), (60, 2.5)])
+def test_bollinger_matches_numpy(closes, window, k):
+    boll = Bollinger("bb", window, k)
+    arr = np.array(closes)
+    for i, bar in enumerate(make_bars(closes)):
+        boll.update(bar)
+        if i + 1 < window:
+            assert boll.value is None
+            continue
+        win = arr[i + 1 - window:i + 1]
+        mid, std = win.mean(), win.std()
+        assert boll.value == pytest.approx(mid, abs=1e-9)
+        assert boll.upper == pytest.approx(mid + k * std, abs=1e-9)
+        assert boll.lower == pytest.approx(mid - k * std, abs=1e-9)
+
+
+def test_build_indicators_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        build_indicators({"x": ("macd", 12)})
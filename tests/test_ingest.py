@@ -0,0 +1,110 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.ingest import IngestWorker, TickRingBuffer
+from core.models import Tick
+
+T0 = datetime(2025, 1, 2, 9, 0)
+
+
+def ticks(n):
+    return [Tick(T0 + timedelta(seconds=i), 20000 + i, 1) for i in range(n)]
+
+
+def drain(buf):
+    return [t for t, _ in buf.get_batch(max_items=10**6, timeout=0)]
+
+
+def test_default_policy_is_lossless():
+    assert TickRingBuffer().policy == "block"
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        TickRingBuffer(4, "newest")
+
+
+def test_drop_oldest_keeps_latest_ticks():
+    buf = TickRingBuffer(4, "drop_oldest")
+    for t in ticks(10):
+        buf.put(t)
+    assert [t.close for t in drain(buf)] == [20006, 20007, 20008, 20009]
+    assert buf.dropped == 6
+    assert buf.max_depth == 4
+
+
+def test_conflate_keeps_volume_and_last_price():
+    buf = TickRingBuffer(4, "conflate")
+    for t in ticks(10):
+        buf.put(t)
+    out = drain(buf)
+    assert [t.close for t in out] == [20000, 20001, 20002, 20009]
+    assert sum(t.volume for t in out) == 10
+    assert out[-1].datetime == T0 + timedelta(seconds=9)
+    assert buf.conflated == 6 and buf.dropped == 0
+
+
+def test_block_waits_for_room():
+    buf = TickRingBuffer(4, "block")
+    done = threading.Event()
+
+    def producer():
+        for t in ticks(10):
+            buf.put(t)
+        done.set()
+
+    th = threading.Thread(target=producer, daemon=True)
+    th.start()
+    time.sleep(0.05)
+    assert not done.is_set() and len(buf) == 4
+
+    got = []
+    while len(got) < 10:
+        got += [t for t, _ in buf.get_batch(max_items=3, timeout=0.5)]
+    th.join(timeout=1)
+    assert done.is_set()
+    assert [t.close for t in got] == [20000 + i for i in range(10)]
+    assert buf.dropped == buf.conflated == 0
+
+
+def test_close_releases_blocked_producer():
+    buf = TickRingBuffer(1, "block")
+    buf.put(ticks(1)[0])
+    th = threading.Thread(target=buf.put, args=(ticks(2)[1],), daemon=True)
+    th.start()
+    buf.close()
+    th.join(timeout=1)
+    assert not th.is_alive()
+
+
+class RecordingEngine:
+    def __init__(self):
+        self.seen = []
+
+    def process_tick(self, tick):
+        self.seen.append(tick.close)
+
+
+def test_worker_processes_everything_in_order():
+    engine = RecordingEngine()
+    worker = IngestWorker(engine, capacity=8, batch_size=3)
+    worker.start()
+    for t in ticks(100):
+        worker.put(t)
+    worker.stop()
+    worker.join(timeout=2)
+    assert engine.seen == [20000 + i for i in range(100)]
+    assert worker.stats()["processed"] == 100
+
+
+def test_worker_warns_on_first_drop(capsys):
+    worker = IngestWorker(RecordingEngine(), capacity=2, policy="drop_oldest")
+    for t in ticks(5):
+        worker.put(t)
+    worker._warn_if_lossy()
+    assert "已丟棄 3 筆" in capsys.readouterr().out
+    worker._warn_if_lossy()
+    assert capsys.readouterr().out == ""
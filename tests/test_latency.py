@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from core.latency import LatencyHistogram
+
+
+def test_bucket_upper_bound_within_relative_error():
+    H = LatencyHistogram
+    rng = np.random.default_rng(5)
+    values = list(range(200)) + [int(v) for v in rng.integers(1, 10**12, 2000)] + [2**k for k in range(60)]
+    for v in values:
+        idx = H._index(v)
+        up = H._upper(idx)
+        assert up >= v
+        assert up - v <= v / H.SUB                      # 相對誤差 < 1/32
+        if idx:
+            assert H._upper(idx - 1) < v                # 落在正確的那一格
+
+
+def test_percentiles_min_max_count():
+    rng = np.random.default_rng(9)
+    samples = rng.lognormal(mean=11, sigma=1.5, size=20000).astype(np.int64)
+    h = LatencyHistogram()
+    for v in samples:
+        h.record(int(v))
+    h.record(-5)                                         # 負值當 0
+
+    allv = np.append(samples, 0)
+    assert (h.count, h.min, h.max, h.total) == (len(allv), 0, int(allv.max()), int(allv.sum()))
+    srt = np.sort(allv)
+    for q in (50, 90, 99, 99.9):
+        exact = srt[max(int(len(srt) * q / 100.0 + 0.5), 1) - 1]
+        got = h.percentile(q)
+        assert exact <= got <= min(exact * (1 + 1 / LatencyHistogram.SUB), h.max)
+    assert h.percentile(100) == h.max
+
+
+def test_grows_beyond_initial_buckets():
+    h = LatencyHistogram()
+    assert len(h.counts) == 1024
+    assert LatencyHistogram._upper(1023) < 2**36 <= LatencyHistogram._upper(1024)
+
+    slow = 3600 * 10**9                                  # 一小時
+    h.record(1000)
+    h.record(slow)
+    assert len(h.counts) > 1024
+    assert h.percentile(50) == pytest.approx(1000, rel=1 / 32)
+    assert h.percentile(99) == slow
+    assert h.snapshot()["max_us"] == slow / 1000
+
+
+def test_empty_histogram():
+    h = LatencyHistogram()
+    assert h.percentile(99) == 0
+    assert h.snapshot() == {"count": 0}
@@ -0,0 +1,67 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from core.state import SystemState
+from modules.market_data import MarketData
+
+
+class FakeQuote:
+    def __init__(self):
+        self.callback = None
+        self.subscribed = []
+
+    def set_on_tick_fop_v1_callback(self, cb):
+        self.callback = cb
+
+    def subscribe(self, contract, quote_type):
+        self.subscribed.append(contract)
+
+    def unsubscribe(self, contract, quote_type):
+        self.subscribed.remove(contract)
+
+
+class SlowEngine:
+    """process_tick 卡在 gate，用來模擬 stop() 時 callback 執行緒還在引擎裡"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.ticks = []
+
+    def process_tick(self, tick):
+        self.entered.set()
+        self.gate.wait(5)
+        self.ticks.append(tick)
+
+
+def raw_tick(close):
+    return SimpleNamespace(datetime=datetime(2025, 1, 2, 9, 0), close=close, volume=1, code="TMFA5")
+
+
+def test_stop_waits_for_inflight_tick_and_blocks_later_ones():
+    api = SimpleNamespace(quote=FakeQuote(),
+                          Contracts=SimpleNamespace(Futures=SimpleNamespace(TMF={"TMFR1": "TMFR1"})))
+    engine = SlowEngine()
+    md = MarketData(api=api, engine=engine, state=SystemState())
+    md.symbol = "TMFR1"
+    md.connect()
+    assert api.quote.subscribed == ["TMFR1"]
+
+    cb = threading.Thread(target=api.quote.callback, args=("TAIFEX", raw_tick(20000)))
+    cb.start()
+    assert engine.entered.wait(2)
+
+    stopper = threading.Thread(target=md.stop)
+    stopper.start()
+    time.sleep(0.1)
+    assert stopper.is_alive()            # 處理中的 Tick 還沒跑完，stop() 不能先返回
+    engine.gate.set()
+    stopper.join(2)
+    cb.join(2)
+    assert not stopper.is_alive()
+
+    api.quote.callback("TAIFEX", raw_tick(20001))   # 退訂後才到的報價
+    assert [t.close for t in engine.ticks] == [20000.0]
+    assert api.quote.subscribed == []
@@ -0,0 +1,99 @@
+import threading
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from core import metrics
+from core.metrics import Counter, MetricsRegistry, serve_metrics
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_counter_sums_per_thread_cells():
+    c = Counter("x_total", "x")
+    start = threading.Barrier(8)
+
+    def work():
+        start.wait()
+        for _ in range(10000):
+            c.inc()
+        c.inc(5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.value() == 8 * 10005
+    assert len(c._cells) == 8          # 每個執行緒一格，不共用
+    c.inc(3)
+    assert c.value() == 8 * 10005 + 3
+
+
+def test_text_exposition_format():
+    reg = MetricsRegistry()
+    a = reg.counter("bars_total", "K 棒數", labels={"tf": "5min"})
+    b = reg.counter("bars_total", "K 棒數", labels={"tf": "1min"})
+    assert reg.counter("bars_total", "K 棒數", labels={"tf": "1min"}) is b   # 同名同標籤共用
+    a.inc(2)
+    b.inc()
+    reg.gauge("active", "是否啟動", fn=lambda: True)
+    reg.gauge("depth", "佇列深度").set(1.5)
+    reg.gauge("broken", "讀取失敗", fn=lambda: 1 / 0)
+    reg.gauge("missing", "還沒有值", fn=lambda: None)
+    reg.gauge("quoted", "標籤跳脫", labels={"path": 'a"b\\c\nd'}, fn=lambda: 7)
+
+    assert reg.render() == (
+        "# HELP active 是否啟動\n"
+        "# TYPE active gauge\n"
+        "active 1\n"
+        "# HELP bars_total K 棒數\n"
+        "# TYPE bars_total counter\n"
+        'bars_total{tf="1min"} 1\n'
+        'bars_total{tf="5min"} 2\n'
+        "# HELP depth 佇列深度\n"
+        "# TYPE depth gauge\n"
+        "depth 1.5\n"
+        "# HELP quoted 標籤跳脫\n"
+        "# TYPE quoted gauge\n"
+        'quoted{path="a\\"b\\\\c\\nd"} 7\n'
+    )
+
+
+def test_rate_is_independent_of_who_reads_it(clock):
+    reg = MetricsRegistry()
+    c = reg.counter("ticks_total", "ticks")
+    r = reg.rate("ticks_per_second", "ticks/s", c, window=60)
+    for _ in range(120):                # 每秒 10 筆，兩個抓取端每秒各讀一次
+        clock[0] += 1
+        c.inc(10)
+        assert r.value() == pytest.approx(10.0)
+        assert r.value() == pytest.approx(10.0)
+
+    for _ in range(30):                 # 之後每秒 40 筆：最近 60 秒裡一半是 10、一半是 40
+        clock[0] += 1
+        c.inc(40)
+    assert r.value() == pytest.approx(25.0)
+    assert r.value() == pytest.approx(25.0)
+    assert len(r._samples) <= 62        # 最多每秒留一個樣本
+
+
+def test_metrics_endpoint():
+    reg = MetricsRegistry()
+    reg.counter("hits_total", "hits").inc(3)
+    server = serve_metrics(0, registry=reg)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "hits_total 3" in resp.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/nope")
+    finally:
+        server.shutdown()
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from modules.notifier import TelegramBot
+
+
+class RecordingBot(TelegramBot):
+    """不真的打 Telegram，只記下送出的內容與時間"""
+
+    def __init__(self, **kwargs):
+        self.posts = []
+        self.gate = threading.Event()
+        super().__init__(api_base="http://127.0.0.1:9", **kwargs)
+
+    def _post(self, text, markdown=True):
+        self.gate.wait(5)
+        self._last_post = time.monotonic()
+        self.posts.append((self._last_post, text))
+        self.sent += 1
+        return 200
+
+
+class StrictMarkdownBot(RecordingBot):
+    """底線個數是奇數的 Markdown 訊息回 400 (模擬 Telegram 解析失敗)"""
+
+    def __init__(self, **kwargs):
+        self.attempts = []
+        super().__init__(**kwargs)
+
+    def _post(self, text, markdown=True):
+        self.attempts.append((markdown, text))
+        if markdown and text.count("_") % 2:
+            self.gate.wait(5)
+            self._last_post = time.monotonic()
+            return 400
+        return super()._post(text, markdown)
+
+
+def test_split_chunks_respect_min_interval():
+    bot = RecordingBot(min_interval=0.1, queue_size=100)
+    msgs = [f"{i:02d}" + "x" * 1500 for i in range(6)]
+    for m in msgs:
+        bot.send_message(m)
+    bot.gate.set()
+    assert bot.flush(timeout=5)
+
+    assert "\n\n".join(t for _, t in bot.posts) == "\n\n".join(msgs)
+    assert all(len(t) <= TelegramBot.MAX_TEXT_LEN for _, t in bot.posts)
+    assert len(bot.posts) >= 3
+    gaps = [b - a for (a, _), (b, _) in zip(bot.posts, bot.posts[1:])]
+    assert min(gaps) >= 0.09
+    assert bot.coalesced == len(msgs) - len(bot.posts)
+
+
+def test_full_queue_never_drops_urgent_messages():
+    bot = RecordingBot(min_interval=0, queue_size=3)
+    bot.send_message("first")       # 被發送執行緒拿走，卡在 gate
+    time.sleep(0.05)
+    bot.send_alert("策略訊號", "buy")
+    bot.send_message("status 1")
+    bot.send_message("status 2")
+    bot.send_info("平倉通知", "sell")  # 佇列滿：擠掉 status 1
+    bot.send_alert("策略訊號", "buy again")  # 再擠掉 status 2
+    bot.send_message("status 3")     # 全是交易通知，這則直接丟
+    bot.send_alert("策略訊號", "last")  # 交易通知超過上限也收
+    bot.gate.set()
+    assert bot.flush(timeout=5)
+
+    text = "\n\n".join(t for _, t in bot.posts)
+    for kept in ("first", "buy", "sell", "buy again", "last"):
+        assert kept in text
+    for lost in ("status 1", "status 2", "status 3"):
+        assert lost not in text
+    assert bot.dropped == 3
+    assert text.index("buy again") < text.index("last")
+
+
+def test_rejected_batch_is_resent_one_by_one():
+    bot = StrictMarkdownBot(min_interval=0, queue_size=10)
+    bot.send_message("hello")        # 被發送執行緒拿走，卡在 gate；後面三則會合併成一批
+    time.sleep(0.05)
+    bot.send_message("📝 火焰圖資料: data/profile_0930.folded")   # 奇數個底線
+    bot.send_alert("策略訊號", "🔴 [買進] 09:31 價格: 20000")
+    bot.send_info("平倉通知", "⚪ [多單平倉] 09:40")
+    bot.gate.set()
+    assert bot.flush(timeout=5)
+
+    assert bot.attempts[1][1].count("\n\n") >= 2         # 三則先合併送出
+    sent = [t for _, t in bot.posts][1:]
+    assert len(sent) == 3                               # 合併那則被拒 -> 拆開逐則送
+    assert "profile_0930.folded" in sent[0]
+    assert "[買進]" in sent[1] and "[多單平倉]" in sent[2]
+    plain = [t for md, t in bot.attempts if not md]
+    assert plain == [sent[0]]                           # 只有壞掉的那則改用純文字
+    assert bot.failed == 0
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+import optimize
+from modules.param_search import AdaptiveSearch, CrossoverEvaluator
+
+SHORTS, LONGS, SLOPES = [3, 5, 8, 10, 15, 20], [20, 30, 40, 60, 90, 120], [0, 3, 5, 10]
+SPACE = {'short': SHORTS, 'long': LONGS, 'slope': SLOPES}
+
+
+def short_lt_long(p):
+    return p['short'] < p['long']
+
+
+class CountingEvaluator(CrossoverEvaluator):
+    def __init__(self, df, friction):
+        super().__init__(df, friction)
+        self.log = []
+
+    def __call__(self, params, frac=1.0):
+        self.log.append((tuple(params.values()), frac))
+        return super().__call__(params, frac)
+
+
+@pytest.mark.parametrize("budget", [5, 20, 60, 150])
+def test_budget_is_never_exceeded(bars, budget):
+    ev = CountingEvaluator(bars, 5.0)
+    search = AdaptiveSearch(ev, {'interval': [1, 2, 3], **SPACE}, budget=budget, constraint=short_lt_long)
+    res = search.run()
+    assert len(ev.log) == search.evals <= budget
+    assert len(set(ev.log)) == len(ev.log)              # 同一組同一比例不會跑第二次
+    assert len(res) >= 1                                # 預算再小也有組合跑到完整資料
+    assert (res['profit'].diff().dropna() <= 0).all()
+
+
+def test_each_halving_round_keeps_top_third():
+    scores = {}
+
+    def evaluate(params, frac):
+        # 各比例的分數不同，淘汰只能看上一輪的成績
+        score = (params['a'] * 7 + params['b'] * 3) % 11 + frac * params['b']
+        scores[(params['a'], params['b'], frac)] = score
+        return score, 1
+
+    search = AdaptiveSearch(evaluate, {'a': range(9), 'b': range(3)}, budget=1000, eta=3, min_frac=1 / 9)
+    keys = list(itertools.product(range(9), range(3)))
+    final = search.successive_halving(keys)
+
+    fracs = search._fractions()
+    assert fracs == pytest.approx([1 / 9, 1 / 3, 1.0])
+    alive = keys
+    for frac, nxt in zip(fracs, fracs[1:]):
+        ranked = sorted(alive, key=lambda k: -scores[(k[0], k[1], frac)])   # 穩定排序，同分照原順序
+        alive = ranked[:len(alive) // 3]
+        assert {k for k, f in search.cache if f == nxt} == set(alive)
+    assert [len([1 for _, f in search.cache if f == fr]) for fr in fracs] == [27, 9, 3]
+    assert set(final) == set(alive) == set(search.full)
+    assert search.evals == 27 + 9 + 3
+
+
+def test_full_budget_matches_exhaustive_sweep(bars):
+    serial = optimize.sweep_serial(bars, SHORTS, LONGS, SLOPES, 5.0)
+    best = serial.sort_values('profit', ascending=False, kind='mergesort').iloc[0]
+
+    ev = CrossoverEvaluator(bars, 5.0)
+    search = AdaptiveSearch(ev, SPACE, budget=len(SHORTS) * len(LONGS) * len(SLOPES), constraint=short_lt_long)
+    res = search.run()
+    assert len(res) == len(serial)
+    top = res.iloc[0]
+    assert (top['short'], top['long'], top['slope']) == (best['short'], best['long'], best['slope'])
+    assert top['profit'] == pytest.approx(best['profit'], abs=1e-6)
+    assert top['trades'] == best['trades']
@@ -0,0 +1,92 @@
+import re
+import threading
+import time
+
+from core.profiler import ProfilerControl, SamplingProfiler
+
+
+class Stop:
+    flag = False
+
+    def set(self):
+        self.flag = True
+
+
+def busy_loop_for_profiler(stop):
+    x = 0
+    while not stop.flag:     # 不呼叫別的函式，取樣時最上層一定是這裡
+        x += 1
+    return x
+
+
+def start_worker():
+    stop = Stop()
+    t = threading.Thread(target=busy_loop_for_profiler, args=(stop,), daemon=True)
+    t.start()
+    return t, stop
+
+
+def test_samples_only_target_thread_and_writes_folded(tmp_path):
+    worker, stop = start_worker()
+    prof = SamplingProfiler(lambda: {worker.ident: "Worker"}, interval_ms=1, max_seconds=10)
+    try:
+        assert prof.start()
+        assert not prof.start()               # 已經在跑
+        time.sleep(0.3)
+        assert prof.stop()
+    finally:
+        stop.set()
+
+    assert not prof.running
+    assert prof.samples > 0 and sum(prof.stacks.values()) == prof.samples
+    assert all(s.startswith("Worker;") for s in prof.stacks)
+    label, count = prof.top(1)[0]
+    assert label.startswith("busy_loop_for_profiler (test_profiler.py:")
+    assert count > prof.samples // 2
+
+    path = prof.write(str(tmp_path / "out.folded"))
+    rows = open(path, encoding="utf-8").read().splitlines()
+    assert sum(int(r.rsplit(" ", 1)[1]) for r in rows) == prof.samples
+    assert 0 <= prof.overhead() < 1
+
+
+def test_stops_itself_after_max_seconds():
+    worker, stop = start_worker()
+    prof = SamplingProfiler(lambda: {worker.ident: "Worker"}, interval_ms=1, max_seconds=0.1)
+    try:
+        prof.start()
+        prof._thread.join(timeout=2)
+    finally:
+        stop.set()
+    assert not prof.running
+    assert 0.1 <= prof.elapsed < 1
+
+
+def test_control_stop_reply_is_markdown_safe(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    worker, stop = start_worker()
+    ctl = ProfilerControl(lambda: {worker.ident: "Worker"}, interval_ms=1, max_seconds=10)
+    try:
+        assert "沒有在取樣" in ctl.stop()
+        assert "Worker" in ctl.start()
+        assert "已經在跑" in ctl.start()
+        assert "取樣中" in ctl.status()
+        time.sleep(0.2)
+        reply = ctl.stop()
+    finally:
+        stop.set()
+
+    assert ctl.current is None
+    # 帶底線的函式名稱與路徑都要在程式碼區塊 / 行內程式碼裡
+    outside = re.sub(r"```.*?```|`[^`]*`", "", reply, flags=re.S)
+    assert "busy_loop_for_profiler" in reply and "_" not in outside
+    path = re.search(r"`([^`]*\.folded)`", reply).group(1)
+    assert (tmp_path / path).exists()
+
+
+def test_control_without_samples():
+    ctl = ProfilerControl(lambda: {}, interval_ms=1, max_seconds=10)
+    ctl.start()
+    time.sleep(0.05)
+    assert "沒有取到任何樣本" in ctl.stop()
+    assert "沒有在取樣" in ctl.status()
@@ -0,0 +1,61 @@
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+from config.settings import Settings
+from core.models import Tick
+from modules.recorder import Recorder
+
+T0 = datetime(2025, 1, 2, 9, 0)
+
+
+@pytest.fixture
+def small_recorder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Settings, "RECORDER_QUEUE_SIZE", 10)
+    monkeypatch.setattr(Settings, "RECORDER_SPILL_SIZE", 100)
+    monkeypatch.setattr(Settings, "RECORDER_BATCH_SIZE", 16)
+    monkeypatch.setattr(Settings, "RECORDER_BINARY", False)
+
+    rec = Recorder(symbol="TEST")
+    rec.batch_lens = []
+    rec.on_written = lambda items: rec.batch_lens.append(len(items))
+    return rec
+
+
+def read_prices(rec):
+    with open(rec.file_path, newline='') as f:
+        return [float(r["Price"]) for r in csv.DictReader(f)]
+
+
+def test_spill_is_bounded_and_drops_are_counted(small_recorder):
+    rec = small_recorder
+    for i in range(10_000):
+        rec.put(Tick(T0 + timedelta(milliseconds=i), 20000 + i, 1))
+    assert rec.queue.qsize() == 10
+    assert len(rec.spill) == rec.spilled == 100
+    assert rec.dropped == 10_000 - 110
+
+    rec.start()
+    rec.stop()
+    rec.join(timeout=5)
+    assert not rec.is_alive()
+
+    # 寫進去的是最早到的 110 筆，順序不變
+    assert read_prices(rec) == [20000 + i for i in range(110)]
+    assert rec.written == 110
+    assert max(rec.batch_lens) <= 16
+    assert rec.stats()["dropped"] == rec.dropped
+
+
+def test_spill_keeps_order_while_running(small_recorder):
+    rec = small_recorder
+    rec.start()
+    for i in range(105):
+        rec.put(Tick(T0 + timedelta(milliseconds=i), 20000 + i, 1))
+    rec.stop()
+    rec.join(timeout=5)
+    assert read_prices(rec) == [20000 + i for i in range(105)]
+    assert rec.dropped == 0
+    assert max(rec.batch_lens) <= 16
@@ -0,0 +1,30 @@
+from modules.result_cache import ResultCache
+
+
+def make_rows(shorts, long_=100):
+    return [{'short': s, 'long': long_, 'slope': 0, 'profit': float(s), 'trades': s} for s in shorts]
+
+
+def test_get_many_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("fp", make_rows(range(1, 6)), 5.0)
+
+    found = cache.get_many("fp", [(1, 100, 0), (3, 100, 0), (9, 100, 0)], 5.0)
+    assert found == {(1, 100, 0): (1.0, 1), (3, 100, 0): (3.0, 3)}
+    # 指紋或摩擦成本不同都不算命中
+    assert cache.get_many("other", [(1, 100, 0)], 5.0) == {}
+    assert cache.get_many("fp", [(1, 100, 0)], 2.0) == {}
+    cache.close()
+
+
+def test_eviction_keeps_the_newest_batch(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=64 * 1024)
+    old = make_rows(range(1, 3001), long_=1)
+    cache.put_many("old", old, 5.0)
+    fresh = make_rows(range(1, 3001), long_=2)
+    cache.put_many("new", fresh, 5.0)
+
+    combos = [(r['short'], r['long'], r['slope']) for r in fresh]
+    assert len(cache.get_many("new", combos, 5.0)) == len(fresh)
+    assert len(cache.get_many("old", [(r['short'], 1, 0) for r in old], 5.0)) < len(old)
+    cache.close()
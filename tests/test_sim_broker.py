@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.models import Bar
+from modules.mock import MockBot
+from modules.sim_broker import SimBroker
+from modules.strategy import Strategy
+
+
+def bar(i, close, ma5, ma20):
+    b = Bar(datetime(2025, 1, 2, 9, 0) + timedelta(minutes=i), close, close, close, close, 1)
+    b.ind.update(ma5=ma5, ma20=ma20)
+    return b
+
+
+def test_fill_pnl_with_slippage_and_fee():
+    broker = SimBroker(slippage=1.0, fee=0.5)
+    broker.mark(datetime(2025, 1, 2, 9, 0), 100.0)
+    broker.place_order("TMF", "Buy")
+    broker.mark(datetime(2025, 1, 2, 9, 1), 110.0)
+    broker.place_order("TMF", "Sell")
+    # 買在 101、賣在 109，兩邊手續費共 1 點
+    assert broker.summary() == {"fills": 2, "trades": 1, "position": 0,
+                                "gross": 8.0, "fees": 1.0, "net": 7.0}
+
+
+def test_strategy_reason_reaches_the_ledger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    broker = SimBroker(slippage=0, fee=0)
+    strategy = Strategy(bot=MockBot(), trader=broker, quiet=True)
+    for b in (bar(0, 100, 1, 2), bar(1, 101, 3, 2), bar(2, 105, 1, 2)):
+        strategy.on_bar(b)
+
+    ledger = broker.ledger()
+    assert ledger["Action"].tolist() == ["Buy", "Sell"]
+    assert ledger["Note"].tolist() == ["黃金交叉", "死亡交叉(平多)"]
+    assert ledger["Total_Profit"].iloc[-1] == pytest.approx(4.0)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import optimize
+from modules.vector_backtest import crossover_backtest
+
+PARAMS = [(5, 20, 0), (5, 20, 5), (10, 60, 0), (10, 60, 3), (20, 120, 10)]
+
+
+def loop_backtest(df, short_ma, long_ma, slope_p, friction):
+    """原本 optimize.run_backtest_with_filter 的 iterrows 版本 (當作對照組)"""
+    work_df = df.copy()
+    work_df['ma_s'] = work_df['Close'].rolling(window=short_ma).mean()
+    work_df['ma_l'] = work_df['Close'].rolling(window=long_ma).mean()
+    work_df['ma_l_slope'] = work_df['ma_l'] - work_df['ma_l'].shift(slope_p)
+    work_df['prev_ma_s'] = work_df['ma_s'].shift(1)
+    work_df['prev_ma_l'] = work_df['ma_l'].shift(1)
+    work_df.dropna(subset=['prev_ma_s', 'prev_ma_l', 'ma_l_slope'], inplace=True)
+
+    position = 0
+    entry_price = 0
+    total_profit = 0
+    trade_count = 0
+    for _, row in work_df.iterrows():
+        if row['prev_ma_s'] < row['prev_ma_l'] and row['ma_s'] > row['ma_l']:
+            if slope_p == 0 or row['ma_l_slope'] > 0:
+                if position == -1:
+                    total_profit += (entry_price - row['Close']) - friction
+                    trade_count += 1
+                entry_price = row['Close']
+                position = 1
+        elif row['prev_ma_s'] > row['prev_ma_l'] and row['ma_s'] < row['ma_l']:
+            if slope_p == 0 or row['ma_l_slope'] < 0:
+                if position == 1:
+                    total_profit += (row['Close'] - entry_price) - friction
+                    trade_count += 1
+                entry_price = row['Close']
+                position = -1
+    return total_profit, trade_count
+
+
+@pytest.mark.parametrize("short_ma,long_ma,slope_p", PARAMS)
+def test_kernel_matches_loop(bars, short_ma, long_ma, slope_p):
+    expected = loop_backtest(bars, short_ma, long_ma, slope_p, 5.0)
+    assert expected[1] > 0
+
+    close = bars['Close']
+    ma_s = close.rolling(window=short_ma).mean().to_numpy()
+    ma_l = close.rolling(window=long_ma).mean().to_numpy()
+    assert crossover_backtest(close.to_numpy(), ma_s, ma_l, slope_p, 5.0) == expected
+    assert optimize.run_backtest_with_filter(bars, short_ma, long_ma, slope_p, 5.0) == expected
+
+
+def test_kernel_without_trades(bars):
+    flat = bars.copy()
+    flat['Close'] = 20000.0
+    assert optimize.run_backtest_with_filter(flat, 5, 20, 0, 5.0) == (0.0, 0)
+
+
+SHORTS = [3, 5, 10, 20]
+LONGS = [10, 20, 60]
+SLOPES = [0, 3, 5]
+
+
+def test_batch_matches_serial(bars):
+    serial = optimize.sweep_serial(bars, SHORTS, LONGS, SLOPES, 5.0)
+    batch = optimize.sweep_batch(bars, SHORTS, LONGS, SLOPES, 5.0)
+    assert len(batch) == sum(1 for s in SHORTS for l in LONGS if s < l) * len(SLOPES)
+    assert batch.to_dict('records') == serial.to_dict('records')
+
+
+def test_batch_with_fractional_prices(bars):
+    # 有小數的報價走 float 前綴和，只要求數值接近
+    df = bars.copy()
+    df['Close'] = df['Close'] + 0.25
+    serial = optimize.sweep_serial(df, SHORTS, LONGS, SLOPES, 5.0)
+    batch = optimize.sweep_batch(df, SHORTS, LONGS, SLOPES, 5.0)
+    assert (batch['trades'] == serial['trades']).all()
+    np.testing.assert_allclose(batch['profit'], serial['profit'], rtol=0, atol=1e-6)
+
+
+def test_parallel_matches_serial(bars):
+    serial = optimize.sweep_serial(bars, SHORTS, LONGS, SLOPES, 5.0)
+    parallel = optimize.sweep_in_parallel(bars, SHORTS, LONGS, SLOPES, 5.0, workers=2)
+    assert parallel.to_dict('records') == serial.to_dict('records')
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.vector_backtest import crossover_signals, prefix_sum_mas, settle_signals
+from modules.walk_forward import make_folds, walk_forward
+
+SHORTS, LONGS, SLOPES = [3, 5, 10], [20, 40], [0, 3]
+
+
+@pytest.fixture(scope="module")
+def days_df():
+    """12 個交易日的日盤 1 分 K (08:46 ~ 13:45)"""
+    rng = np.random.default_rng(11)
+    idx = []
+    for day in pd.bdate_range("2025-01-02", periods=12):
+        idx.append(pd.date_range(day + pd.Timedelta("08:46:00"), periods=300, freq="min"))
+    idx = pd.DatetimeIndex(np.concatenate([i.to_numpy(dtype="datetime64[ns]") for i in idx]), name="Time")
+    close = np.round(20000 + np.cumsum(rng.normal(0, 5, len(idx))))
+    return pd.DataFrame({"Close": close}, index=idx)
+
+
+def test_make_folds_roll_by_test_days(days_df):
+    folds = make_folds(days_df.index, train_days=5, test_days=3)
+    assert [(f[4], f[6], f[7]) for f in folds] == [
+        ("2025-01-02", "2025-01-09", "2025-01-13"),
+        ("2025-01-07", "2025-01-14", "2025-01-16"),
+        ("2025-01-10", "2025-01-17", "2025-01-17"),
+    ]
+    for f in folds:
+        assert f[1] == f[2]                     # 測試緊接在訓練之後
+        assert (f[3] - f[2]) % 300 == 0
+
+
+def test_parallel_matches_serial_and_is_out_of_sample(days_df):
+    serial, eq1 = walk_forward(days_df, SHORTS, LONGS, SLOPES, 5.0, 5, 3, workers=1)
+    parallel, eq2 = walk_forward(days_df, SHORTS, LONGS, SLOPES, 5.0, 5, 3, workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    pd.testing.assert_frame_equal(eq1, eq2)
+
+    # 權益曲線只涵蓋測試區間，終點 = 各 fold 樣本外損益加總
+    assert eq1.index[0] == pd.Timestamp("2025-01-09 08:46")
+    assert eq1["equity"].iloc[-1] == pytest.approx(serial["test_profit"].sum())
+
+    # 每個 fold 的樣本外損益 = 整段資料算好訊號後切出測試區間再結算
+    close = days_df["Close"].to_numpy(dtype=np.float64)
+    mas = prefix_sum_mas(close, SHORTS + LONGS)
+    for f, row in zip(make_folds(days_df.index, 5, 3), serial.itertuples()):
+        sig = crossover_signals(mas[row.short], mas[row.long], row.slope)[f[2]:f[3]]
+        profit, trades = settle_signals(close[f[2]:f[3]], sig, 5.0)
+        assert (profit, trades) == (row.test_profit, row.test_trades)
+
+
+def test_too_little_data_is_rejected(days_df):
+    with pytest.raises(ValueError):
+        walk_forward(days_df, SHORTS, LONGS, SLOPES, 5.0, train_days=12, test_days=1)
@@ -0,0 +1,346 @@
+import sys
+import os
+import io
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing as mp
+import numpy as np
+from datetime import datetime
+
+# 載入設定
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import Settings
+from core.engine import BotEngine
+from core.ingest import IngestWorker
+from core.latency import LatencyTracer
+from modules.mock import MockTick, MockBot, MockShioaji
+from modules.sim_broker import SimBroker
+from modules.strategy import Strategy
+from modules.recorder import Recorder, BarRecorder
+
+# ==========================================
+# 即時管線壓力測試 (合成 Tick -> BotEngine -> BarGenerator -> BarResampler -> Strategy -> 錄製器)
+# ==========================================
+# 用 MockTick / MockShioaji / MockBot 產生仿真的報價流，能餵多快就餵多快，量測：
+#   - 持續處理速度 (ticks/sec)
+#   - 每筆 Tick 的延遲分布 (LatencyTracer 的直方圖，另外跑一趟，不影響速度數字)
+#   - 峰值記憶體 (每種管線在獨立的子行程裡跑，ru_maxrss 不會互相污染)
+# 每種管線輪流重跑 REPEAT 次，各數字取中位數，並記下重跑之間的差距 (雜訊)。
+# 結果存成 JSON，並跟基準檔比較 (速度、記憶體、每一站的 p99 延遲)，
+# 變慢/變胖超過門檻就回傳非 0 (可以接 CI)；門檻至少是量到的雜訊，同一份程式跑兩次不會被誤判。
+#
+#   python tools/bench_pipeline.py                    # 跑全部管線，跟基準比較
+#   python tools/bench_pipeline.py --save-baseline    # 把這次的結果存成新基準
+#   python tools/bench_pipeline.py engine async --tick-rate 200 --repeat 9
+
+# ================= 設定區 =================
+TICK_RATE = 20.0           # 平均每秒幾筆 Tick (卜瓦松到達，決定每根 K 棒有幾筆)
+VOLATILITY = 2.0           # 每秒價格波動 (點，隨機漫步的標準差)
+SESSION_MINUTES = 300      # 模擬多長的盤 (分鐘)
+SEED = 42
+REPEAT = 5                 # 每種管線跑幾次 (取中位數；次數越多，雜訊越小)
+OUTPUT_DIR = "data/bench"
+BASELINE = "data/bench/pipeline_baseline.json"
+
+# 跟基準比較的容忍度 (超過就算退步)；實際門檻取這個值與兩邊量到的雜訊中較大的
+MAX_SLOWDOWN = 0.10        # ticks/sec 掉超過 10%
+MAX_LATENCY_GROWTH = 0.25  # 任何一站的 p99 延遲多 25%
+MAX_MEMORY_GROWTH = 0.20   # 峰值記憶體多 20%
+
+# 管線組合：名稱 -> 說明
+PIPELINES = {
+    "engine": "BotEngine [1, 5] + Strategy (SimBroker)",
+    "multi_tf": "BotEngine [1, 3, 5, 15, 60, session] + Strategy (SimBroker)",
+    "recorders": "engine + Tick/1min/5min 錄製器 (CSV + 二進位封存)",
+    "async": "engine 前面加 IngestWorker 環形緩衝區 (block 策略，不丟資料)",
+    "trader": "engine + Trader(MockShioaji) 走完整下單流程",
+}
+
+
+def synth_ticks(tick_rate=TICK_RATE, volatility=VOLATILITY, minutes=SESSION_MINUTES, seed=SEED,
+                start="2025-01-02T08:45:00"):
+    """
+    合成報價流：到達間隔是指數分布 (平均 1/tick_rate 秒)，價格是整數點的隨機漫步
+    :return: (時間 datetime64[us], 價格, 成交量)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(tick_rate * minutes * 60)
+    gaps = rng.exponential(1.0 / tick_rate, n)
+    secs = np.cumsum(gaps)
+    secs = secs[secs < minutes * 60]
+    steps = rng.normal(0.0, volatility * np.sqrt(np.diff(secs, prepend=0.0)))
+    price = np.round(20000 + np.cumsum(steps))
+    volume = rng.geometric(0.5, len(secs))
+    ts = np.datetime64(start, 'us') + (secs * 1e6).astype('timedelta64[us]')
+    return ts, price, volume
+
+
+def build_pipeline(name, tracer=None):
+    """
+    :return: (送 Tick 的函式, 收尾函式)
+    """
+    timeframes = [1, 3, 5, 15, 60, "session"] if name == "multi_tf" else [1, 5]
+    code = Settings.TARGET_CONTRACT
+
+    if name == "trader":
+        from modules.trader import Trader   # 需要 shioaji 套件
+        trader = Trader(api=MockShioaji(), tracer=tracer)
+    else:
+        trader = SimBroker()
+    strategy = Strategy(bot=MockBot(), trader=trader, quiet=True)
+    engine = BotEngine(strategy, timeframes=timeframes, tracer=tracer)
+
+    recorders = []
+    if name == "recorders":
+        recorders = [Recorder(symbol=code)] + [BarRecorder(symbol=code, interval=iv) for iv in ("1min", "5min")]
+        for rec, stream in zip(recorders, ("tick", "1min", "5min")):
+            rec.daemon = True
+            rec.start()
+            engine.add_sink(stream, rec)
+
+    if name == "async":
+        ingest = IngestWorker(engine, capacity=Settings.INGEST_CAPACITY, policy="block")
+        ingest.start()
+
+        def finish():
+            ingest.stop()
+            ingest.join()
+            engine.flush()
+        return ingest.put, finish
+
+    def finish():
+        engine.flush()
+        for rec in recorders:
+            rec.stop()
+            rec.join()
+    return engine.process_tick, finish
+
+
+def _feed(feed, ts, price, volume, code, stamp):
+    """照實盤 MarketData 的做法：每筆報價建一個 Tick 物件再送進去"""
+    now = time.perf_counter_ns
+    if stamp:
+        for dt, p, v in zip(ts, price, volume):
+            tick = MockTick(code, dt, p, v)
+            tick.recv_ns = now()
+            feed(tick)
+    else:
+        for dt, p, v in zip(ts, price, volume):
+            feed(MockTick(code, dt, p, v))
+
+
+def _run_one(task):
+    """[子行程] 跑一種管線：先量速度與記憶體，再另外跑一趟量延遲"""
+    name, params = task
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)   # 錄製器 / 策略帳本都寫相對路徑，丟到暫存資料夾
+    out = {"pipeline": name, "desc": PIPELINES[name], "error": ""}
+    try:
+        ts, price, volume = synth_ticks(**params)
+        ts, price, volume = ts.tolist(), price.tolist(), volume.tolist()
+        code = Settings.TARGET_CONTRACT
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # 1. 速度 + 記憶體 (不掛延遲追蹤)
+        with contextlib.redirect_stdout(io.StringIO()):
+            feed, finish = build_pipeline(name)
+            gc.collect()
+            t0 = time.perf_counter()
+            _feed(feed, ts, price, volume, code, stamp=False)
+            t1 = time.perf_counter()
+            finish()
+            t2 = time.perf_counter()
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # 2. 延遲分布 (每筆 Tick 蓋收到時間，LatencyTracer 記各站直方圖)
+        tracer = LatencyTracer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            feed, finish = build_pipeline(name, tracer)
+            _feed(feed, ts, price, volume, code, stamp=True)
+            finish()
+        snap = tracer.snapshot()
+
+        n = len(ts)
+        out.update({
+            "ticks": n,
+            "bars": snap["strategy"]["count"],
+            "feed_seconds": t1 - t0,
+            "total_seconds": t2 - t0,
+            # 算到收尾為止 (非同步引擎 / 錄製器要把緩衝區吃完才算處理完)
+            "ticks_per_sec": n / (t2 - t0),
+            "peak_rss_mb": rss1 / 1024,               # Linux 的 ru_maxrss 單位是 KB
+            "run_rss_mb": (rss1 - rss0) / 1024,
+            "latency_us": {stage: s for stage, s in snap.items() if s["count"]},
+        })
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+    return out
+
+
+def _spread(values):
+    """
+    重跑之間的相對差距 ((最大 - 最小) / 中位數)，當作這個數字的雜訊
+    跑 5 次以上先去掉頭尾各一個 (偶爾一次被 GC / 排程拖慢，不該把門檻撐到好幾倍)
+    """
+    vals = sorted(values)
+    if len(vals) >= 5:
+        vals = vals[1:-1]
+    mid = float(np.median(values))
+    return (vals[-1] - vals[0]) / mid if mid else 0.0
+
+
+def aggregate(runs):
+    """同一種管線跑了好幾次：各數字取中位數，雜訊記在 noise 裡"""
+    failed = [r for r in runs if r["error"]]
+    if failed:
+        return failed[0]
+    out = {k: runs[0][k] for k in ("pipeline", "desc", "error", "ticks", "bars")}
+    out["runs"] = len(runs)
+    noise = {}
+    for key in ("feed_seconds", "total_seconds", "ticks_per_sec", "peak_rss_mb", "run_rss_mb"):
+        vals = [r[key] for r in runs]
+        out[key] = float(np.median(vals))
+        noise[key] = _spread(vals)
+
+    latency, latency_noise = {}, {}
+    for stage in dict.fromkeys(s for r in runs for s in r["latency_us"]):
+        snaps = [r["latency_us"][stage] for r in runs if stage in r["latency_us"]]
+        latency[stage] = {k: float(np.median([s[k] for s in snaps])) for k in snaps[0]}
+        latency[stage]["count"] = int(latency[stage]["count"])
+        latency_noise[stage] = {k: _spread([s[k] for s in snaps]) for k in ("p50_us", "p99_us")}
+    out["latency_us"] = latency
+    noise["latency_us"] = latency_noise
+    out["noise"] = noise
+    return out
+
+
+def run_bench(pipelines=None, repeat=REPEAT, **params):
+    """
+    每種管線每次都開一個新的子行程，依序跑 (不平行，避免互搶 CPU 影響數字)
+    重跑是一輪一輪輪流跑 (A B C A B C ...)，機器忙碌程度的變化會平均分到每種管線
+    """
+    pipelines = pipelines or list(PIPELINES)
+    runs = {name: [] for name in pipelines}
+    ctx = mp.get_context("spawn")
+    for i in range(repeat):
+        for name in pipelines:
+            with ctx.Pool(processes=1) as pool:
+                runs[name].append(pool.apply(_run_one, ((name, params),)))
+        print(f"🔁 第 {i + 1}/{repeat} 輪完成")
+
+    results = {}
+    for name in pipelines:
+        r = results[name] = aggregate(runs[name])
+        if r["error"]:
+            print(f"⚠️ {name:<10} 失敗: {r['error']}")
+        else:
+            lat = r["latency_us"].get("engine", {})
+            print(f"✅ {name:<10} {r['ticks_per_sec']:>10,.0f} ticks/s (雜訊 {r['noise']['ticks_per_sec']:.0%}) | "
+                  f"p50 {lat.get('p50_us', 0):6.1f} µs  p99 {lat.get('p99_us', 0):7.1f} µs | "
+                  f"峰值 {r['peak_rss_mb']:.0f} MB")
+            print("   p99 各站: " + "  ".join(f"{stage} {s['p99_us']:.1f}" for stage, s in r["latency_us"].items()))
+    return results
+
+
+def _noise(result, key, stage=None):
+    """量到的雜訊 (舊版基準檔沒有記錄就當 0)"""
+    noise = result.get("noise", {})
+    if stage is not None:
+        return noise.get("latency_us", {}).get(stage, {}).get(key, 0.0)
+    return noise.get(key, 0.0)
+
+
+def compare(results, baseline):
+    """
+    跟基準比較，回傳退步清單 (空的 = 沒問題)
+    速度、峰值記憶體，以及每一站 (queue / engine / tick_to_trade ...) 的 p99 延遲都比；
+    容忍度取設定值與兩邊量到的雜訊中較大的
+    """
+    problems = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or r.get("error") or b.get("error"):
+            continue
+        tol = max(MAX_SLOWDOWN, _noise(b, "ticks_per_sec"), _noise(r, "ticks_per_sec"))
+        if r["ticks_per_sec"] < b["ticks_per_sec"] * (1 - tol):
+            problems.append(f"{name}: 速度 {b['ticks_per_sec']:,.0f} -> {r['ticks_per_sec']:,.0f} ticks/s "
+                            f"(容忍 {tol:.0%})")
+        for stage in dict.fromkeys([*b["latency_us"], *r["latency_us"]]):
+            p99_old = b["latency_us"].get(stage, {}).get("p99_us")
+            p99_new = r["latency_us"].get(stage, {}).get("p99_us")
+            if not (p99_old and p99_new):
+                continue
+            tol = max(MAX_LATENCY_GROWTH, _noise(b, "p99_us", stage), _noise(r, "p99_us", stage))
+            if p99_new > p99_old * (1 + tol):
+                problems.append(f"{name}: {stage} p99 延遲 {p99_old:.1f} -> {p99_new:.1f} µs (容忍 {tol:.0%})")
+        tol = max(MAX_MEMORY_GROWTH, _noise(b, "peak_rss_mb"), _noise(r, "peak_rss_mb"))
+        if r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tol):
+            problems.append(f"{name}: 峰值記憶體 {b['peak_rss_mb']:.0f} -> {r['peak_rss_mb']:.0f} MB "
+                            f"(容忍 {tol:.0%})")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="即時管線壓力測試 (合成 Tick)")
+    parser.add_argument("pipelines", nargs="*",
+                        help=f"要跑的管線 (預設全部: {', '.join(PIPELINES)})")
+    parser.add_argument("--tick-rate", type=float, default=TICK_RATE, help="平均每秒幾筆 Tick")
+    parser.add_argument("--volatility", type=float, default=VOLATILITY, help="每秒價格波動 (點)")
+    parser.add_argument("--minutes", type=int, default=SESSION_MINUTES, help="模擬多長的盤 (分鐘)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每種管線跑幾次 (取中位數)")
+    parser.add_argument("--baseline", default=BASELINE, help="基準檔路徑")
+    parser.add_argument("--save-baseline", action="store_true", help="把這次結果存成基準")
+    args = parser.parse_args()
+    unknown = [p for p in args.pipelines if p not in PIPELINES]
+    if unknown:
+        parser.error(f"未知的管線: {', '.join(unknown)} (可用: {', '.join(PIPELINES)})")
+
+    params = {"tick_rate": args.tick_rate, "volatility": args.volatility, "minutes": args.minutes, "seed": args.seed}
+    print(f"🏎️ [管線壓測] {args.minutes} 分鐘 x {args.tick_rate:g} ticks/s "
+          f"(約 {int(args.tick_rate * args.minutes * 60):,} 筆)，波動 {args.volatility:g} 點/秒\n")
+    results = run_bench(args.pipelines, args.repeat, **params)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cores)",
+        "params": params,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = f"{OUTPUT_DIR}/pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 結果已存至: {path}")
+
+    if args.save_baseline:
+        shutil.copyfile(path, args.baseline)
+        print(f"📌 已設為新基準: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ 還沒有基準檔 ({args.baseline})，加 --save-baseline 建立")
+        sys.exit(0)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("params") != params:
+        print(f"⚠️ 基準檔的參數不同 ({baseline.get('params')})，比較結果僅供參考")
+    problems = compare(results, baseline["results"])
+    if problems:
+        print("❌ 效能退步：")
+        for p in problems:
+            print(f"   - {p}")
+        sys.exit(1)
+    print(f"✅ 與基準 ({baseline['created']}) 相比沒有退步")
@@ -0,0 +1,242 @@
+import sys
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# 載入設定
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.history_store import HistoryStore, read_bar_csv
+from modules.columnar import write_bar_frame, load_bar_frame
+from modules.sim_broker import SimBroker
+from modules.strategy import Strategy
+from modules.mock import MockBot
+from modules.bar_iter import calculate_indicators, iter_bars
+import optimize
+
+# ==========================================
+# 回測 / 優化器 效能量測 (資料從一週長到一年)
+# ==========================================
+# 產生指定長度的合成 1 分 K (日盤 08:46~13:45 + 夜盤 15:01~05:00，平日才有)，
+# 寫成 CSV / 歷史資料庫 / 二進位封存三種格式，然後每個階段分開計時：
+#
+#   load        讀檔 (三種格式各量一次)
+#   indicators  calculate_indicators + dropna (modules/bar_iter.py，跟 backtest.py 同一套)
+#   event_loop  iter_bars -> Strategy.on_bar (靜音 + SimBroker)
+#   sweep       optimize.run_sweep 掃完整張參數表
+#
+# 報告每個階段的 rows/sec (K 線數 / 秒) 與峰值記憶體 (tracemalloc，另外跑一趟，不影響計時)。
+# 結果存成 JSON；加 --compare 舊檔 可以直接看每個階段快了幾倍。
+#
+#   python tools/bench_research.py                      # 全部尺寸
+#   python tools/bench_research.py 1w 1m --repeat 5
+#   python tools/bench_research.py --compare data/bench/research_20260101_120000.json
+
+# ================= 設定區 =================
+SIZES = {             # 名稱 -> 交易日數
+    "1w": 5,
+    "1m": 21,
+    "3m": 63,
+    "6m": 126,
+    "1y": 252,
+}
+REPEAT = 3            # 每個階段跑幾次取最快的一次
+SWEEP_MODE = optimize.SWEEP_MODE   # "serial" / "batch" / "parallel" (parallel 的子行程記憶體不會算進去)
+SEED = 7
+CONTRACT = "BENCH"
+OUTPUT_DIR = "data/bench"
+
+
+def synth_bars(days, seed=SEED, start="2025-01-02"):
+    """
+    合成 1 分 K：收盤價是整數點的隨機漫步，開高低圍繞收盤價
+    :param days: 幾個交易日 (只算平日)
+    """
+    rng = np.random.default_rng(seed)
+    day_session = np.arange(8 * 60 + 46, 13 * 60 + 46)            # 08:46 ~ 13:45
+    night_session = np.arange(15 * 60 + 1, 29 * 60 + 1)           # 15:01 ~ 隔天 05:00
+    template = np.concatenate((day_session, night_session)).astype('timedelta64[m]')
+
+    stamps = []
+    day = datetime.strptime(start, "%Y-%m-%d")
+    while len(stamps) < days:
+        if day.weekday() < 5:
+            stamps.append(np.datetime64(day, 'm') + template)
+        day += timedelta(days=1)
+    ts = np.concatenate(stamps).astype('datetime64[ns]')
+
+    n = len(ts)
+    close = np.round(20000 + np.cumsum(rng.normal(0, 4, n)))
+    open_ = close - np.round(rng.normal(0, 2, n))
+    high = np.maximum(open_, close) + np.abs(np.round(rng.normal(0, 2, n)))
+    low = np.minimum(open_, close) - np.abs(np.round(rng.normal(0, 2, n)))
+    volume = rng.integers(1, 200, n)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.DatetimeIndex(ts, name='Time'))
+
+
+def write_sources(df, root):
+    """同一份資料寫成三種格式，回傳 {格式: (讀取函式, 寫入秒數)}"""
+    csv_path = os.path.join(root, f"{CONTRACT}_1min.csv")
+    store = HistoryStore(root=os.path.join(root, "history"), cache_days=0)
+    archive = os.path.join(root, f"{CONTRACT}_archive")
+
+    t0 = time.perf_counter()
+    df.to_csv(csv_path, date_format="%Y-%m-%d %H:%M:%S")
+    t1 = time.perf_counter()
+    store.write_frame(CONTRACT, df)
+    t2 = time.perf_counter()
+    write_bar_frame(archive, df)
+    t3 = time.perf_counter()
+
+    return {
+        "csv": (lambda: read_bar_csv(csv_path), t1 - t0),
+        "store": (lambda: HistoryStore(root=store.root, cache_days=0).load(CONTRACT), t2 - t1),
+        "archive": (lambda: load_bar_frame(archive), t3 - t2),
+    }
+
+
+def stage_indicators(df):
+    out = calculate_indicators(df.copy())
+    out.dropna(inplace=True)
+    return out
+
+
+def stage_event_loop(df):
+    broker = SimBroker()
+    strategy = Strategy(bot=MockBot(), trader=broker, quiet=True)
+    on_bar = strategy.on_bar
+    for bar in iter_bars(df):
+        on_bar(bar)
+    return strategy
+
+
+def stage_sweep(df):
+    return optimize.run_sweep(df, optimize.SHORT_MA_LIST, optimize.LONG_MA_LIST,
+                              optimize.SLOPE_LIST, optimize.FRICTION_COST)
+
+
+def measure(fn, repeat=REPEAT, memory=True):
+    """
+    :return: (最快一次的秒數, 峰值記憶體 MB 或 None, 最後一次的回傳值)
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+
+    peak = None
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def bench_size(name, days, repeat=REPEAT, memory=True):
+    """跑一個資料長度的所有階段，回傳結果列"""
+    df = synth_bars(days)
+    rows = []
+    n = len(df)
+
+    def add(stage, seconds, peak, count=n, **extra):
+        rows.append({"size": name, "days": days, "bars": n, "stage": stage, "seconds": seconds,
+                     "rows_per_sec": count / seconds if seconds > 0 else 0.0,
+                     "peak_mb": peak, **extra})
+
+    workdir = tempfile.mkdtemp(prefix="bench_research_")
+    cwd = os.getcwd()
+    os.chdir(workdir)   # 策略的帳本寫相對路徑，丟到暫存資料夾
+    try:
+        sources = write_sources(df, workdir)
+        for fmt, (load, write_sec) in sources.items():
+            sec, peak, loaded = measure(load, repeat, memory)
+            add(f"load_{fmt}", sec, peak, write_seconds=write_sec)
+            assert len(loaded) == n, f"{fmt} 讀回 {len(loaded)} 筆，應為 {n} 筆"
+
+        sec, peak, ind_df = measure(lambda: stage_indicators(df), repeat, memory)
+        add("indicators", sec, peak)
+
+        sec, peak, strategy = measure(lambda: stage_event_loop(ind_df), repeat, memory)
+        add("event_loop", sec, peak, count=len(ind_df), trades=strategy.trade_count)
+
+        sec, peak, res = measure(lambda: stage_sweep(df), repeat, memory)
+        add("sweep", sec, peak, combos=len(res), bar_evals_per_sec=n * len(res) / sec if sec > 0 else 0.0)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def compare(table, old_path):
+    """跟舊的結果比：每個 (尺寸, 階段) 快了幾倍"""
+    with open(old_path, encoding="utf-8") as f:
+        old = pd.DataFrame(json.load(f)["rows"])
+    merged = table.merge(old[["size", "stage", "seconds", "peak_mb"]], on=["size", "stage"],
+                         how="inner", suffixes=("", "_old"))
+    merged["speedup"] = merged["seconds_old"] / merged["seconds"]
+    merged["mem_ratio"] = merged["peak_mb"] / merged["peak_mb_old"]
+    return merged[["size", "stage", "seconds_old", "seconds", "speedup", "peak_mb_old", "peak_mb", "mem_ratio"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回測 / 優化器 各階段效能量測 (合成 1 分 K)")
+    parser.add_argument("sizes", nargs="*", help=f"資料長度 (預設全部: {', '.join(SIZES)})")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="每個階段跑幾次取最快")
+    parser.add_argument("--sweep-mode", default=SWEEP_MODE, choices=["serial", "batch", "parallel"])
+    parser.add_argument("--no-memory", action="store_true", help="不量記憶體 (省一趟)")
+    parser.add_argument("--compare", help="跟之前存的結果 JSON 比較")
+    args = parser.parse_args()
+    unknown = [s for s in args.sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"未知的資料長度: {', '.join(unknown)} (可用: {', '.join(SIZES)})")
+    optimize.SWEEP_MODE = args.sweep_mode
+
+    combos = sum(1 for s in optimize.SHORT_MA_LIST for l in optimize.LONG_MA_LIST if s < l) * len(optimize.SLOPE_LIST)
+    print(f"🔬 [研究工具壓測] 掃描模式: {args.sweep_mode} ({combos} 組) | 每階段跑 {args.repeat} 次取最快\n")
+
+    rows = []
+    for name in args.sizes or list(SIZES):
+        t0 = time.perf_counter()
+        part = bench_size(name, SIZES[name], args.repeat, not args.no_memory)
+        rows += part
+        print(f"✅ {name:<3} ({part[0]['bars']:,} 根) 完成，耗時 {time.perf_counter() - t0:.1f} 秒")
+
+    table = pd.DataFrame(rows)
+    show = table[["size", "bars", "stage", "seconds", "rows_per_sec", "peak_mb"]].copy()
+    show["rows_per_sec"] = show["rows_per_sec"].map(lambda v: f"{v:,.0f}")
+    print("\n" + "=" * 60)
+    print("📊 各階段效能 (seconds = 最快一次，peak_mb = tracemalloc 峰值)")
+    print("=" * 60)
+    print(show.round(4).to_string(index=False))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = f"{OUTPUT_DIR}/research_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created": datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(),
+                   "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cores)",
+                   "sweep_mode": args.sweep_mode, "combos": combos, "repeat": args.repeat,
+                   "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 結果已存至: {path}")
+
+    if args.compare:
+        print("\n" + "=" * 60)
+        print(f"⚖️ 與 {args.compare} 比較 (speedup > 1 = 變快)")
+        print("=" * 60)
+        print(compare(table, args.compare).round(3).to_string(index=False))
@@ -1,71 +1,218 @@
 import sys
 import os
-import csv
+import json
+import time
+import argparse
+import threading
 import pandas as pd  # <--- 記得要 import pandas
 from datetime import datetime, timedelta
-import shioaji as sj
-from shioaji import constant
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 載入設定
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.settings import Settings
+from modules.history_store import HistoryStore, trading_days
 
-def download_kbars():
-    print("📡 連線到 Shioaji API...")
-    api = sj.Shioaji(simulation=False) 
-    api.login(
-        api_key=Settings.SHIOAJI_API_KEY,
-        secret_key=Settings.SHIOAJI_SECRET_KEY
-    )
-
-    contract_code = Settings.TARGET_CONTRACT 
-    contract = api.Contracts.Futures.TMF[contract_code]
-    
-    if not contract:
-        print(f"❌ 找不到合約: {contract_code}")
-        return
-
-    print(f"📥 開始下載 {contract_code} 的 1分K 資料...")
-    
-    # 抓取最近 30 天
-    start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-    
-    kbars = api.kbars(
-        contract, 
-        start=start_date, 
-        end=datetime.now().strftime("%Y-%m-%d"),
-    )
-    
-    # --- 🔴 修正重點開始 🔴 ---
-    # 舊寫法: df = kbars.df (已失效)
-    
-    # 新寫法: 手動轉成 DataFrame
+# ================= 設定區 =================
+CONTRACTS = [Settings.TARGET_CONTRACT]   # 可以一次多個，例如 ["TMF202602", "TXF202602", "MXF202602", "TXFR1"]
+LOOKBACK_DAYS = 30     # 往回抓幾天
+CHUNK_DAYS = 5         # 每次 api.kbars 最多查幾個交易日 (查太大段容易逾時)
+MAX_WORKERS = 4        # 同時幾個下載執行緒 (別開太多，券商有查詢頻率限制)
+MAX_RETRIES = 3        # 單一區段失敗重試次數
+
+JOURNAL_NAME = "_download.json"   # 記錄「查過但沒資料」的日子 (假日)，下次就不再重查
+
+
+def weekdays(start, end):
+    """[start, end] 之間的平日 ('YYYY-MM-DD')；國定假日查了沒資料會記在 journal 裡"""
+    out = []
+    day = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d")
+    while day <= last:
+        if day.weekday() < 5:
+            out.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return out
+
+
+def get_contract(api, code):
+    """TMF202602 -> api.Contracts.Futures.TMF['TMF202602'] (TXF / MXF / 近月 R1 R2 同理)"""
+    return getattr(api.Contracts.Futures, code[:3])[code]
+
+
+class Journal:
+    """每個合約資料夾裡一個小 JSON，記錄確定沒資料的日子 (多執行緒共用)"""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+
+    def _path(self, code):
+        return os.path.join(self.store.root, code, JOURNAL_NAME)
+
+    def empty_days(self, code):
+        path = self._path(code)
+        if not os.path.exists(path):
+            return set()
+        with open(path, encoding='utf-8') as f:
+            return set(json.load(f).get("empty", []))
+
+    def mark_empty(self, code, days):
+        if not days:
+            return
+        with self.lock:
+            known = self.empty_days(code) | set(days)
+            path = self._path(code)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"empty": sorted(known)}, f)
+            os.replace(tmp, path)
+
+
+def plan_chunks(store, journal, code, start, end, chunk_days=CHUNK_DAYS):
+    """
+    找出還沒下載的交易日，切成連續的小區段
+    - 已存的日子跳過；但「最後一個已存的日子」可能是盤中抓的半天資料，一律重抓
+    - 今天以後的日子還沒收盤，也一律重抓
+    """
+    have = set(store.days(code, start, end))
+    if have:
+        have.discard(max(have))
+    skip = have | journal.empty_days(code)
+    missing = [d for d in weekdays(start, end) if d not in skip]
+
+    chunks = []
+    for day in missing:
+        prev = chunks[-1] if chunks else None
+        # 中間只隔週末的也算連續，接在同一段裡
+        if prev and len(prev) < chunk_days and \
+                (datetime.strptime(day, "%Y-%m-%d") - datetime.strptime(prev[-1], "%Y-%m-%d")).days <= 3:
+            prev.append(day)
+        else:
+            chunks.append([day])
+    return [(c[0], c[-1], c) for c in chunks]
+
+
+def fetch_chunk(api, code, first, last):
+    """
+    下載交易日 [first, last] 的 1 分 K
+    夜盤會跨到隔天凌晨，所以日曆日多查一天，再依交易日過濾
+    """
+    contract = get_contract(api, code)
+    end = (datetime.strptime(last, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    kbars = api.kbars(contract, start=first, end=end)
+
+    # 手動轉成 DataFrame (kbars.df 已失效)
     df = pd.DataFrame({
-        "ts": kbars.ts,
         "Open": kbars.Open,
         "High": kbars.High,
         "Low": kbars.Low,
         "Close": kbars.Close,
         "Volume": kbars.Volume
-    })
-    
-    # 把 ts (timestamp) 轉成可讀的時間格式
-    df['ts'] = pd.to_datetime(df['ts'])
-    df.set_index('ts', inplace=True)
-    df.index.name = 'Time'
-    # --- 🔴 修正重點結束 🔴 ---
-    
-    # 存檔
-    os.makedirs("data/history", exist_ok=True)
-    file_path = f"data/history/{contract_code}_1min_history.csv"
-    
-    df.to_csv(file_path)
-    
-    print(f"✅ 下載完成！已儲存至: {file_path}")
-    print(f"📊 共 {len(df)} 筆資料")
-    
+    }, index=pd.DatetimeIndex(pd.to_datetime(kbars.ts), name='Time'))
+
+    days = trading_days(df.index.to_numpy(dtype='datetime64[ns]')).astype(str)
+    return df[(days >= first) & (days <= last)]
+
+
+def download_history(api, codes, start, end, workers=MAX_WORKERS, chunk_days=CHUNK_DAYS, store=None):
+    """
+    增量下載多個合約 (可中斷續傳)
+    每個區段下載完就立刻寫進歷史資料庫，中途斷掉的話，下次執行只會補還沒下載的部分
+    :return: {合約: {"chunks", "bars", "days", "failed"}}
+    """
+    store = store or HistoryStore()
+    journal = Journal(store)
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    tasks = []
+    for code in codes:
+        chunks = plan_chunks(store, journal, code, start, end, chunk_days)
+        print(f"📋 [{code}] 需要下載 {sum(len(c[2]) for c in chunks)} 個交易日 ({len(chunks)} 段)")
+        tasks += [(code, first, last, days) for first, last, days in chunks]
+
+    summary = {code: {"chunks": 0, "bars": 0, "days": 0, "failed": 0} for code in codes}
+
+    def run(task):
+        code, first, last, days = task
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                df = fetch_chunk(api, code, first, last)
+                break
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                print(f"⚠️ [{code}] {first}~{last} 第 {attempt} 次失敗: {e}，稍後重試")
+                time.sleep(attempt)
+        written = store.write_frame(code, df)
+        # 查了沒資料的平日 = 假日，記起來下次不再查 (今天還沒收盤不算)
+        journal.mark_empty(code, [d for d in days if d not in written and d < today])
+        return code, len(df), len(written)
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, t): t for t in tasks}
+        for fut in as_completed(futures):
+            code, first, last, _ = futures[fut]
+            done += 1
+            try:
+                _, bars, days = fut.result()
+                summary[code]["chunks"] += 1
+                summary[code]["bars"] += bars
+                summary[code]["days"] += days
+                print(f"✅ [{done}/{len(tasks)}] {code} {first}~{last}: {bars} 筆 ({days} 個交易日)")
+            except Exception as e:
+                summary[code]["failed"] += 1
+                print(f"❌ [{done}/{len(tasks)}] {code} {first}~{last} 下載失敗: {e} (下次執行會自動補抓)")
+    return summary
+
+
+def download_kbars(codes=None, days=LOOKBACK_DAYS, workers=MAX_WORKERS, chunk_days=CHUNK_DAYS, mock=False):
+    if mock:
+        from modules.mock import MockShioaji
+        print("🌈 使用 MockAPI (離線測試)")
+        api = MockShioaji()
+    else:
+        import shioaji as sj
+        print("📡 連線到 Shioaji API...")
+        api = sj.Shioaji(simulation=False)
+        api.login(
+            api_key=Settings.SHIOAJI_API_KEY,
+            secret_key=Settings.SHIOAJI_SECRET_KEY
+        )
+
+    codes = codes or CONTRACTS
+    end = datetime.now().strftime("%Y-%m-%d")
+    start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    print(f"📥 開始下載 {', '.join(codes)} 的 1分K ({start} ~ {end}，{workers} 條執行緒)...")
+
+    t0 = time.time()
+    store = HistoryStore()
+    summary = download_history(api, codes, start, end, workers, chunk_days, store)
+
+    print(f"\n✅ 下載完成！已儲存至: {store.root}/ (耗時 {time.time() - t0:.1f} 秒)")
+    for code, s in summary.items():
+        note = f"，{s['failed']} 段失敗" if s['failed'] else ""
+        print(f"📊 {code}: 新增 {s['bars']} 筆資料 / {s['days']} 個交易日{note}")
+
     # 登出 (好習慣)
-    api.logout()
+    if not mock:
+        api.logout()
 
 if __name__ == "__main__":
-    download_kbars()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="增量下載歷史 1 分 K 到 data/history/")
+    parser.add_argument("contracts", nargs="*", help="合約代碼 (預設用設定區的 CONTRACTS)")
+    parser.add_argument("--days", type=int, default=LOOKBACK_DAYS, help="往回抓幾天")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="同時幾個下載執行緒")
+    parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS, help="每次查詢最多幾個交易日")
+    parser.add_argument("--mock", action="store_true", help="用 MockAPI 離線測試")
+    parser.add_argument("--import-csv", metavar="CSV", help="不下載，把舊的單一 CSV 轉進資料庫 (要給一個合約代碼)")
+    args = parser.parse_args()
+    if args.import_csv:
+        if len(args.contracts) != 1:
+            parser.error("--import-csv 要指定剛好一個合約代碼，例如: TMF202602 --import-csv old.csv")
+        written = HistoryStore().import_csv(args.contracts[0], args.import_csv)
+        print(f"📦 已轉入 {args.contracts[0]}: {len(written)} 個交易日")
+    else:
+        download_kbars(args.contracts, args.days, args.workers, args.chunk_days, args.mock)